@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Measures the time that utils.rewrite_cproblems takes on large preprocessed
+C files.
+
+Without arguments, a file of the given size is created by preprocessing
+common system headers.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import timeit
+
+sys.path.insert(0,
+                os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
+sys.path.insert(0,
+                os.path.join(
+                    os.path.dirname(__file__), os.pardir, os.pardir, 'lib',
+                    'py'))
+
+import tbf.utils as utils
+
+headers = [
+    'stdio.h', 'stdlib.h', 'string.h', 'math.h', 'pthread.h', 'signal.h',
+    'wchar.h', 'sys/socket.h'
+]
+
+
+def _create_input(lines):
+    program = ''.join(['#include <{}>\n'.format(h) for h in headers])
+    preprocessed = subprocess.run(
+        ['gcc', '-E', '-xc', '-'],
+        input=program,
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True).stdout
+    preprocessed_lines = preprocessed.count('\n')
+    return preprocessed * max(1, lines // preprocessed_lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--lines',
+        type=int,
+        default=100000,
+        help='approximate number of lines of the created input')
+    parser.add_argument(
+        '--repeat', type=int, default=5, help='number of measurements')
+    parser.add_argument(
+        'files', nargs='*', help='preprocessed C files to use as input')
+    args = parser.parse_args()
+
+    if args.files:
+        inputs = list()
+        for f in args.files:
+            with open(f, 'r') as inp:
+                inputs.append((f, inp.read()))
+    else:
+        inputs = [('headers', _create_input(args.lines))]
+
+    for name, content in inputs:
+        times = timeit.repeat(
+            lambda: utils.rewrite_cproblems(content),
+            number=1,
+            repeat=args.repeat)
+        lines = content.count('\n')
+        print('{}: {} lines, best {:.3f} s, {:.0f} lines/s'.format(
+            name, lines, min(times), lines / min(times)))
+
+
+if __name__ == '__main__':
+    main()
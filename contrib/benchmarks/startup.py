@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Measures the start-up time of TBF: the time to import each component,
+the time to create the C parser and the time of `bin/tbf --version`.
+
+Import times are cumulative, i.e., they include the time of all imports
+that a component triggers first.
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+project_dir = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
+
+components = [
+    'tbf', 'tbf.utils', 'tbf.testcase_validation', 'tbf.portfolio',
+    'tbf.batch', 'tbf.serve', 'tbf.tools.afl', 'tbf.tools.cpatiger',
+    'tbf.tools.crest', 'tbf.tools.fshell', 'tbf.tools.klee',
+    'tbf.tools.random_tester', 'pycparser'
+]
+
+_import_time_pattern = re.compile(
+    r'^import time:\s+\d+\s+\|\s+(\d+)\s+\|\s+(\S+)$', re.MULTILINE)
+
+_parser_measurement = """
+import time
+import tbf.utils
+start = time.perf_counter()
+tbf.utils.get_parser()
+print(time.perf_counter() - start)
+"""
+
+_command_measurement = """
+import subprocess, sys, time
+start = time.perf_counter()
+subprocess.run(sys.argv[1:], stdout=subprocess.DEVNULL)
+print(time.perf_counter() - start)
+"""
+
+
+def _get_env():
+    env = os.environ.copy()
+    env['PYTHONPATH'] = os.pathsep.join(
+        [project_dir, os.path.join(project_dir, 'lib', 'py')])
+    return env
+
+
+def _run_python(args):
+    return subprocess.run(
+        [sys.executable] + args,
+        env=_get_env(),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True)
+
+
+def _measure_imports():
+    """Returns the cumulative import time of each component, in seconds."""
+    code = '\n'.join(['import ' + c for c in components])
+    result = _run_python(['-X', 'importtime', '-c', code])
+    times = dict()
+    for cumulative, module in _import_time_pattern.findall(result.stderr):
+        times[module] = int(cumulative) / 10**6
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--repeat', type=int, default=5, help='number of measurements')
+    args = parser.parse_args()
+
+    import_times = [_measure_imports() for _ in range(args.repeat)]
+    for component in components:
+        times = [t[component] for t in import_times if component in t]
+        if times:
+            print('import {:<28} best {:7.1f} ms'.format(
+                component, min(times) * 1000))
+        else:
+            # Imported by an earlier component as a side effect
+            print('import {:<28} {:>15}'.format(component, 'not reported'))
+
+    times = [
+        float(_run_python(['-c', _parser_measurement]).stdout)
+        for _ in range(args.repeat)
+    ]
+    print('{:<35} best {:7.1f} ms'.format('create C parser', min(times) * 1000))
+
+    tbf_command = [os.path.join(project_dir, 'bin', 'tbf'), '--version']
+    times = [
+        float(_run_python(['-c', _command_measurement] + tbf_command).stdout)
+        for _ in range(args.repeat)
+    ]
+    print('{:<35} best {:7.1f} ms'.format('bin/tbf --version',
+                                          min(times) * 1000))
+
+
+if __name__ == '__main__':
+    main()
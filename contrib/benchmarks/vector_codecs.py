@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Measures the throughput of the decoders and encoders of all test formats
+on a suite of generated test vectors.
+"""
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0,
+                os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
+sys.path.insert(0,
+                os.path.join(
+                    os.path.dirname(__file__), os.pardir, os.pardir, 'lib',
+                    'py'))
+
+import tbf.utils as utils
+import tbf.vector_codecs as vector_codecs
+
+nondet_methods = [{
+    'name': '__VERIFIER_nondet_' + t.replace(' ', ''),
+    'type': t,
+    'params': []
+} for t in ('int', 'unsigned int', 'char', 'long long')]
+
+
+def _create_suite(vectors, values, seed):
+    rng = random.Random(seed)
+    suite = list()
+    for idx in range(vectors):
+        vector = utils.TestVector('test{}'.format(idx), 'suite')
+        for _ in range(values):
+            method = rng.choice(nondet_methods)
+            vector.add(str(rng.randint(-100, 100)), method['name'])
+        suite.append(vector)
+    return suite
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--vectors',
+        type=int,
+        default=100000,
+        help='number of test vectors in the suite')
+    parser.add_argument(
+        '--values', type=int, default=8, help='number of values per vector')
+    parser.add_argument(
+        '--repeat', type=int, default=3, help='number of measurements')
+    parser.add_argument(
+        '--seed', type=int, default=0, help='seed to create the suite with')
+    parser.add_argument(
+        'formats',
+        nargs='*',
+        default=vector_codecs.formats,
+        help='test formats to measure (default: all)')
+    args = parser.parse_args()
+
+    suite = _create_suite(args.vectors, args.values, args.seed)
+    for test_format in args.formats:
+        test_cases = [
+            utils.TestCase(v.name, v.origin,
+                           vector_codecs.encode(test_format, v,
+                                                nondet_methods)) for v in suite
+        ]
+        encode_times = timeit.repeat(
+            lambda: [vector_codecs.encode(test_format, v, nondet_methods)
+                     for v in suite],
+            number=1,
+            repeat=args.repeat)
+        decode_times = timeit.repeat(
+            lambda: [vector_codecs.decode(test_format, t, nondet_methods)
+                     for t in test_cases],
+            number=1,
+            repeat=args.repeat)
+        print('{}: encode {:.0f} vectors/s, decode {:.0f} vectors/s'.format(
+            test_format,
+            len(suite) / min(encode_times),
+            len(suite) / min(decode_times)))
+
+
+if __name__ == '__main__':
+    main()
@@ -4,26 +4,39 @@ import sys
 import os
 import logging
 import argparse
+import importlib
 import pathlib
 
-import tbf.tools.afl as afl
-import tbf.tools.cpatiger as cpatiger
-import tbf.tools.crest as crest
-import tbf.tools.fshell as fshell
-import tbf.tools.klee as klee
-import tbf.tools.random_tester as random_tester
 import tbf.utils as utils
+import tbf.cache as cache
 import shutil
 
-from threading import Event, Thread
+from threading import Thread
 from multiprocessing.pool import ThreadPool
 from multiprocessing.context import TimeoutError
-from time import sleep
 
 from tbf.testcase_validation import ValidationConfig, ExecutionRunner
 
 __VERSION__ = "0.2-dev"
 
+# Modules of the supported input generators, by name.
+# A module is only imported when its input generator is used.
+tool_modules = {
+    'afl': 'tbf.tools.afl',
+    'fshell': 'tbf.tools.fshell',
+    'klee': 'tbf.tools.klee',
+    'crest': 'tbf.tools.crest',
+    'cpatiger': 'tbf.tools.cpatiger',
+    'random': 'tbf.tools.random_tester'
+}
+
+
+def get_tool_module(name):
+    """Returns the module of the input generator with the given name."""
+    if name not in tool_modules:
+        raise utils.ConfigError('Unknown input generator: ' + name)
+    return importlib.import_module(tool_modules[name])
+
 
 def _create_cli_arg_parser():
     parser = argparse.ArgumentParser(
@@ -41,8 +54,32 @@ def _create_cli_arg_parser():
         dest="input_generator",
         action="store",
         required=True,
+        nargs="+",
         choices=['afl', 'fshell', 'klee', 'crest', 'cpatiger', 'random'],
-        help="input generator to use")
+        help=
+        "input generator to use. If multiple input generators are given, they run concurrently"
+    )
+
+    input_generator_args.add_argument(
+        "--portfolio-timeshare",
+        dest="portfolio_timeshare",
+        metavar="SHARE",
+        nargs="+",
+        type=float,
+        default=None,
+        help=
+        "share of the input generation time limit for each of the input generators, in the order of --input-generator"
+    )
+
+    input_generator_args.add_argument(
+        "--portfolio-cores",
+        dest="portfolio_cores",
+        metavar="CORES",
+        nargs="+",
+        default=None,
+        help=
+        "CPU cores to run each of the input generators on, in the order of --input-generator (e.g., '0-1 2 3')"
+    )
 
     input_generator_args.add_argument(
         "--use-existing-test-dir",
@@ -60,7 +97,80 @@ def _create_cli_arg_parser():
         "-s",
         dest="strategy",
         nargs="+",
-        help="search heuristics to use")
+        help="search heuristics to use. If multiple heuristics are given for"
+        " CREST, one CREST process runs for each of them concurrently")
+
+    input_generator_args.add_argument(
+        "--parallel-strategies",
+        dest="parallel_strategies",
+        metavar="STRATEGY",
+        nargs="+",
+        default=None,
+        help="search heuristics of KLEE processes to run concurrently on the"
+        " same program, one comma-separated list of heuristics for each"
+        " process (e.g., 'random-path,nurs:covnew' dfs)")
+
+    input_generator_args.add_argument(
+        "--strategy-shares",
+        dest="strategy_shares",
+        metavar="SHARE",
+        nargs="+",
+        type=float,
+        default=None,
+        help="share of the CPU cores for each of the --parallel-strategies"
+        " (default: equal shares)")
+
+    input_generator_args.add_argument(
+        "--crest-iterations",
+        dest="crest_iterations",
+        type=int,
+        default=100000,
+        help="number of iterations of each CREST search strategy"
+        " (default: 100000)")
+
+    input_generator_args.add_argument(
+        "--strategy-iterations",
+        dest="strategy_iterations",
+        metavar="ITERATIONS",
+        nargs="+",
+        type=int,
+        default=None,
+        help="number of iterations for each of the CREST search strategies,"
+        " in the order of --strategy")
+
+    input_generator_args.add_argument(
+        "--strategy-timelimits",
+        dest="strategy_timelimits",
+        metavar="TIMELIMIT",
+        nargs="+",
+        type=int,
+        default=None,
+        help="time limit (in s) for each of the CREST search strategies,"
+        " in the order of --strategy")
+
+    input_generator_args.add_argument(
+        "--seed",
+        dest="seed",
+        type=int,
+        default=None,
+        help="seed of the random tester. Runs with the same seed create the"
+        " same tests (default: a random seed)")
+
+    input_generator_args.add_argument(
+        "--random-shards",
+        dest="random_shards",
+        type=int,
+        default=1,
+        help="number of processes that the random tester creates tests with"
+        " concurrently. Each process uses its own seeds (default: 1)")
+
+    input_generator_args.add_argument(
+        "--fuzz-jobs",
+        dest="fuzz_jobs",
+        type=int,
+        default=1,
+        help="number of AFL instances to fuzz with concurrently. All instances"
+        " share their findings (default: 1)")
 
     input_generator_args.add_argument(
         "--ig-timelimit",
@@ -111,6 +221,31 @@ def _create_cli_arg_parser():
         default=False,
         help="use test execution to find successful test vector")
 
+    validation_args.add_argument(
+        '--fork-server',
+        dest="fork_server",
+        action="store_true",
+        default=False,
+        help=
+        "start the test harness only once and fork it for each test vector during test execution"
+    )
+
+    validation_args.add_argument(
+        '--validation-workers',
+        dest="validation_workers",
+        type=int,
+        default=1,
+        help="number of test vectors to execute in parallel during test execution"
+    )
+
+    validation_args.add_argument(
+        "--no-deduplication",
+        dest="deduplicate",
+        action="store_false",
+        default=True,
+        help="validate test vectors even if a test vector with the same values was already validated"
+    )
+
     validation_args.add_argument(
         "--klee-replay",
         dest="klee_replay_validation",
@@ -180,6 +315,39 @@ def _create_cli_arg_parser():
         default=True,
         help="do not report coverage of the executed test cases")
 
+    run_args.add_argument(
+        '--parallel-dialect-probe',
+        dest='parallel_dialect_probe',
+        action='store_true',
+        default=False,
+        help=
+        "check concurrently with which C standards the program under test compiles"
+    )
+
+    run_args.add_argument(
+        '--cache-dir',
+        dest='cache_dir',
+        type=str,
+        default=cache.default_cache_dir,
+        help="directory to cache compiled artifacts in across runs (default: {})".
+        format(cache.default_cache_dir))
+
+    run_args.add_argument(
+        '--cache-size',
+        dest='cache_size',
+        type=int,
+        default=cache.default_cache_size,
+        help=
+        "maximum size of each cache in MB. Least recently used entries are removed first (default: {})".
+        format(cache.default_cache_size))
+
+    run_args.add_argument(
+        '--no-cache',
+        dest='use_cache',
+        action='store_false',
+        default=True,
+        help="do not cache compiled artifacts across runs")
+
     run_args.add_argument(
         '--stats',
         dest='print_stats',
@@ -210,6 +378,66 @@ def _parse_cli_args(argv):
         raise AssertionError("Unhandled machine model arg: " +
                              args.machine_model)
 
+    if args.validation_workers < 1:
+        sys.exit("Number of validation workers must be at least 1")
+    if args.random_shards < 1:
+        sys.exit("Number of random shards must be at least 1")
+    if args.fuzz_jobs < 1:
+        sys.exit("Number of fuzz jobs must be at least 1")
+    if args.seed is not None and not 0 <= args.seed < 2**64:
+        sys.exit("Seed must be between 0 and 2^64 - 1")
+
+    args.input_generator = [i.lower() for i in args.input_generator]
+    if len(set(args.input_generator)) != len(args.input_generator):
+        sys.exit("Input generators must not be given more than once")
+    if args.portfolio_timeshare:
+        if len(args.portfolio_timeshare) != len(args.input_generator):
+            sys.exit("Exactly one time share per input generator required")
+        if not args.ig_timelimit:
+            sys.exit("Time shares require an input generation time limit")
+    if args.portfolio_cores:
+        if len(args.portfolio_cores) != len(args.input_generator):
+            sys.exit("Exactly one set of CPU cores per input generator required")
+        try:
+            args.portfolio_cores = [
+                _parse_cpu_cores(c) for c in args.portfolio_cores
+            ]
+        except ValueError:
+            sys.exit("Invalid CPU cores: " + ' '.join(args.portfolio_cores))
+
+    if args.parallel_strategies:
+        if 'klee' not in args.input_generator:
+            sys.exit("Parallel strategies require KLEE as input generator")
+        if args.strategy:
+            sys.exit("Parallel strategies can't be combined with --strategy")
+        args.parallel_strategies = [
+            s.split(',') for s in args.parallel_strategies
+        ]
+    if args.strategy_shares:
+        if not args.parallel_strategies or len(args.strategy_shares) != len(
+                args.parallel_strategies):
+            sys.exit("Exactly one share per parallel strategy required")
+        if any([s <= 0 for s in args.strategy_shares]):
+            sys.exit("Strategy shares must be positive")
+
+    if args.crest_iterations < 1:
+        sys.exit("Number of CREST iterations must be at least 1")
+    for per_strategy_values in (args.strategy_iterations,
+                                args.strategy_timelimits):
+        if not per_strategy_values:
+            continue
+        if 'crest' not in args.input_generator:
+            sys.exit("Per-strategy budgets require CREST as input generator")
+        if not args.strategy or len(per_strategy_values) != len(
+                args.strategy):
+            sys.exit("Exactly one budget per --strategy required")
+        if any([v < 1 for v in per_strategy_values]):
+            sys.exit("Per-strategy budgets must be at least 1")
+
+    if args.cache_size < 0:
+        sys.exit("Cache size must not be negative")
+    args.cache_dir = os.path.abspath(args.cache_dir)
+
     if args.existing_tests_dir:
         if not os.path.exists(args.existing_tests_dir):
             sys.exit("Directory doesn't exist: " + args.existing_tests_dir)
@@ -219,97 +447,170 @@ def _parse_cli_args(argv):
     return args
 
 
-def _get_input_generator(args):
-    input_generator = args.input_generator.lower()
-
-    if input_generator == 'afl':
-        return afl.InputGenerator(args.ig_timelimit, args.machine_model,
-                                  args.log_verbose)
-
-    elif input_generator == 'fshell':
-        return fshell.InputGenerator(args.ig_timelimit, args.machine_model,
-                                     args.log_verbose)
+def _parse_cpu_cores(cores_spec):
+    cores = set()
+    for part in cores_spec.split(','):
+        if '-' in part:
+            first, last = part.split('-')
+            cores.update(range(int(first), int(last) + 1))
+        else:
+            cores.add(int(part))
+    return cores
+
+
+def _get_input_generator(args, workspace):
+    if len(args.input_generator) == 1:
+        return _create_input_generator(args, workspace, args.input_generator[0],
+                                       args.ig_timelimit)
+
+    generators = list()
+    for idx, input_generator in enumerate(args.input_generator):
+        timelimit = args.ig_timelimit
+        if args.portfolio_timeshare:
+            # A time limit of 0 would mean no time limit at all
+            timelimit = max(
+                1, int(float(timelimit) * args.portfolio_timeshare[idx]))
+        generator = _create_input_generator(args, workspace, input_generator,
+                                            timelimit)
+        if args.portfolio_cores:
+            generator.cpu_cores = args.portfolio_cores[idx]
+        generators.append(generator)
+    import tbf.portfolio as portfolio
+    return portfolio.InputGenerator(workspace, generators, args.ig_timelimit,
+                                    args.machine_model, args.log_verbose)
+
+
+def _create_input_generator(args, workspace, input_generator, timelimit):
+    generator = _construct_input_generator(args, workspace, input_generator,
+                                           timelimit)
+    generator.build_cache = cache.create_cache(args, 'builds')
+    return generator
+
+
+def _construct_input_generator(args, workspace, input_generator, timelimit):
+    tool = get_tool_module(input_generator)
+    if input_generator in ('afl', 'fshell', 'random'):
+        tool_args = dict()
+        if input_generator == 'afl':
+            tool_args = {
+                'fuzz_jobs': args.fuzz_jobs,
+                'corpus_cache': cache.create_cache(args, 'corpus')
+            }
+        elif input_generator == 'random':
+            tool_args = {'seed': args.seed, 'shards': args.random_shards}
+        return tool.InputGenerator(workspace, timelimit, args.machine_model,
+                                   args.log_verbose, **tool_args)
 
     elif input_generator == 'klee':
         if args.strategy:
-            return klee.InputGenerator(
-                args.ig_timelimit,
+            return tool.InputGenerator(
+                workspace,
+                timelimit,
                 args.log_verbose,
                 args.strategy,
                 machine_model=args.machine_model)
         else:
-            return klee.InputGenerator(
-                args.ig_timelimit,
+            return tool.InputGenerator(
+                workspace,
+                timelimit,
                 args.log_verbose,
-                machine_model=args.machine_model)
+                machine_model=args.machine_model,
+                parallel_search_heuristics=args.parallel_strategies,
+                strategy_shares=args.strategy_shares)
 
     elif input_generator == 'crest':
         if args.strategy:
-            if len(args.strategy) != 1:
-                raise utils.ConfigError(
-                    "Crest requires exactly one strategy. Given strategies: " +
-                    args.strategy)
-            return crest.InputGenerator(
-                args.ig_timelimit,
+            # Multiple strategies run concurrently
+            return tool.InputGenerator(
+                workspace,
+                timelimit,
                 args.log_verbose,
-                args.strategy[0],
-                machine_model=args.machine_model)
+                args.strategy,
+                machine_model=args.machine_model,
+                num_iterations=args.crest_iterations,
+                strategy_iterations=args.strategy_iterations,
+                strategy_timelimits=args.strategy_timelimits)
         else:
-            return crest.InputGenerator(
-                args.ig_timelimit,
+            return tool.InputGenerator(
+                workspace,
+                timelimit,
                 args.log_verbose,
-                machine_model=args.machine_model)
+                machine_model=args.machine_model,
+                num_iterations=args.crest_iterations)
 
     elif input_generator == 'cpatiger':
-        return cpatiger.InputGenerator(
-            args.ig_timelimit,
+        return tool.InputGenerator(
+            workspace,
+            timelimit,
             args.log_verbose,
             machine_model=args.machine_model)
 
-    elif input_generator == 'random':
-        return random_tester.InputGenerator(
-            args.ig_timelimit, args.machine_model, args.log_verbose)
     else:
         raise utils.ConfigError('Unhandled input generator: ' + input_generator)
 
 
-def _get_validator(args, input_generator):
-    validator = args.input_generator.lower()
-    validation_config = ValidationConfig(args)
-    if validator == 'afl':
-        return afl.AflTestValidator(validation_config, input_generator)
-    elif validator == "fshell":
-        return fshell.FshellTestValidator(validation_config, input_generator)
-    elif validator == 'klee':
-        return klee.KleeTestValidator(validation_config, input_generator)
-    elif validator == 'crest':
-        return crest.CrestTestValidator(validation_config, input_generator)
-    elif validator == 'cpatiger':
-        return cpatiger.CpaTigerTestValidator(validation_config,
-                                              input_generator)
-    elif validator == 'random':
-        return random_tester.RandomTestValidator(validation_config,
-                                                 input_generator)
-    else:
+def _get_validator(args, input_generator, workspace):
+    validation_config = ValidationConfig(args, workspace)
+    if len(args.input_generator) == 1:
+        return _create_validator(args.input_generator[0], validation_config,
+                                 input_generator)
+
+    validators = dict()
+    for name, generator in zip(args.input_generator,
+                               input_generator.generators):
+        validators[generator] = _create_validator(name, validation_config,
+                                                  generator)
+    import tbf.portfolio as portfolio
+    return portfolio.PortfolioTestValidator(validation_config, input_generator,
+                                            validators)
+
+
+# Test validator class of each tool module
+_validator_classes = {
+    'afl': 'AflTestValidator',
+    'fshell': 'FshellTestValidator',
+    'klee': 'KleeTestValidator',
+    'crest': 'CrestTestValidator',
+    'cpatiger': 'CpaTigerTestValidator',
+    'random': 'RandomTestValidator'
+}
+
+
+def _create_validator(validator, validation_config, input_generator):
+    if validator not in _validator_classes:
         raise AssertionError('Unhandled validator: ' + validator)
+    validator_class = getattr(
+        get_tool_module(validator), _validator_classes[validator])
+    return validator_class(validation_config, input_generator)
 
 
-def run(args, stop_all_event=None):
+def run(args, stop_all_event=None, workspace=None):
+    """
+    Runs TBF with the given arguments.
+
+    :param workspace: the workspace to use for the run. If None,
+        a new workspace with the default output directory is used
+    :return: the verdict and the statistics of the run
+    """
     default_err = "Unknown error"
 
     validation_result = utils.VerdictUnknown()
 
+    if workspace is None:
+        workspace = utils.Workspace()
     filename = os.path.abspath(args.file)
-    input_generator = _get_input_generator(args)
-    validator = _get_validator(args, input_generator)
+    input_generator = _get_input_generator(args, workspace)
+    validator = _get_validator(args, input_generator, workspace)
 
     validator_stats = None
     generator_stats = None
-    old_dir_abs = os.path.abspath('.')
     try:
-        os.chdir(utils.tmp)
-
-        utils.find_nondet_methods(filename, args.svcomp_nondets_only)
+        utils.determine_c_standard(workspace, filename, args.machine_model,
+                                   args.parallel_dialect_probe,
+                                   cache.create_cache(args, 'dialects'))
+        utils.find_nondet_methods(workspace, filename,
+                                  args.svcomp_nondets_only,
+                                  cache.create_cache(args, 'programs'))
         assert not stop_all_event.is_set(
         ), "Stop event is already set before starting input generation"
 
@@ -351,7 +652,7 @@ def run(args, stop_all_event=None):
 
         if stop_all_event.is_set():
             logging.info("Stop-all event is set, returning from execution")
-            return
+            return validation_result.verdict, ""
 
         validation_result, validator_stats = validator.check_inputs(
             filename, is_ready, stop_all_event, args.existing_tests_dir)
@@ -367,23 +668,25 @@ def run(args, stop_all_event=None):
 
         if validation_result.is_positive():
             test_name = os.path.basename(validation_result.test_vector.origin)
-            persistent_test = utils.get_file_path(test_name, temp_dir=False)
+            persistent_test = workspace.get_file_path(
+                test_name, temp_dir=False)
             shutil.copy(validation_result.test_vector.origin, persistent_test)
 
             if validation_result.harness is not None:
-                persistent_harness = utils.get_file_path(
+                persistent_harness = workspace.get_file_path(
                     'harness.c', temp_dir=False)
                 shutil.copy(validation_result.harness, persistent_harness)
 
                 # Create an ExecutionRunner only for the purpose of
                 # compiling the persistent harness
-                validator = ExecutionRunner(args.machine_model,
+                validator = ExecutionRunner(workspace, args.machine_model,
                                             validation_result.test)
-                final_harness_name = utils.get_file_path('a.out', temp_dir=False)
+                final_harness_name = workspace.get_file_path(
+                    'a.out', temp_dir=False)
                 validator.compile(filename, persistent_harness, final_harness_name)
 
             if validation_result.witness is not None:
-                persistent_witness = utils.get_file_path(
+                persistent_witness = workspace.get_file_path(
                     'witness.graphml', temp_dir=False)
                 shutil.copy(validation_result.witness, persistent_witness)
 
@@ -400,8 +703,6 @@ def run(args, stop_all_event=None):
     except FileNotFoundError as e:
         logging.error("File not found: %s", e.filename)
     finally:
-        os.chdir(old_dir_abs)
-
         statistics = ""
         if generator_stats:
             statistics += str(generator_stats)
@@ -410,7 +711,7 @@ def run(args, stop_all_event=None):
                 statistics += "\n\n"
             statistics += str(validator_stats)
         verdict_str = "\nTBF verdict: " + validation_result.verdict.upper()
-        with open(utils.get_file_path('Statistics.txt', temp_dir=False),
+        with open(workspace.get_file_path('Statistics.txt', temp_dir=False),
                   'w+') as stats:
             stats.write(statistics)
             stats.write('\n')
@@ -423,14 +724,17 @@ def run(args, stop_all_event=None):
         print(verdict_str)
 
         if args.keep_files:
-            created_dir = utils.get_file_path('created_files', temp_dir=False)
+            created_dir = workspace.get_file_path(
+                'created_files', temp_dir=False)
             logging.info("Moving created files to %s .", created_dir)
             if os.path.exists(created_dir):
                 # despite the name, ignore_errors=True allows removal of non-empty directories
                 shutil.rmtree(created_dir, ignore_errors=True)
-            shutil.move(utils.tmp, created_dir)
+            shutil.move(workspace.tmp, created_dir)
         else:
-            shutil.rmtree(utils.tmp, ignore_errors=True)
+            shutil.rmtree(workspace.tmp, ignore_errors=True)
+
+    return validation_result.verdict, statistics
 
 
 def _setup_environment():
@@ -449,26 +753,27 @@ def _setup_environment():
     os.environ['LD_LIBRARY_PATH'] = ':'.join(new_ld_path)
 
 
-def main():
-    timeout_watch = utils.Stopwatch()
-    timeout_watch.start()
+def run_with_timelimit(args, workspace=None, stop_event=None):
+    """
+    Runs TBF with the given arguments and stops it after the time limit
+    given in the arguments.
 
-    _setup_environment()
+    :param stop_event: Event to stop the run early
 
-    args = _parse_cli_args(sys.argv[1:])
-
-    if args.log_verbose:
-        logging.getLogger().setLevel(level=logging.DEBUG)
-    else:
-        logging.getLogger().setLevel(level=logging.INFO)
+    :return: the verdict and the statistics of the run,
+        or None if the run didn't finish
+    """
+    timeout_watch = utils.Stopwatch()
+    timeout_watch.start()
 
-    stop_event = Event()
-    running_thread = Thread(target=run, args=(args, stop_event))
+    if stop_event is None:
+        stop_event = utils.SelectableEvent()
+    outcome = list()
+    running_thread = Thread(
+        target=lambda: outcome.append(run(args, stop_event, workspace)))
     try:
         running_thread.start()
-        while running_thread.is_alive() and (
-                not args.timelimit or timeout_watch.curr_s() < args.timelimit):
-            sleep(0.1)
+        running_thread.join(args.timelimit)
     finally:
         timeout_watch.stop()
         if args.timelimit and timeout_watch.sum() >= args.timelimit:
@@ -478,6 +783,27 @@ def main():
         stop_event.set()
         while running_thread.is_alive():
             running_thread.join(5)
+    return outcome[0] if outcome else None
+
+
+def main():
+    _setup_environment()
+
+    if sys.argv[1:2] == ['batch']:
+        import tbf.batch as batch
+        return batch.main(sys.argv[2:])
+    if sys.argv[1:2] == ['serve']:
+        import tbf.serve as serve
+        return serve.main(sys.argv[2:])
+
+    args = _parse_cli_args(sys.argv[1:])
+
+    if args.log_verbose:
+        logging.getLogger().setLevel(level=logging.DEBUG)
+    else:
+        logging.getLogger().setLevel(level=logging.INFO)
+
+    run_with_timelimit(args)
 
 
 if __name__ == '__main__':
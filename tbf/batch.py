@@ -0,0 +1,187 @@
+import argparse
+import contextlib
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import re
+import sys
+
+import tbf
+import tbf.utils as utils
+
+results_file = 'results.jsonl'
+log_file = 'tbf.log'
+
+_input_files_pattern = re.compile(
+    r'^input_files:\s*[\'"]?([^\'"\s]+)[\'"]?\s*$', re.MULTILINE)
+
+
+def _create_cli_arg_parser():
+    parser = argparse.ArgumentParser(
+        prog='tbf batch',
+        description='Runs TBF on many programs, with one process per program. '
+        'All arguments after -- are passed to each run of TBF.')
+
+    parser.add_argument(
+        '--workers',
+        dest='workers',
+        type=int,
+        default=os.cpu_count(),
+        help='number of programs to check in parallel')
+
+    parser.add_argument(
+        '--output-dir',
+        dest='output_dir',
+        default=os.path.abspath('./batch-output'),
+        help='directory to write the results to')
+
+    parser.add_argument(
+        '--files-from',
+        dest='files_from',
+        default=None,
+        help='file that lists one program or .set file per line')
+
+    parser.add_argument(
+        'files',
+        nargs='*',
+        help='programs to check, or BenchExec .set files that list them')
+
+    return parser
+
+
+def _read_task_definition(yml_file):
+    with open(yml_file, 'r') as inp:
+        content = inp.read()
+    match = _input_files_pattern.search(content)
+    if not match:
+        logging.warning("Can't find single input file in %s, skipping it",
+                        yml_file)
+        return []
+    yml_dir = os.path.dirname(os.path.abspath(yml_file))
+    return [os.path.join(yml_dir, match.group(1))]
+
+
+def _read_set_file(set_file):
+    set_dir = os.path.dirname(os.path.abspath(set_file))
+    programs = list()
+    with open(set_file, 'r') as inp:
+        for line in inp:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            matches = sorted(glob.glob(os.path.join(set_dir, line)))
+            if not matches:
+                logging.warning("Pattern %s of %s doesn't match any file", line,
+                                set_file)
+            programs += matches
+    return programs
+
+
+def get_programs(files):
+    """
+    Returns the programs to check for the given list of programs,
+    BenchExec .set files and task-definition files.
+    """
+    programs = list()
+    for f in files:
+        if f.endswith('.set'):
+            programs += get_programs(_read_set_file(f))
+        elif f.endswith('.yml'):
+            programs += _read_task_definition(f)
+        else:
+            programs.append(os.path.abspath(f))
+    return programs
+
+
+def _run_task(task):
+    index, program, tbf_args, output_dir = task
+    workspace = utils.Workspace(output_dir)
+
+    # Workers run many tasks, so handlers of earlier tasks must not
+    # keep their log files open
+    logger = logging.getLogger()
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+    timer = utils.Stopwatch()
+    timer.start()
+    verdict, statistics = utils.UNKNOWN, None
+    # Log messages and output to stdout share one file handle,
+    # so that they don't overwrite each other
+    with open(os.path.join(output_dir, log_file), 'a', buffering=1) as outp:
+        handler = logging.StreamHandler(outp)
+        logger.addHandler(handler)
+        try:
+            with contextlib.redirect_stdout(outp):
+                try:
+                    args = tbf._parse_cli_args(tbf_args + [program])
+                    if args.log_verbose:
+                        logger.setLevel(level=logging.DEBUG)
+                    else:
+                        logger.setLevel(level=logging.INFO)
+                    outcome = tbf.run_with_timelimit(args, workspace)
+                    if outcome:
+                        verdict, statistics = outcome
+                except (Exception, SystemExit) as e:
+                    logging.exception("Run failed: %s", e)
+                    verdict = utils.ERROR
+        finally:
+            logger.removeHandler(handler)
+            handler.close()
+    timer.stop()
+
+    return {
+        'index': index,
+        'file': program,
+        'verdict': verdict,
+        'time': timer.sum(),
+        'output_dir': output_dir,
+        'statistics': statistics
+    }
+
+
+def main(argv):
+    if '--' in argv:
+        tbf_args = argv[argv.index('--') + 1:]
+        argv = argv[:argv.index('--')]
+    else:
+        tbf_args = []
+    args = _create_cli_arg_parser().parse_args(argv)
+
+    if args.workers < 1:
+        sys.exit("Number of workers must be at least 1")
+    files = list(args.files)
+    if args.files_from:
+        with open(args.files_from, 'r') as inp:
+            files += [l.strip() for l in inp if l.strip()]
+    programs = get_programs(files)
+    if not programs:
+        sys.exit("No programs to check")
+    # Fail early on invalid arguments, not once for each task
+    tbf._parse_cli_args(tbf_args + [programs[0]])
+
+    output_dir = os.path.abspath(args.output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = [(idx, program, tbf_args,
+              os.path.join(output_dir, '{:05d}-{}'.format(
+                  idx, os.path.basename(program))))
+             for idx, program in enumerate(programs)]
+
+    logging.getLogger().setLevel(level=logging.INFO)
+    logging.info("Checking %s programs with %s workers", len(tasks),
+                 args.workers)
+    # The workers are forked from this process, so they start with
+    # the already initialized parser.
+    utils.get_parser()
+    # Logging and stdout are process-wide, so each worker
+    # runs one task at a time.
+    context = multiprocessing.get_context('fork')
+    with context.Pool(args.workers) as pool:
+        with open(os.path.join(output_dir, results_file), 'w+') as outp:
+            for result in pool.imap_unordered(_run_task, tasks):
+                outp.write(json.dumps(result) + '\n')
+                outp.flush()
+                print('{}: {}'.format(result['file'], result['verdict']))
@@ -0,0 +1,146 @@
+import os
+import shutil
+import hashlib
+import json
+import logging
+import tempfile
+import time
+
+import tbf.utils as utils
+
+default_cache_dir = os.path.join(
+    os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'tbf')
+default_cache_size = 1024  # in MB
+
+_metadata_file = 'meta.json'
+
+
+class ArtifactCache(object):
+    """
+    Content-addressed cache of files on disk, shared by all TBF runs.
+
+    Each entry is a directory named after the hash of its key and holds
+    one or more files and optional metadata.
+    If the cache grows beyond its size limit, the least recently used
+    entries are evicted.
+    """
+
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+
+        self.hits = utils.Counter()
+        self.misses = utils.Counter()
+
+    @staticmethod
+    def get_key(*parts):
+        sha1 = hashlib.sha1()
+        for p in parts:
+            sha1.update(repr(p).encode())
+            sha1.update(b'\0')
+        return sha1.hexdigest()
+
+    def _get_entry(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key, target_dir):
+        """
+        Copies the files of the entry with the given key to the given directory.
+
+        :return: the data stored with the entry, or None if the key is not cached
+        """
+        entry = self._get_entry(key)
+        try:
+            with open(os.path.join(entry, _metadata_file), 'r') as inp:
+                metadata = json.load(inp)
+            for f in metadata['files']:
+                shutil.copy2(os.path.join(entry, f), target_dir)
+            # Mark as recently used
+            os.utime(entry)
+        except (OSError, ValueError, KeyError):
+            self.misses.inc()
+            return None
+        self.hits.inc()
+        return metadata['data']
+
+    def put(self, key, files, data=None, replace=False):
+        """
+        Stores copies of the given files under the given key.
+        Files are stored by their base name.
+
+        :param data: dict of additional, JSON-serializable data to store
+        :param replace: whether to replace an existing entry with the key
+        """
+        entry = self._get_entry(key)
+        if os.path.exists(entry) and not replace:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Write into a temporary directory first, so that concurrent
+            # TBF runs never see incomplete entries
+            new_entry = tempfile.mkdtemp(dir=self.directory, prefix='.new-')
+            for f in files:
+                shutil.copy2(f, new_entry)
+            metadata = {
+                'files': [os.path.basename(f) for f in files],
+                'data': data if data else dict()
+            }
+            with open(os.path.join(new_entry, _metadata_file), 'w+') as outp:
+                json.dump(metadata, outp)
+            old_entry = new_entry + '.old'
+            if replace:
+                try:
+                    os.rename(entry, old_entry)
+                except OSError:
+                    # No entry to replace
+                    pass
+            try:
+                os.rename(new_entry, entry)
+            except OSError:
+                # Another run stored the same entry in the meantime
+                shutil.rmtree(new_entry, ignore_errors=True)
+            shutil.rmtree(old_entry, ignore_errors=True)
+            self._evict()
+        except OSError as e:
+            logging.warning("Can't write to cache %s: %s", self.directory, e)
+
+    def _get_size(self, entry):
+        size = 0
+        for f in os.listdir(entry):
+            size += os.path.getsize(os.path.join(entry, f))
+        return size
+
+    def _evict(self):
+        entries = list()
+        for name in os.listdir(self.directory):
+            entry = os.path.join(self.directory, name)
+            try:
+                if name.startswith('.new-'):
+                    # Left over by a run that was killed while writing
+                    if os.path.getmtime(entry) < time.time() - 3600:
+                        shutil.rmtree(entry, ignore_errors=True)
+                    continue
+                entries.append((os.path.getmtime(entry), self._get_size(entry),
+                                entry))
+            except OSError:
+                # Evicted by another run in the meantime
+                pass
+
+        total_size = sum([size for _, size, _ in entries])
+        for _, size, entry in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            logging.debug("Evicting cache entry %s", entry)
+            shutil.rmtree(entry, ignore_errors=True)
+            total_size -= size
+
+
+def create_cache(args, name):
+    """
+    Returns the cache with the given name, as configured by the command-line
+    arguments, or None if caching is disabled.
+    """
+    if not args.use_cache:
+        return None
+    return ArtifactCache(
+        os.path.join(args.cache_dir, name), args.cache_size * 1024 * 1024)
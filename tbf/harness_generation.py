@@ -1,5 +1,63 @@
+import hashlib
+import re
 import tbf.utils as utils
 
+# Size of the buffer that the harness reads each input value into
+input_size = 3000
+
+# Integers as accepted by strtoull(value, &end, 0) with *end == 0
+_integer_pattern = re.compile(
+    rb'[ \t\n\v\f\r]*([+-]?)(0[xX][0-9a-fA-F]+|0[0-7]*|[1-9][0-9]*)')
+
+
+def _get_value_key(chunk):
+    if b'\0' in chunk:
+        # The harness only sees the value up to the null byte
+        # and may behave strangely, so we compare the exact bytes
+        return b'n' + len(chunk).to_bytes(4, 'little') + chunk
+    value = chunk[:-1] if chunk.endswith(b'\n') else chunk
+    match = _integer_pattern.fullmatch(value)
+    if match:
+        digits = match.group(2)
+        if digits[:2] in (b'0x', b'0X'):
+            number = int(digits[2:], 16)
+        elif digits.startswith(b'0'):
+            number = int(digits, 8)
+        else:
+            number = int(digits)
+        # strtoull saturates on overflow, we don't emulate that
+        if number < 2**64:
+            if match.group(1) == b'-':
+                number = -number % 2**64
+            return b'i' + number.to_bytes(8, 'little')
+    return b'r' + len(value).to_bytes(4, 'little') + value
+
+
+def get_input_key(input_vector):
+    """
+    Returns a key for the given input of a harness created by HarnessCreator.
+    Inputs with the same key make the harness return the same sequence
+    of values.
+
+    Integer values are compared by the value the harness parses,
+    all other values by their bytes.
+
+    The key covers all values of the input, including values that
+    the program never reads. Inputs that only differ in such values
+    get different keys, although the program behaves the same for them.
+    """
+    if type(input_vector) is not bytes:
+        input_vector = input_vector.encode()
+    key = hashlib.sha1()
+    position = 0
+    while position < len(input_vector):
+        # Same chunks as fgets(inp_var, input_size, stdin)
+        end = input_vector.find(b'\n', position, position + input_size - 1)
+        end = position + input_size - 1 if end < 0 else end + 1
+        key.update(_get_value_key(input_vector[position:end]))
+        position = end
+    return key.hexdigest()
+
 
 class HarnessCreator(object):
 
@@ -81,7 +139,8 @@ class HarnessCreator(object):
                                                  method['params']).encode()
             definitions += b' {\n'
             if method['type'] != 'void':
-                definitions += "    unsigned int inp_size = 3000;\n".encode()
+                definitions += "    unsigned int inp_size = {};\n".format(
+                    input_size).encode()
                 definitions += "    char * inp_var = malloc(inp_size);\n".encode(
                 )
                 if test_vector is None:  # Build generic harness
@@ -119,3 +178,137 @@ class HarnessCreator(object):
                                                        test_vector)
 
         return harness
+
+    def create_fork_server(self):
+        """
+        Returns the source of the fork-server barrier that can be linked
+        to a generic harness.
+
+        The barrier is a constructor that runs before main.
+        If the harness is started with the file descriptors of a control
+        and a status pipe in the environment (variables TBF_FORKSRV_CTL
+        and TBF_FORKSRV_ST), the barrier reads length-prefixed test vectors
+        from the control pipe and forks one child for each of them.
+        The child leaves the constructor and runs main with the test vector
+        as stdin. The barrier reports the raw wait status and everything
+        the child wrote to stderr on the status pipe.
+        If the variables are not set, the barrier does nothing.
+
+        The barrier must be compiled as its own translation unit,
+        so that its system includes can't clash with the program under test.
+        """
+        return b"""#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <stdint.h>
+#include <unistd.h>
+#include <sys/types.h>
+#include <sys/wait.h>
+
+static int __tbf_read_all(int fd, void * buf, size_t len) {
+    char * pos = buf;
+    while (len > 0) {
+        ssize_t r = read(fd, pos, len);
+        if (r <= 0) {
+            return -1;
+        }
+        pos += r;
+        len -= r;
+    }
+    return 0;
+}
+
+static int __tbf_write_all(int fd, const void * buf, size_t len) {
+    const char * pos = buf;
+    while (len > 0) {
+        ssize_t w = write(fd, pos, len);
+        if (w <= 0) {
+            return -1;
+        }
+        pos += w;
+        len -= w;
+    }
+    return 0;
+}
+
+__attribute__((constructor)) static void __tbf_fork_server(void) {
+    char * ctl_env = getenv("TBF_FORKSRV_CTL");
+    char * st_env = getenv("TBF_FORKSRV_ST");
+    char * timeout_env = getenv("TBF_FORKSRV_TIMEOUT");
+    if (ctl_env == NULL || st_env == NULL) {
+        return;
+    }
+    int ctl_fd = atoi(ctl_env);
+    int st_fd = atoi(st_env);
+    unsigned int timeout = timeout_env ? atoi(timeout_env) : 0;
+    /* The program under test should see the same environment as without the fork server */
+    unsetenv("TBF_FORKSRV_CTL");
+    unsetenv("TBF_FORKSRV_ST");
+    unsetenv("TBF_FORKSRV_TIMEOUT");
+
+    while (1) {
+        uint32_t vector_size;
+        if (__tbf_read_all(ctl_fd, &vector_size, sizeof(vector_size)) != 0) {
+            _exit(0);
+        }
+        char * vector = malloc(vector_size + 1);
+        if (vector == NULL || __tbf_read_all(ctl_fd, vector, vector_size) != 0) {
+            _exit(1);
+        }
+
+        int err_pipe[2];
+        if (pipe(err_pipe) != 0) {
+            _exit(1);
+        }
+        pid_t child = fork();
+        if (child < 0) {
+            _exit(1);
+        }
+        if (child == 0) {
+            close(ctl_fd);
+            close(st_fd);
+            close(err_pipe[0]);
+            dup2(err_pipe[1], 2);
+            close(err_pipe[1]);
+            if (vector_size > 0) {
+                stdin = fmemopen(vector, vector_size, "r");
+            } else {
+                stdin = fopen("/dev/null", "r");
+            }
+            if (timeout > 0) {
+                alarm(timeout);
+            }
+            /* Continue to main */
+            return;
+        }
+
+        free(vector);
+        close(err_pipe[1]);
+        size_t err_capacity = 4096;
+        size_t err_size = 0;
+        char * err_output = malloc(err_capacity);
+        ssize_t r;
+        while ((r = read(err_pipe[0], err_output + err_size, err_capacity - err_size)) > 0) {
+            err_size += r;
+            if (err_size == err_capacity) {
+                err_capacity *= 2;
+                err_output = realloc(err_output, err_capacity);
+            }
+        }
+        close(err_pipe[0]);
+
+        int status;
+        if (waitpid(child, &status, 0) < 0) {
+            _exit(1);
+        }
+        int32_t raw_status = status;
+        uint32_t reported_size = err_size;
+        if (__tbf_write_all(st_fd, &raw_status, sizeof(raw_status)) != 0
+                || __tbf_write_all(st_fd, &reported_size, sizeof(reported_size)) != 0
+                || __tbf_write_all(st_fd, err_output, err_size) != 0) {
+            _exit(1);
+        }
+        free(err_output);
+    }
+}
+"""
@@ -1,7 +1,107 @@
 import tbf.utils as utils
+import hashlib
+import itertools
 import os
+import sys
 import logging
 from abc import ABCMeta, abstractmethod
+from concurrent import futures
+
+# Hashes of the sources that prepared files and builds depend on,
+# by input generator module
+_source_hashes = dict()
+# Hashes of the files of the tools that builds depend on,
+# by file, modification time and size
+_build_input_hashes = dict()
+_tools_dir = os.path.join(os.path.dirname(__file__), 'tools')
+
+
+def _get_source_hash(generator_class):
+    module = sys.modules[generator_class.__module__]
+    if module not in _source_hashes:
+        sources = [
+            module.__file__, __file__, utils.__file__,
+            os.path.join(os.path.dirname(__file__), 'harness_generation.py')
+        ]
+        _source_hashes[module] = [utils.get_hash(s) for s in sources]
+    return _source_hashes[module]
+
+
+def get_files_in(directory):
+    """Returns all files in the given directory and its subdirectories."""
+    return sorted(
+        os.path.join(d, f) for d, _, files in os.walk(directory) for f in files)
+
+
+def _get_build_input_hashes(build_inputs):
+    hashes = list()
+    for build_input in build_inputs:
+        try:
+            stat = os.stat(build_input)
+        except FileNotFoundError:
+            hashes.append((os.path.relpath(build_input, _tools_dir), None))
+            continue
+        # Only hash files again if they changed
+        stat_key = (build_input, stat.st_mtime_ns, stat.st_size)
+        if stat_key not in _build_input_hashes:
+            _build_input_hashes[stat_key] = utils.get_hash(build_input)
+        hashes.append((os.path.relpath(build_input, _tools_dir),
+                       _build_input_hashes[stat_key]))
+    return hashes
+
+
+class ParallelCommands(object):
+    """
+    Commands that run at the same time, as a single command of
+    create_input_generation_cmds. They fail if any of them fails.
+    """
+
+    def __init__(self,
+                 commands,
+                 cpu_cores=None,
+                 timers=None,
+                 timelimits=None,
+                 cwds=None):
+        """
+        :param cpu_cores: the CPU cores to run each command on.
+            None to use the CPU cores of the input generator
+        :param timers: a Stopwatch for each command, to measure
+            the time that the command runs
+        :param timelimits: the time limit (in s) of each command.
+            None to use the time limit of the input generator
+        :param cwds: the working directory of each command.
+            None to use the temporary directory of the workspace
+        """
+        self.commands = commands
+        self.cpu_cores = cpu_cores if cpu_cores else [None] * len(commands)
+        self.timers = timers if timers else [None] * len(commands)
+        self.timelimits = timelimits if timelimits else [None] * len(commands)
+        self.cwds = cwds if cwds else [None] * len(commands)
+
+
+class StrategyStatistics(object):
+    """
+    Statistics of a search strategy that runs as one of ParallelCommands.
+    """
+
+    def __init__(self, statistics, strategy_name):
+        self.timer = utils.Stopwatch()
+        self.number_tests = utils.Constant(0)
+        self.tests_per_second = utils.Constant(0)
+
+        statistics.add_value('Time for strategy ' + strategy_name, self.timer)
+        statistics.add_value(
+            'Number of test cases of strategy ' + strategy_name,
+            self.number_tests)
+        statistics.add_value(
+            'Test cases per second of strategy ' + strategy_name,
+            self.tests_per_second)
+
+    def update(self, number_tests):
+        self.number_tests.value = number_tests
+        if self.timer.sum():
+            self.tests_per_second.value = round(
+                number_tests / self.timer.sum(), 2)
 
 
 class BaseInputGenerator(object):
@@ -23,16 +123,66 @@ class BaseInputGenerator(object):
 
     @abstractmethod
     def get_test_cases(self, exclude=(), directory=None):
+        """
+        Returns the test cases in the given directory, or in the directory
+        the input generator writes its tests to, if no directory is given.
+        """
+        return list()
+
+    def get_test_dirs(self, directory=None):
+        """
+        Returns the directories that new test files are written to,
+        or None if the input generator doesn't write one file per test.
+        The directories may not exist, yet.
+        """
+        return None
+
+    def create_test_case(self, test_file):
+        """
+        Returns the TestCase for the given test file,
+        or None if the file is not a test.
+        """
+        return None
+
+    def get_build_artifacts(self, filename):
+        """
+        Returns the files that the build commands create for the given
+        prepared file. All commands of create_input_generation_cmds
+        but the last are build commands.
+        """
         return list()
 
+    def get_build_inputs(self):
+        """
+        Returns the files of the input generator that its build commands
+        read, besides the prepared file, e.g., headers and compilers
+        that come with TBF. Builds are only reused if these didn't change.
+        """
+        return list()
+
+    def import_test_vectors(self, test_vectors):
+        """
+        Offers the given test vectors, which may be created by other
+        input generators, as seeds while input generation is running.
+        """
+        pass
+
     @staticmethod
     def failed(result):
         return result.returncode != 0
 
-    def __init__(self, timelimit, machine_model, log_verbose):
+    def __init__(self, workspace, timelimit, machine_model, log_verbose):
+        self.workspace = workspace
         self.machine_model = machine_model
         self.timelimit = int(timelimit) if timelimit else 0
         self.log_verbose = log_verbose
+        # Whether generate_input is running, i.e., whether new tests may appear
+        self.generation_running = False
+        # CPU cores to run the input generator on. None for all cores
+        self.cpu_cores = None
+        # ArtifactCache to reuse prepared files and builds from.
+        # None to always prepare and build
+        self.build_cache = None
         self.statistics = utils.Statistics("Input Generator " + self.get_name())
 
         self.timer_file_access = utils.Stopwatch()
@@ -41,6 +191,10 @@ class BaseInputGenerator(object):
         self.timer_generator = utils.Stopwatch()
 
         self.number_generated_tests = utils.Constant()
+        self.number_reused_builds = utils.Counter()
+        self.counter_output_size = utils.Counter()
+        # Numbers of the log files that commands write their output to
+        self._output_logs = itertools.count()
 
         self.statistics.add_value('Time for full input generation',
                                   self.timer_input_gen)
@@ -52,6 +206,10 @@ class BaseInputGenerator(object):
                                   self.timer_prepare)
         self.statistics.add_value('Number of generated test cases',
                                   self.number_generated_tests)
+        self.statistics.add_value('Number of reused builds',
+                                  self.number_reused_builds)
+        self.statistics.add_value('Bytes of test case generator output',
+                                  self.counter_output_size)
 
     @abstractmethod
     def prepare(self, filecontent, nondet_methods_used):
@@ -59,8 +217,8 @@ class BaseInputGenerator(object):
 
     def prepare0(self, filecontent):
         content = filecontent
-        content = utils.rewrite_cproblems(content)
-        nondet_methods_used = utils.get_nondet_methods()
+        content = self.workspace.get_rewritten_content(content)
+        nondet_methods_used = self.workspace.get_nondet_methods()
         content += '\n'
         content += 'struct _IO_FILE;\ntypedef struct _IO_FILE FILE;\n'
         content += "extern struct _IO_FILE *stdin;\n"
@@ -76,15 +234,30 @@ class BaseInputGenerator(object):
     def generate_input(self, filename, stop_flag):
         default_err = "Unknown error"
         self.timer_input_gen.start()
+        self.generation_running = True
         try:
-            file_to_analyze = utils.get_prepared_name(filename, self.get_name())
+            file_to_analyze = self.workspace.get_prepared_name(
+                filename, self.get_name())
 
             self.timer_file_access.start()
             with open(filename, 'r') as outp:
                 filecontent = outp.read()
             self.timer_file_access.stop()
 
-            if os.path.exists(file_to_analyze):
+            build_key = None
+            reuse_build = False
+            if self.build_cache:
+                build_key = self._get_build_key(file_to_analyze, filecontent)
+                self.timer_prepare.start()
+                reuse_build = self.build_cache.get(
+                    build_key, self.workspace.tmp) is not None
+                self.timer_prepare.stop()
+
+            if reuse_build:
+                logging.debug("Using cached preparation and build of %s",
+                              file_to_analyze)
+                self.number_reused_builds.inc()
+            elif os.path.exists(file_to_analyze):
                 logging.warning(
                     "Prepared file already exists. Not preparing again.")
             else:
@@ -97,20 +270,16 @@ class BaseInputGenerator(object):
                 self.timer_prepare.stop()
 
             cmds = self.create_input_generation_cmds(file_to_analyze)
-            for cmd in cmds:
-                self.timer_generator.start()
-                result = utils.execute(
-                    cmd,
-                    env=self.get_run_env(),
-                    quiet=False,
-                    err_to_output=True,
-                    stop_flag=stop_flag,
-                    timelimit=self.timelimit)
-                self.timer_generator.stop()
-                if BaseInputGenerator.failed(result) \
-                        and stop_flag and not stop_flag.is_set():
-                    raise utils.InputGenerationError("Failed at command: " +
-                                                     ' '.join(cmd))
+            build_cmds, generation_cmd = cmds[:-1], cmds[-1]
+            if reuse_build:
+                build_cmds = []
+            build_succeeded = True
+            for cmd in build_cmds:
+                result = self._run_command(cmd, stop_flag)
+                build_succeeded = build_succeeded and result.returncode == 0
+            if build_key and not reuse_build and build_succeeded:
+                self._store_build(build_key, file_to_analyze)
+            self._run_command(generation_cmd, stop_flag)
 
             return self._get_success_and_stats()
 
@@ -126,6 +295,7 @@ class BaseInputGenerator(object):
             return self._get_failed_and_stats()
 
         finally:
+            self.generation_running = False
             self.timer_input_gen.stop()
             for n, s in self.statistics.stats:
                 if type(s) is utils.Stopwatch and s.is_running():
@@ -133,6 +303,83 @@ class BaseInputGenerator(object):
 
             self.number_generated_tests.value = len(self.get_test_cases())
 
+    def _run_command(self, cmd, stop_flag):
+        self.timer_generator.start()
+        try:
+            if isinstance(cmd, ParallelCommands):
+                with futures.ThreadPoolExecutor(len(cmd.commands)) as pool:
+                    results = list(
+                        pool.map(self._execute, cmd.commands,
+                                 [stop_flag] * len(cmd.commands), cmd.cpu_cores,
+                                 cmd.timers, cmd.timelimits, cmd.cwds))
+            else:
+                results = [self._execute(cmd, stop_flag)]
+        finally:
+            self.timer_generator.stop()
+        failed = [(c, r) for c, r in results if BaseInputGenerator.failed(r)]
+        if failed and stop_flag and not stop_flag.is_set():
+            raise utils.InputGenerationError("Failed at command: " +
+                                             ' '.join(failed[0][0]))
+        return failed[0][1] if failed else results[0][1]
+
+    def _execute(self,
+                 cmd,
+                 stop_flag,
+                 cpu_cores=None,
+                 timer=None,
+                 timelimit=None,
+                 cwd=None):
+        own_timelimit = timelimit and not (self.timelimit and
+                                           self.timelimit <= timelimit)
+        if not own_timelimit:
+            timelimit = self.timelimit
+        if not timer:
+            timer = utils.Stopwatch()
+        log_file = self.workspace.get_file_path(
+            '{}-{}.log'.format(self.get_name(), next(self._output_logs)),
+            temp_dir=False)
+        output_sink = utils.OutputSink(log_file, self.counter_output_size)
+        timer.start()
+        try:
+            result = utils.execute(
+                cmd,
+                env=self.get_run_env(),
+                quiet=False,
+                err_to_output=True,
+                stop_flag=stop_flag,
+                timelimit=timelimit,
+                cpu_cores=cpu_cores if cpu_cores else self.cpu_cores,
+                cwd=cwd if cwd else self.workspace.tmp,
+                output_sink=output_sink)
+        finally:
+            timer.stop()
+        if own_timelimit and BaseInputGenerator.failed(result) \
+                and timer.sum() >= timelimit:
+            # Running out of its own time budget is the expected end
+            # of the command, not a failure of input generation
+            logging.info("Time limit of %s s reached: %s", timelimit,
+                         ' '.join(cmd))
+            result = utils.ExecutionResult(0, result.stdout, result.stderr)
+        return cmd, result
+
+    def _get_build_key(self, prepared_file, filecontent):
+        return self.build_cache.get_key(
+            hashlib.sha1(filecontent.encode()).hexdigest(),
+            os.path.basename(prepared_file), self.get_name(),
+            self.machine_model.name, self.workspace.get_nondet_methods(),
+            self.workspace.get_c_standards(), utils.get_compiler_version(),
+            _get_source_hash(type(self)),
+            _get_build_input_hashes(self.get_build_inputs()))
+
+    def _store_build(self, build_key, prepared_file):
+        files = [prepared_file] + self.get_build_artifacts(prepared_file)
+        missing_files = [f for f in files if not os.path.exists(f)]
+        if missing_files:
+            logging.debug("Not caching build, files missing: %s",
+                          missing_files)
+            return
+        self.build_cache.put(build_key, files)
+
     def _get_failed_and_stats(self):
         return False, self.statistics
 
@@ -0,0 +1,150 @@
+import os
+from multiprocessing.pool import ThreadPool
+
+import tbf.utils as utils
+from tbf.input_generation import BaseInputGenerator
+from tbf.testcase_validation import TestValidator
+
+name = 'portfolio'
+
+
+def _get_prefix(generator):
+    return generator.get_name() + '.'
+
+
+class InputGenerator(BaseInputGenerator):
+    """
+    Runs several input generators concurrently.
+
+    The names of the created test cases are prefixed with the name
+    of the input generator that created them.
+    """
+
+    def __init__(self, workspace, generators, timelimit, machine_model,
+                 log_verbose):
+        self.generators = generators
+        super().__init__(workspace, timelimit, machine_model, log_verbose)
+
+    def get_name(self):
+        return name
+
+    def get_run_env(self):
+        return utils.get_env()
+
+    def create_input_generation_cmds(self, filename):
+        raise AssertionError("Portfolio runs the commands of its generators")
+
+    def prepare(self, filecontent, nondet_methods_used):
+        raise AssertionError("Portfolio runs the preparation of its generators")
+
+    def get_generator(self, test_name):
+        """
+        Returns the input generator that created the test with the given name,
+        and the name of the test for that input generator.
+        """
+        for generator in self.generators:
+            prefix = _get_prefix(generator)
+            if test_name.startswith(prefix):
+                return generator, test_name[len(prefix):]
+        raise AssertionError("Test of unknown input generator: " + test_name)
+
+    @staticmethod
+    def _with_prefix(generator, test_case):
+        return utils.TestCase(
+            _get_prefix(generator) + test_case.name, test_case.origin,
+            test_case.content)
+
+    def generate_input(self, filename, stop_flag):
+        self.timer_input_gen.start()
+        self.generation_running = True
+        try:
+            with ThreadPool(processes=len(self.generators)) as pool:
+                results = pool.map(
+                    lambda g: g.generate_input(filename, stop_flag),
+                    self.generators)
+        finally:
+            self.generation_running = False
+            self.timer_input_gen.stop()
+            self.number_generated_tests.value = len(self.get_test_cases())
+
+        statistics = utils.StatisticsPool()
+        statistics.add(self.statistics)
+        for _, generator_stats in results:
+            statistics.add(generator_stats)
+        return any([success for success, _ in results]), statistics
+
+    def import_test_vectors(self, test_vectors):
+        for generator in self.generators:
+            prefix = _get_prefix(generator)
+            generator.import_test_vectors(
+                [v for v in test_vectors if not v.name.startswith(prefix)])
+
+    def get_test_cases(self, exclude=(), directory=None):
+        excluded_by_generator = dict()
+        for test_name in exclude:
+            generator, generator_test_name = self.get_generator(test_name)
+            excluded_by_generator.setdefault(generator,
+                                             set()).add(generator_test_name)
+
+        tcs = list()
+        for generator in self.generators:
+            generator_exclude = excluded_by_generator.get(generator, ())
+            test_cases = generator.get_test_cases(generator_exclude, directory)
+            tcs += [self._with_prefix(generator, t) for t in test_cases]
+        return tcs
+
+    def get_test_dirs(self, directory=None):
+        all_dirs = list()
+        for generator in self.generators:
+            test_dirs = generator.get_test_dirs(directory)
+            if test_dirs is None:
+                # If one generator has to be polled, we poll all of them
+                return None
+            all_dirs += test_dirs
+        return all_dirs
+
+    def create_test_case(self, test_file):
+        test_dir = os.path.dirname(os.path.abspath(test_file))
+        for generator in self.generators:
+            test_dirs = generator.get_test_dirs()
+            if test_dirs is None or test_dir not in [
+                    os.path.abspath(d) for d in test_dirs
+            ]:
+                continue
+            test_case = generator.create_test_case(test_file)
+            if test_case:
+                return self._with_prefix(generator, test_case)
+        return None
+
+
+class PortfolioTestValidator(TestValidator):
+    """
+    Validates the test cases of all input generators of a portfolio
+    in a single validation pipeline.
+    """
+
+    def __init__(self, validation_config, input_generator, validators):
+        """
+        :param validators: the test validator of each input generator
+            of the portfolio, by input generator
+        """
+        super().__init__(validation_config, input_generator)
+        self.validators = validators
+
+    def get_name(self):
+        return name
+
+    def _get_validator(self, test):
+        generator, test_name = self._input_generator.get_generator(test.name)
+        test = utils.TestCase(test_name, test.origin, test.content)
+        return self.validators[generator], test
+
+    def can_create_witness(self, test):
+        generator, _ = self._input_generator.get_generator(test.name)
+        return self.validators[generator].can_create_witness(test)
+
+    def _get_test_vector(self, test):
+        validator, generator_test = self._get_validator(test)
+        vector = validator._get_test_vector(generator_test)
+        vector.name = test.name
+        return vector
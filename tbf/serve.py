@@ -0,0 +1,264 @@
+"""
+Long-lived TBF server that checks programs submitted over a Unix socket.
+
+A client connects to the socket and sends a single JSON line that
+describes the job::
+
+    {"file": "/path/to/program.c", "args": ["-i", "afl", "--execution"],
+     "output_dir": "/path/to/output"}
+
+`args` are the command-line arguments of TBF, without the program to check.
+`output_dir` is optional.
+The server answers with one JSON line per event, until the job is done:
+`queued`, `started`, `running` (repeatedly, while the job is running)
+and `finished` with the verdict and statistics of the run,
+or `error` if the job couldn't be run.
+If the client closes the connection, the job is stopped.
+
+Jobs run in threads of the server process, so they share the warm parser
+and all in-memory caches. Logging is process-wide and goes to the log
+of the server.
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import sys
+from threading import BoundedSemaphore, Event, Lock, Thread
+
+import tbf
+import tbf.utils as utils
+
+progress_interval = 5
+
+
+def get_default_socket():
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return os.path.join(runtime_dir, 'tbf.sock')
+    return '/tmp/tbf-{}.sock'.format(os.getuid())
+
+
+def _create_cli_arg_parser():
+    parser = argparse.ArgumentParser(
+        prog='tbf serve',
+        description='Runs TBF as a server that checks programs '
+        'submitted over a Unix socket.')
+
+    parser.add_argument(
+        '--socket',
+        dest='socket',
+        default=get_default_socket(),
+        help='path of the Unix socket to listen on')
+
+    parser.add_argument(
+        '--max-jobs',
+        dest='max_jobs',
+        type=int,
+        default=os.cpu_count(),
+        help='maximum number of jobs to run at the same time')
+
+    parser.add_argument(
+        '--output-dir',
+        dest='output_dir',
+        default=os.path.abspath('./serve-output'),
+        help='directory to create the output directory of each job in,'
+        ' if the job doesn\'t specify one')
+
+    parser.add_argument(
+        '--log-verbose',
+        dest='log_verbose',
+        action='store_true',
+        default=False,
+        help='print verbose information of the server and all jobs')
+
+    return parser
+
+
+class _ClientGone(Exception):
+    pass
+
+
+class JobHandler(socketserver.StreamRequestHandler):
+
+    def _send(self, event, **values):
+        values['event'] = event
+        values['job'] = self.job_id
+        try:
+            self.wfile.write((json.dumps(values) + '\n').encode())
+            self.wfile.flush()
+        except OSError:
+            raise _ClientGone()
+
+    def _client_gone(self):
+        try:
+            return self.request.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT) \
+                   == b''
+        except BlockingIOError:
+            return False
+        except OSError:
+            return True
+
+    def _read_job(self):
+        line = self.rfile.readline()
+        try:
+            job = json.loads(line.decode())
+            program = job['file']
+            tbf_args = job.get('args', [])
+            if not isinstance(program, str) or not isinstance(tbf_args, list):
+                raise ValueError("Invalid types")
+            output_dir = job.get('output_dir')
+        except (ValueError, KeyError, AttributeError, TypeError) as e:
+            raise utils.ConfigError("Invalid job description: " + str(e))
+        if not os.path.isabs(program):
+            raise utils.ConfigError("Path of program must be absolute")
+        if output_dir is None:
+            output_dir = os.path.join(self.server.output_dir,
+                                      'job-{}'.format(self.job_id))
+        try:
+            args = tbf._parse_cli_args([str(a) for a in tbf_args] + [program])
+        except SystemExit:
+            raise utils.ConfigError("Invalid arguments: " + ' '.join(
+                str(a) for a in tbf_args))
+        return args, output_dir
+
+    def _run_job(self, args, output_dir, stop_event):
+        workspace = utils.Workspace(output_dir)
+        outcome = list()
+        timer = utils.Stopwatch()
+        timer.start()
+        job_thread = Thread(
+            target=lambda: outcome.append(
+                tbf.run_with_timelimit(args, workspace, stop_event)))
+        job_thread.start()
+        try:
+            while job_thread.is_alive():
+                job_thread.join(progress_interval)
+                if self._client_gone():
+                    raise _ClientGone()
+                if job_thread.is_alive():
+                    self._send('running', time=timer.curr_s())
+        finally:
+            stop_event.set()
+            job_thread.join()
+            timer.stop()
+        verdict, statistics = utils.UNKNOWN, None
+        if outcome and outcome[0]:
+            verdict, statistics = outcome[0]
+        return verdict, statistics, timer.sum()
+
+    def handle(self):
+        self.job_id = self.server.next_job_id()
+        stop_event = utils.SelectableEvent()
+        self.server.stop_events.add(stop_event)
+        try:
+            args, output_dir = self._read_job()
+            self._send('queued')
+            with self.server.job_slots:
+                if self.server.stopping.is_set():
+                    raise utils.ConfigError("Server is shutting down")
+                self._send('started', output_dir=output_dir)
+                verdict, statistics, time = self._run_job(
+                    args, output_dir, stop_event)
+            self._send(
+                'finished',
+                verdict=verdict,
+                statistics=statistics,
+                output_dir=output_dir,
+                time=time)
+        except _ClientGone:
+            logging.info("Client of job %s disconnected, job stopped",
+                         self.job_id)
+        except utils.ConfigError as e:
+            self._send_error(str(e))
+        except Exception as e:
+            logging.exception("Job %s failed", self.job_id)
+            self._send_error("Job failed: " + str(e))
+        finally:
+            self.server.stop_events.discard(stop_event)
+
+    def _send_error(self, msg):
+        try:
+            self._send('error', message=msg)
+        except _ClientGone:
+            pass
+
+
+class JobServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, max_jobs, output_dir):
+        self.job_slots = BoundedSemaphore(max_jobs)
+        self.output_dir = output_dir
+        self.stop_events = set()
+        self.stopping = Event()
+        self._job_counter = 0
+        self._counter_lock = Lock()
+        super().__init__(socket_path, JobHandler)
+        os.chmod(socket_path, 0o600)
+
+    def next_job_id(self):
+        with self._counter_lock:
+            self._job_counter += 1
+            return self._job_counter
+
+    def stop_jobs(self):
+        self.stopping.set()
+        for stop_event in list(self.stop_events):
+            stop_event.set()
+
+
+def _remove_stale_socket(socket_path):
+    if not os.path.exists(socket_path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        os.remove(socket_path)
+    else:
+        sys.exit("TBF server already running on " + socket_path)
+    finally:
+        probe.close()
+
+
+def main(argv):
+    args = _create_cli_arg_parser().parse_args(argv)
+
+    if args.max_jobs < 1:
+        sys.exit("Number of jobs must be at least 1")
+    if args.log_verbose:
+        logging.getLogger().setLevel(level=logging.DEBUG)
+    else:
+        logging.getLogger().setLevel(level=logging.INFO)
+
+    socket_path = os.path.abspath(args.socket)
+    _remove_stale_socket(socket_path)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    # Create the parser once, before the first job needs it
+    utils.get_parser()
+    server = JobServer(socket_path, args.max_jobs,
+                       os.path.abspath(args.output_dir))
+
+    def shutdown(signum, frame):
+        # shutdown() blocks until serve_forever() returns,
+        # so it can't be called from the serving thread itself
+        Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    logging.info("Listening on %s with at most %s jobs at a time",
+                 socket_path, args.max_jobs)
+    try:
+        server.serve_forever()
+    finally:
+        server.stop_jobs()
+        server.server_close()
+        os.remove(socket_path)
+        logging.info("Server stopped")
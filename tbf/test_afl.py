@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+import unittest
+import tbf.tools.afl as afl
+import tbf.utils as utils
+from tbf.input_generation import ParallelCommands
+
+
+class TestParallelFuzzing(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        workspace = utils.Workspace(os.path.join(self.work_dir, 'output'))
+        self.generator = afl.InputGenerator(
+            workspace, None, utils.MACHINE_MODEL_64, False, fuzz_jobs=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def _add_test(self, instance, name, content):
+        queue_dir = os.path.join(self.generator.findings_dir, instance,
+                                 'queue')
+        os.makedirs(queue_dir, exist_ok=True)
+        with open(os.path.join(queue_dir, name), 'wb') as outp:
+            outp.write(content)
+
+    def test_fuzz_commands(self):
+        cmds = self.generator.create_input_generation_cmds('prog.c')
+        self.assertIsInstance(cmds[-1], ParallelCommands)
+        roles = [c[c.index('--') - 2:c.index('--')] for c in cmds[-1].commands]
+        self.assertEqual(roles, [['-M', 'fuzzer00'], ['-S', 'fuzzer01']])
+
+    def test_merges_queues(self):
+        self._add_test('fuzzer00', 'id:000000,orig:0.afl-test', b'0')
+        self._add_test('fuzzer01', 'id:000000,orig:0.afl-test', b'0')
+        self._add_test('fuzzer01', 'id:000001,sync:fuzzer00,src:000000',
+                       b'1')
+        self.assertEqual(
+            sorted(t.name for t in self.generator.get_test_cases()),
+            ['fuzzer00.id:000000,orig:0.afl-test',
+             'fuzzer01.id:000000,orig:0.afl-test'])
+
+        self._add_test('fuzzer00', 'id:000001,src:000000,op:havoc', b'2')
+        test_cases = self.generator.get_test_cases(
+            exclude=('fuzzer00.id:000000,orig:0.afl-test',
+                     'fuzzer01.id:000000,orig:0.afl-test'))
+        self.assertEqual([(t.name, t.content) for t in test_cases],
+                         [('fuzzer00.id:000001,src:000000,op:havoc', b'2')])
+
+    def test_reads_queue_files_once_written(self):
+        self.generator.generation_running = True
+        self._add_test('fuzzer00', 'id:000000,orig:0.afl-test', b'0')
+        self.assertEqual(self.generator.get_test_cases(), [])
+        # AFL is still writing the test
+        self._add_test('fuzzer00', 'id:000000,orig:0.afl-test', b'0\n1')
+        self.assertEqual(self.generator.get_test_cases(), [])
+        test_cases = self.generator.get_test_cases()
+        self.assertEqual([t.content for t in test_cases], [b'0\n1'])
+
+    def test_reads_other_findings_dir(self):
+        findings_dir = os.path.join(self.work_dir, 'findings')
+        queue_dir = os.path.join(findings_dir, 'fuzzer01', 'queue')
+        os.makedirs(queue_dir)
+        with open(os.path.join(queue_dir, 'id:000000'), 'wb') as outp:
+            outp.write(b'0')
+        self.assertEqual(
+            self.generator.get_test_dirs(findings_dir),
+            [os.path.join(findings_dir, 'fuzzer00', 'queue'), queue_dir])
+        # The directory may still be written to by a running AFL
+        self.assertEqual(self.generator.get_test_cases(directory=findings_dir),
+                         [])
+        test_cases = self.generator.get_test_cases(directory=findings_dir)
+        self.assertEqual([t.name for t in test_cases], ['fuzzer01.id:000000'])
+
+    def test_imports_vectors_of_other_generators(self):
+        vectors = list()
+        for name, values in (('klee.test1', ['0x1', '0x2']),
+                             ('klee.test2', ['0x01', '2']),
+                             ('crest.input1', ['', '3'])):
+            vector = utils.TestVector(name, os.path.join(self.work_dir, name))
+            for v in values:
+                vector.add(v)
+            vectors.append(vector)
+        self.generator.import_test_vectors(vectors)
+        self.generator.import_test_vectors(vectors)
+
+        import_dir = os.path.join(self.generator.findings_dir,
+                                  afl.import_instance, 'queue')
+        # 0x01 and 0x1 are the same value for the harness
+        self.assertEqual(sorted(os.listdir(import_dir)),
+                         ['id:000000', 'id:000001'])
+        self.assertEqual(self.generator.number_imported_seeds.count, 2)
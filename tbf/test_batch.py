@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import gc
+import logging
+import unittest
+import warnings
+import tbf.batch as batch
+import tbf.utils as utils
+
+
+class TestGetPrograms(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def _create_file(self, name, content=''):
+        file_name = os.path.join(self.work_dir, name)
+        with open(file_name, 'w+') as outp:
+            outp.write(content)
+        return file_name
+
+    def test_set_file(self):
+        program_a = self._create_file('a.c')
+        program_b = self._create_file('b.i')
+        self._create_file('b.yml', "format_version: '2.0'\n"
+                          "input_files: 'b.i'\n")
+        set_file = self._create_file('tasks.set', '# Comment\n*.c\n\n*.yml\n')
+
+        self.assertEqual(batch.get_programs([set_file]), [program_a, program_b])
+
+
+class TestRunTask(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.handlers = list(logging.getLogger().handlers)
+        self.level = logging.getLogger().level
+
+    def tearDown(self):
+        logger = logging.getLogger()
+        for handler in self.handlers:
+            logger.addHandler(handler)
+        logger.setLevel(self.level)
+        shutil.rmtree(self.work_dir)
+
+    def _run_task(self, index):
+        output_dir = os.path.join(self.work_dir, str(index))
+        # Invalid arguments let the run fail fast
+        return batch._run_task((index, 'prog.c',
+                                ['-i', 'crest', '--crest-iterations', '0'],
+                                output_dir))
+
+    @staticmethod
+    def _get_open_fds():
+        return len(os.listdir('/proc/self/fd'))
+
+    @unittest.skipUnless(
+        os.path.isdir('/proc/self/fd'), "Needs /proc to count descriptors")
+    def test_doesnt_leak_descriptors(self):
+        self._run_task(0)
+        open_fds = self._get_open_fds()
+        with warnings.catch_warnings(record=True) as unclosed_files:
+            # Files that are only closed by the garbage collector
+            warnings.simplefilter('always', ResourceWarning)
+            for index in range(1, 6):
+                result = self._run_task(index)
+                self.assertEqual(result['verdict'], utils.ERROR)
+            gc.collect()
+        self.assertEqual(self._get_open_fds(), open_fds)
+        self.assertEqual([
+            str(w.message)
+            for w in unclosed_files if w.category is ResourceWarning
+        ], [])
+
+        with open(os.path.join(self.work_dir, '5', batch.log_file)) as inp:
+            self.assertIn('Number of CREST iterations', inp.read())
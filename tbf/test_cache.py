@@ -0,0 +1,131 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+import tbf.cache as cache
+import tbf.utils as utils
+
+
+class TestArtifactCache(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.cache = cache.ArtifactCache(
+            os.path.join(self.work_dir, 'cache'), max_size=300)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def _create_file(self, name, size):
+        file_name = os.path.join(self.work_dir, name)
+        with open(file_name, 'wb+') as outp:
+            outp.write(b'a' * size)
+        return file_name
+
+    def test_put_and_get(self):
+        artifact = self._create_file('a.out', 10)
+        key = self.cache.get_key('program', 'harness')
+        self.cache.put(key, [artifact], {'build_dir': '/build/dir'})
+        os.remove(artifact)
+
+        data = self.cache.get(key, self.work_dir)
+        self.assertEqual(data, {'build_dir': '/build/dir'})
+        self.assertTrue(os.path.exists(artifact))
+        self.assertEqual(self.cache.hits.count, 1)
+
+    def test_miss(self):
+        data = self.cache.get(self.cache.get_key('unknown'), self.work_dir)
+        self.assertIsNone(data)
+        self.assertEqual(self.cache.misses.count, 1)
+
+    def test_evicts_least_recently_used(self):
+        key_old = self.cache.get_key('old')
+        key_new = self.cache.get_key('new')
+        self.cache.put(key_old, [self._create_file('old', 100)])
+        past = time.time() - 10
+        os.utime(os.path.join(self.cache.directory, key_old), (past, past))
+        self.cache.put(key_new, [self._create_file('new', 100)])
+        self.cache.put(
+            self.cache.get_key('newest'), [self._create_file('newest', 100)])
+
+        self.assertIsNone(self.cache.get(key_old, self.work_dir))
+        self.assertIsNotNone(self.cache.get(key_new, self.work_dir))
+
+
+class TestProgramCache(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.cache = cache.ArtifactCache(
+            os.path.join(self.work_dir, 'cache'), max_size=10**6)
+        self.program = os.path.join(self.work_dir, 'prog.c')
+        with open(self.program, 'w+') as outp:
+            outp.write('extern int __VERIFIER_nondet_int(void);\n'
+                       'int main() { return __VERIFIER_nondet_int(); }\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def _find_nondet_methods(self):
+        workspace = utils.Workspace(os.path.join(self.work_dir, 'output'))
+        return workspace, utils.find_nondet_methods(workspace, self.program,
+                                                    False, self.cache)
+
+    def test_reuses_nondet_methods(self):
+        _, nondet_methods = self._find_nondet_methods()
+        with mock.patch.object(
+                utils, '_find_undefined_methods', side_effect=AssertionError):
+            workspace, cached_nondet_methods = self._find_nondet_methods()
+
+        self.assertEqual(cached_nondet_methods, nondet_methods)
+        self.assertEqual([m['name'] for m in nondet_methods],
+                         ['__VERIFIER_nondet_int'])
+        with open(self.program, 'r') as inp:
+            content = inp.read()
+        self.assertEqual(workspace.rewritten_contents,
+                         {content: utils.rewrite_cproblems(content)})
+
+    def test_invalidated_by_tbf_change(self):
+        self._find_nondet_methods()
+        with mock.patch.object(utils, '_source_hash', 'changed'):
+            with mock.patch.object(
+                    utils, '_find_undefined_methods',
+                    wraps=utils._find_undefined_methods) as find_methods:
+                self._find_nondet_methods()
+        find_methods.assert_called_once()
+
+
+class TestCStandardCache(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.cache = cache.ArtifactCache(
+            os.path.join(self.work_dir, 'cache'), max_size=10**6)
+        self.program = os.path.join(self.work_dir, 'prog.c')
+        # restrict is only a keyword since C99
+        with open(self.program, 'w+') as outp:
+            outp.write('int main() { int restrict = 0; return restrict; }\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def _determine_c_standard(self, parallel=False):
+        workspace = utils.Workspace(os.path.join(self.work_dir, 'output'))
+        c_standard = utils.determine_c_standard(
+            workspace, self.program, utils.MACHINE_MODEL_64, parallel,
+            self.cache)
+        self.assertEqual(workspace.get_c_standards(), [c_standard])
+        return c_standard
+
+    def test_probes_once(self):
+        self.assertEqual(self._determine_c_standard(parallel=True), 'gnu90')
+        with mock.patch.object(
+                utils, '_probe_c_standard', side_effect=AssertionError):
+            self.assertEqual(self._determine_c_standard(), 'gnu90')
+
+    def test_parallel_probe_prefers_earlier_standard(self):
+        with open(self.program, 'w+') as outp:
+            outp.write('int main() { return 0; }\n')
+        self.assertEqual(self._determine_c_standard(parallel=True), 'gnu11')
@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+import unittest
+import tbf.tools.crest as crest
+import tbf.utils as utils
+from tbf.input_generation import ParallelCommands
+
+
+class TestStrategyEnsemble(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.workspace = utils.Workspace(
+            os.path.join(self.work_dir, 'output'))
+        self.generator = crest.InputGenerator(
+            self.workspace,
+            search_heuristic=['dfs', 'cfg'],
+            machine_model=utils.MACHINE_MODEL_64,
+            strategy_iterations=[10, 20],
+            strategy_timelimits=[5, 60])
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def test_commands(self):
+        cmds = self.generator.create_input_generation_cmds(
+            self.workspace.get_file_path('prog.crest.c'))
+        self.assertIsInstance(cmds[-1], ParallelCommands)
+        self.assertEqual([c[2:] for c in cmds[-1].commands],
+                         [['10', '-dfs'], ['20', '-cfg']])
+        self.assertEqual(cmds[-1].timelimits, [5, 60])
+        for cwd in cmds[-1].cwds:
+            self.assertEqual(
+                os.readlink(os.path.join(cwd, 'branches')),
+                self.workspace.get_file_path('branches'))
+
+    def test_merges_tests(self):
+        for idx, test_dir in enumerate(self.generator.get_test_dirs()):
+            os.makedirs(test_dir)
+            for test in ('input1', 'input2', 'input'):
+                with open(os.path.join(test_dir, test), 'w') as outp:
+                    outp.write(str(idx))
+        test_cases = self.generator.get_test_cases(
+            exclude=['strategy0.input1', 'strategy1.input2'])
+        self.assertEqual(
+            sorted((t.name, t.content) for t in test_cases),
+            [('strategy0.input2', '0'), ('strategy1.input1', '1')])
+
+
+class TestSingleStrategy(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.workspace = utils.Workspace(
+            os.path.join(self.work_dir, 'output'))
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def test_strategy_budget(self):
+        generator = crest.InputGenerator(
+            self.workspace,
+            10,
+            search_heuristic=['dfs'],
+            strategy_iterations=[5],
+            strategy_timelimits=[2])
+        cmds = generator.create_input_generation_cmds(
+            self.workspace.get_file_path('prog.crest.c'))
+        self.assertIsInstance(cmds[-1], ParallelCommands)
+        self.assertEqual([c[2:] for c in cmds[-1].commands], [['5', '-dfs']])
+        self.assertEqual(cmds[-1].timelimits, [2])
+        self.assertEqual(generator.get_test_dirs(), [self.workspace.tmp])
@@ -0,0 +1,36 @@
+import unittest
+import tbf.harness_generation as harness_gen
+
+
+class TestInputKey(unittest.TestCase):
+
+    def assertSameKey(self, first, second):
+        self.assertEqual(
+            harness_gen.get_input_key(first), harness_gen.get_input_key(second))
+
+    def assertDifferentKey(self, first, second):
+        self.assertNotEqual(
+            harness_gen.get_input_key(first), harness_gen.get_input_key(second))
+
+    def test_integers(self):
+        self.assertSameKey(b'42\n-1\n', b'0x2a\n0xffffffffffffffff\n')
+        self.assertSameKey(b'010\n', b' +8\n')
+        self.assertSameKey(b'1\n2', b'1\n2\n')
+        self.assertDifferentKey(b'1\n2\n', b'2\n1\n')
+        self.assertDifferentKey(b'1\n', b'1 \n')
+
+    def test_other_values(self):
+        self.assertSameKey('abc\n', b'abc\n')
+        self.assertDifferentKey(b'1.0\n', b'1\n')
+        self.assertDifferentKey(b'1\x002\n', b'1\x003\n')
+        self.assertDifferentKey(b'18446744073709551616\n',
+                                b'18446744073709551617\n')
+
+    def test_long_values(self):
+        # The harness reads at most input_size - 1 characters per value
+        value = b'1' * (harness_gen.input_size - 1)
+        self.assertSameKey(value + b'2\n', value + b'0x2\n')
+
+    def test_trailing_values(self):
+        # Values are part of the key even if the program never reads them
+        self.assertDifferentKey(b'1\n', b'1\n2\n')
@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import unittest
+import tbf.cache as cache
+import tbf.utils as utils
+from tbf.input_generation import BaseInputGenerator
+
+
+class BuildingInputGenerator(BaseInputGenerator):
+
+    def get_name(self):
+        return 'building'
+
+    def get_run_env(self):
+        return utils.get_env()
+
+    def get_test_cases(self, exclude=(), directory=None):
+        return list()
+
+    def prepare(self, filecontent, nondet_methods_used):
+        return filecontent
+
+    def get_build_artifacts(self, filename):
+        return [self.workspace.get_file_path('built')]
+
+    def get_build_inputs(self):
+        return self.build_inputs
+
+    def create_input_generation_cmds(self, filename):
+        return [['sh', '-c', 'echo build >> builds && touch built'],
+                ['test', '-e', 'built']]
+
+
+class TestBuildCache(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.program = os.path.join(self.work_dir, 'prog.c')
+        with open(self.program, 'w+') as outp:
+            outp.write('int main() { return 0; }\n')
+        self.build_input = os.path.join(self.work_dir, 'tool.h')
+        with open(self.build_input, 'w+') as outp:
+            outp.write('int tool_version = 1;\n')
+        self.build_cache = cache.ArtifactCache(
+            os.path.join(self.work_dir, 'cache'), max_size=10**6)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def _generate(self):
+        workspace = utils.Workspace(os.path.join(self.work_dir, 'output'))
+        workspace.nondet_methods = []
+        generator = BuildingInputGenerator(workspace, None,
+                                           utils.MACHINE_MODEL_64, False)
+        generator.build_cache = self.build_cache
+        generator.build_inputs = [self.build_input]
+        success, _ = generator.generate_input(self.program, None)
+        self.assertTrue(success)
+        return workspace, generator
+
+    def test_reuses_build(self):
+        _, first_generator = self._generate()
+        workspace, generator = self._generate()
+
+        self.assertEqual(first_generator.number_reused_builds.count, 0)
+        self.assertEqual(generator.number_reused_builds.count, 1)
+        self.assertFalse(os.path.exists(workspace.get_file_path('builds')))
+        self.assertTrue(
+            os.path.exists(workspace.get_prepared_name(self.program,
+                                                       'building')))
+
+    def test_rebuilds_after_tool_change(self):
+        self._generate()
+        with open(self.build_input, 'w+') as outp:
+            outp.write('int tool_version = 20;\n')
+        workspace, generator = self._generate()
+
+        self.assertEqual(generator.number_reused_builds.count, 0)
+        self.assertTrue(os.path.exists(workspace.get_file_path('builds')))
@@ -0,0 +1,75 @@
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+import tbf.utils as utils
+import tbf.tools.klee as klee
+from tbf.input_generation import ParallelCommands
+
+
+def _create_ktest(objects, version=3):
+    content = b'KTEST' + struct.pack('>i', version)
+    content += struct.pack('>i', 1) + struct.pack('>i', 4) + b'prog'
+    if version >= 2:
+        content += struct.pack('>ii', 0, 0)
+    content += struct.pack('>i', len(objects))
+    for name, value in objects:
+        content += struct.pack('>i', len(name)) + name.encode()
+        content += struct.pack('>i', len(value)) + value
+    return content
+
+
+class TestKtestParser(unittest.TestCase):
+
+    def test_parse(self):
+        objects = [('__sym___VERIFIER_nondet_int', b'\x01\x00\x00\x00'),
+                   ('__sym___VERIFIER_nondet_char', b"'"),
+                   ('__sym___VERIFIER_nondet_uchar', b':')]
+        for version in (1, 2, 3):
+            self.assertEqual(
+                klee.parse_ktest(_create_ktest(objects, version)), objects)
+
+    def test_incomplete(self):
+        content = _create_ktest([('__sym_x', b'\x01\x00\x00\x00')])
+        with self.assertRaises(utils.ParseError):
+            klee.parse_ktest(content[:-1])
+        with self.assertRaises(utils.ParseError):
+            klee.parse_ktest(content[:3])
+
+
+class TestParallelStrategies(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        workspace = utils.Workspace(os.path.join(self.work_dir, 'output'))
+        self.generator = klee.InputGenerator(
+            workspace,
+            machine_model=utils.MACHINE_MODEL_64,
+            parallel_search_heuristics=[['random-path', 'nurs:covnew'],
+                                        ['dfs']])
+        self.generator.cpu_cores = {0, 1, 2}
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def test_commands(self):
+        cmds = self.generator.create_input_generation_cmds('prog.c')
+        self.assertIsInstance(cmds[-1], ParallelCommands)
+        searches = [[a for a in c if a.startswith('-search=')]
+                    for c in cmds[-1].commands]
+        self.assertEqual(
+            searches,
+            [['-search=random-path', '-search=nurs:covnew'], ['-search=dfs']])
+        self.assertEqual(cmds[-1].cpu_cores, [{0, 1}, {2}])
+
+    def test_merges_tests(self):
+        for tests_dir in self.generator.get_test_dirs():
+            os.makedirs(tests_dir)
+            with open(os.path.join(tests_dir, 'test000001.ktest'),
+                      'wb') as outp:
+                outp.write(_create_ktest([('__sym_x', b'\x01')]))
+        test_cases = self.generator.get_test_cases(
+            exclude=['strategy0.test000001.ktest'])
+        self.assertEqual([t.name for t in test_cases],
+                         ['strategy1.test000001.ktest'])
@@ -0,0 +1,110 @@
+import os
+import shutil
+import tempfile
+import unittest
+import tbf.portfolio as portfolio
+import tbf.utils as utils
+from tbf.input_generation import BaseInputGenerator
+
+
+class StubInputGenerator(BaseInputGenerator):
+
+    def __init__(self, workspace, name, test_names):
+        self.name = name
+        super().__init__(workspace, None, utils.MACHINE_MODEL_64, False)
+        self.test_cases = [
+            utils.TestCase(t, os.path.join(workspace.tmp, t), name)
+            for t in test_names
+        ]
+
+    def get_name(self):
+        return self.name
+
+    def get_run_env(self):
+        return utils.get_env()
+
+    def prepare(self, filecontent, nondet_methods_used):
+        return filecontent
+
+    def create_input_generation_cmds(self, filename):
+        return list()
+
+    def get_test_cases(self, exclude=(), directory=None):
+        return [t for t in self.test_cases if t.name not in exclude]
+
+
+class StubValidator(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.validated = list()
+
+    def can_create_witness(self, test):
+        return self.name != 'afl'
+
+    def _get_test_vector(self, test):
+        self.validated.append((test.name, test.content))
+        return utils.TestVector(test.name, test.origin)
+
+
+class ValidationConfig(object):
+
+    def __init__(self, workspace):
+        self.workspace = workspace
+        self.machine_model = utils.MACHINE_MODEL_64
+        self.naive_verification = False
+        self.harness_cache = None
+        self.vector_index = None
+        self.validation_workers = 1
+
+
+class TestPortfolio(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        workspace = utils.Workspace(os.path.join(self.work_dir, 'output'))
+        self.afl = StubInputGenerator(workspace, 'afl', ['id:0', 'id:1'])
+        # Test names of different generators may be the same
+        self.klee = StubInputGenerator(workspace, 'klee', ['id:0'])
+        self.generator = portfolio.InputGenerator(
+            workspace, [self.afl, self.klee], None, utils.MACHINE_MODEL_64,
+            False)
+        self.validators = {
+            self.afl: StubValidator('afl'),
+            self.klee: StubValidator('klee')
+        }
+        self.validator = portfolio.PortfolioTestValidator(
+            ValidationConfig(workspace), self.generator, self.validators)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def test_prefixes_test_names(self):
+        self.assertEqual([t.name for t in self.generator.get_test_cases()],
+                         ['afl.id:0', 'afl.id:1', 'klee.id:0'])
+        self.assertEqual(
+            self.generator.get_generator('klee.id:0'), (self.klee, 'id:0'))
+        with self.assertRaises(AssertionError):
+            self.generator.get_generator('crest.input1')
+
+    def test_excludes_tests_per_generator(self):
+        test_cases = self.generator.get_test_cases(
+            exclude=['afl.id:0', 'klee.id:1'])
+        self.assertEqual([t.name for t in test_cases],
+                         ['afl.id:1', 'klee.id:0'])
+
+    def test_routes_tests_to_validators(self):
+        vectors = [
+            self.validator.get_test_vector(t)
+            for t in self.generator.get_test_cases()
+        ]
+
+        self.assertEqual([v.name for v in vectors],
+                         ['afl.id:0', 'afl.id:1', 'klee.id:0'])
+        self.assertEqual(self.validators[self.afl].validated,
+                         [('id:0', 'afl'), ('id:1', 'afl')])
+        self.assertEqual(self.validators[self.klee].validated,
+                         [('id:0', 'klee')])
+        test_cases = self.generator.get_test_cases()
+        self.assertFalse(self.validator.can_create_witness(test_cases[0]))
+        self.assertTrue(self.validator.can_create_witness(test_cases[2]))
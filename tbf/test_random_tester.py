@@ -0,0 +1,32 @@
+import os
+import shutil
+import tempfile
+import unittest
+import tbf.tools.random_tester as random_tester
+
+
+class TestVectorFileReader(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.vectors_file = os.path.join(self.work_dir, 'random-vectors.1.txt')
+        self.reader = random_tester.VectorFileReader(self.vectors_file, 1)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def _append(self, content):
+        with open(self.vectors_file, 'a') as outp:
+            outp.write(content)
+
+    def test_reads_complete_vectors(self):
+        self._append('__sym_a: 0x1\n__sym_b: 0x2\n\n__sym_a: 0x3\n')
+        test_cases = self.reader.get_test_cases()
+        self.assertEqual([(t.name, t.content) for t in test_cases],
+                         [('vector1.0', '__sym_a: 0x1\n__sym_b: 0x2')])
+
+        self._append('\n\n')
+        test_cases = self.reader.get_test_cases()
+        self.assertEqual([(t.name, t.content) for t in test_cases],
+                         [('vector1.0', '__sym_a: 0x1\n__sym_b: 0x2'),
+                          ('vector1.1', '__sym_a: 0x3'), ('vector1.2', '')])
@@ -0,0 +1,38 @@
+import json
+import os
+import shutil
+import socket
+import tempfile
+import unittest
+from threading import Thread
+import tbf.serve as serve
+
+
+class TestJobServer(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.work_dir, 'tbf.sock')
+        self.server = serve.JobServer(self.socket_path, 1, self.work_dir)
+        self.server_thread = Thread(target=self.server.serve_forever)
+        self.server_thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.server_thread.join()
+        shutil.rmtree(self.work_dir)
+
+    def _submit(self, job):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(self.socket_path)
+            client.sendall(job + b'\n')
+            with client.makefile('rb') as inp:
+                return [json.loads(line.decode()) for line in inp]
+
+    def test_invalid_jobs(self):
+        for job in (b'no json', b'{"args": []}',
+                    b'{"file": "/a.c", "args": ["--no-such-option"]}'):
+            events = self._submit(job)
+            self.assertEqual(len(events), 1)
+            self.assertEqual(events[0]['event'], 'error')
@@ -0,0 +1,189 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+import tbf.utils as utils
+import tbf.testcase_validation as testcase_validation
+
+program = '''extern void __VERIFIER_error(void);
+extern int __VERIFIER_nondet_int(void);
+
+int main() {
+  if (__VERIFIER_nondet_int() == 1) {
+    __VERIFIER_error();
+  }
+  return 0;
+}
+'''
+
+
+def _get_vector(name, value):
+    vector = utils.TestVector(name, name)
+    vector.add(value)
+    return vector
+
+
+class ValidationConfig(object):
+
+    def __init__(self, workspace, validation_workers):
+        self.workspace = workspace
+        self.machine_model = utils.MACHINE_MODEL_64
+        self.naive_verification = False
+        self.harness_cache = None
+        self.vector_index = None
+        self.validation_workers = validation_workers
+
+
+class LineTestValidator(testcase_validation.TestValidator):
+    """Test validator for tests with one value per line."""
+
+    def get_name(self):
+        return 'line'
+
+    def _get_test_vector(self, test_case):
+        vector = utils.TestVector(test_case.name, test_case.origin)
+        for value in test_case.content.split('\n'):
+            vector.add(value)
+        return vector
+
+
+class FinishedInputGenerator(object):
+    generation_running = False
+
+
+class SlowRunner(object):
+    """Runner that only finds the error for value 1, but takes its time."""
+
+    def __init__(self):
+        self.runs = list()
+        self._lock = threading.Lock()
+
+    def get_executable_harness(self, program_file):
+        return 'a.out'
+
+    def run(self, program_file, test_vector):
+        with self._lock:
+            self.runs.append(test_vector.name)
+        time.sleep(0.02)
+        if test_vector.vector[0]['value'] == '1':
+            return [utils.FALSE]
+        return [utils.UNKNOWN]
+
+
+class ValidationTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.program = os.path.join(self.work_dir, 'prog.c')
+        with open(self.program, 'w+') as outp:
+            outp.write(program)
+        self.workspace = utils.Workspace(os.path.join(self.work_dir, 'output'))
+        utils.find_nondet_methods(self.workspace, self.program, False)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+
+class TestForkServer(ValidationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.runner = testcase_validation.ExecutionRunner(
+            self.workspace,
+            utils.MACHINE_MODEL_64,
+            'test',
+            use_fork_server=True)
+
+    def tearDown(self):
+        self.runner.close()
+        super().tearDown()
+
+    def _run(self, value):
+        return self.runner.run(self.program, _get_vector('test', value))
+
+    def test_runs_vectors_in_one_server(self):
+        self.assertEqual(self._run('0'), [utils.UNKNOWN])
+        self.assertEqual(self._run('1'), [utils.FALSE])
+        self.assertEqual(self._run('2'), [utils.UNKNOWN])
+        self.assertTrue(self.runner.use_fork_server)
+        self.assertEqual(len(self.runner._fork_servers), 1)
+
+    def test_falls_back_to_one_process_per_test(self):
+        self.assertEqual(self._run('0'), [utils.UNKNOWN])
+        fork_server = self.runner._fork_servers[0]
+        fork_server._process.kill()
+        fork_server._process.wait()
+
+        self.assertEqual(self._run('1'), [utils.FALSE])
+        self.assertFalse(self.runner.use_fork_server)
+        self.assertEqual(self._run('0'), [utils.UNKNOWN])
+
+
+class TestParallelValidation(ValidationTestCase):
+
+    def _get_test_cases(self, values):
+        test_cases = list()
+        for idx, value in enumerate(values):
+            test_file = os.path.join(self.work_dir, 'test' + str(idx))
+            with open(test_file, 'w+') as outp:
+                outp.write(value)
+            test_cases.append(
+                utils.TestCase(os.path.basename(test_file), test_file, value))
+        return test_cases
+
+    def _validate(self, validation_workers, test_cases):
+        validator = LineTestValidator(
+            ValidationConfig(self.workspace, validation_workers),
+            FinishedInputGenerator())
+        runner = SlowRunner()
+        try:
+            result = validator._hs(self.program, runner, test_cases)
+        finally:
+            if validator._validation_pool:
+                validator._validation_pool.shutdown(wait=True)
+        return result, runner, validator
+
+    def test_stops_at_first_false(self):
+        test_cases = self._get_test_cases(['0', '1'] + ['0'] * 40)
+        result, runner, validator = self._validate(4, test_cases)
+
+        self.assertEqual(result.verdict, utils.FALSE)
+        self.assertEqual(result.test.name, 'test1')
+        self.assertLess(len(runner.runs), len(test_cases))
+        self.assertEqual(validator.counter_handled_test_cases.count,
+                         len(runner.runs))
+
+    def test_same_result_as_sequential(self):
+        test_cases = self._get_test_cases(['0', '2', '3', '1', '0'])
+        sequential_result, _, _ = self._validate(1, test_cases)
+        parallel_result, _, _ = self._validate(3, test_cases)
+
+        self.assertEqual(parallel_result.verdict, utils.FALSE)
+        self.assertEqual(parallel_result.test.name,
+                         sequential_result.test.name)
+        self.assertEqual(parallel_result.test.vector,
+                         sequential_result.test.vector)
+
+
+class TestProgramObject(ValidationTestCase):
+
+    def test_reuses_program_object(self):
+        with mock.patch.object(
+                utils, 'execute', wraps=utils.execute) as execute:
+            for _ in range(2):
+                runner = testcase_validation.ExecutionRunner(
+                    self.workspace, utils.MACHINE_MODEL_64, 'test')
+                self.assertEqual(
+                    runner.run(self.program, _get_vector('test', '1')),
+                    [utils.FALSE])
+        compile_cmds = [
+            c[0][0] for c in execute.call_args_list if '-c' in c[0][0]
+        ]
+        self.assertEqual(len(compile_cmds), 1)
+        self.assertEqual(
+            testcase_validation.get_program_object(
+                self.workspace, self.program, utils.MACHINE_MODEL_64,
+                self.workspace.get_c_standards()[0]), compile_cmds[0][-2])
@@ -1,3 +1,6 @@
+import os
+import signal
+import tempfile
 import unittest
 import tbf.utils as utils
 
@@ -5,39 +8,139 @@ method_name = '__VERIFIER_nondet_int'
 bool_method_name = '__VERIFIER_nondet_bool'
 
 
-class TestUtils(unittest.TestCase):
+undefined_methods = [{
+    'name': method_name,
+    'type': 'int',
+    'params': []
+}, {
+    'name': bool_method_name,
+    'type': '_Bool',
+    'params': []
+}]
+
 
-    @classmethod
-    def setUpClass(cls):
-        utils.undefined_methods = [{
-            'name': method_name,
-            'type': 'int',
-            'params': []
-        }, {
-            'name': bool_method_name,
-            'type': '_Bool',
-            'params': []
-        }]
+class TestUtils(unittest.TestCase):
 
     def test_multicharacter_conversion(self):
         value = b'\x00\x00\x00\x00'
         expected = 0
-        actual, = utils.convert_to_int(value, method_name)
+        actual, = utils.convert_to_int(value, method_name,
+                                       undefined_methods)
         self.assertEqual(actual, expected)
         value = b'\x01\x01\x01\x01'
         expected = 16843009
-        actual, = utils.convert_to_int(value, method_name)
+        actual, = utils.convert_to_int(value, method_name,
+                                       undefined_methods)
         self.assertEqual(actual, expected)
         value = b'\xff\xff\xff\x7f'
         expected = 2147483647
-        actual, = utils.convert_to_int(value, method_name)
+        actual, = utils.convert_to_int(value, method_name,
+                                       undefined_methods)
         self.assertEqual(actual, expected)
 
         value = b'\x00'
         expected = 0
-        actual, = utils.convert_to_int(value, bool_method_name)
+        actual, = utils.convert_to_int(value, bool_method_name,
+                                       undefined_methods)
         self.assertEqual(actual, expected)
         value = b'\x01'
         expected = 1
-        actual, = utils.convert_to_int(value, bool_method_name)
+        actual, = utils.convert_to_int(value, bool_method_name,
+                                       undefined_methods)
         self.assertEqual(actual, expected)
+
+    def test_raw_bytes_conversion(self):
+        # Raw bytes are not unescaped
+        value = b'\\\x00\x00\x00'
+        expected = 92
+        actual, = utils.convert_to_int(value, method_name,
+                                       undefined_methods)
+        self.assertEqual(actual, expected)
+        value = r"'\\\x00\x00\x00'"
+        actual, = utils.convert_to_int(value, method_name,
+                                       undefined_methods)
+        self.assertEqual(actual, expected)
+
+    def test_rewrite_cproblems(self):
+        content = ('extern int printf(const char *__restrict __format, ...);\n'
+                   'static __inline__ int f(void) /* comment */ { return 0; }\n'
+                   'int g(void) __attribute__ ((__nothrow__ , __leaf__));\n'
+                   'int h /* start\n'
+                   'still in comment */ (void);\n'
+                   'struct empty {\n'
+                   '};\n'
+                   'void k(void) __asm__ ("" "__k_alias");\n'
+                   '__asm__ volatile ("nop"\n'
+                   '                  : : : "memory");\n'
+                   '__extension__ typedef __builtin_va_list va_list;\n')
+        expected = ('extern int printf(const char * __format, ...);\n'
+                    'static  int f(void)  { return 0; }\n'
+                    'int g(void) ;\n'
+                    'int h \n'
+                    ' (void);\n'
+                    'struct empty {\n'
+                    'int __dummy; };\n'
+                    'void k(void) ;\n'
+                    '\n'
+                    '\n'
+                    ' typedef int va_list;\n'
+                    '\n')
+        self.assertEqual(utils.rewrite_cproblems(content), expected)
+
+    def test_file_tail(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tail_file = os.path.join(tmp_dir, 'tail.txt')
+            tail = utils.FileTail(tail_file)
+            self.assertEqual(tail.read_lines(), ([], False))
+
+            with open(tail_file, 'w+') as outp:
+                outp.write('first\nsec')
+            self.assertEqual(tail.read_lines(), (['first'], True))
+            with open(tail_file, 'a') as outp:
+                outp.write('ond\nthird')
+            self.assertEqual(tail.read_lines(), (['second'], False))
+            self.assertEqual(tail.read_lines(final=True), (['third'], False))
+
+            # Replaced file is read from the start
+            os.remove(tail_file)
+            with open(tail_file, 'w+') as outp:
+                outp.write('new\n')
+            self.assertEqual(tail.read_lines(), (['new'], True))
+
+    def test_execute_with_stop_flag(self):
+        stop_flag = utils.SelectableEvent()
+        # More output than fits into a pipe
+        result = utils.execute(
+            ['sh', '-c', 'head -c 1000000 /dev/zero | tr "\\0" a'],
+            quiet=True,
+            stop_flag=stop_flag)
+        self.assertEqual((result.returncode, len(result.stdout)), (0, 1000000))
+
+        stop_flag.set()
+        result = utils.execute(['sleep', '10'], quiet=True, stop_flag=stop_flag)
+        self.assertEqual(result.returncode, -signal.SIGKILL)
+
+    def test_execute_with_output_sink(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log_file = os.path.join(tmp_dir, 'output.log')
+            counter = utils.Counter()
+            sink = utils.OutputSink(
+                log_file, counter, max_size=600000, tail_size=1000)
+            result = utils.execute(
+                [
+                    'sh', '-c', 'head -c 1000000 /dev/zero | tr "\\0" a;'
+                    'echo; echo ' + utils.error_string + ' >&2'
+                ],
+                quiet=True,
+                err_to_output=False,
+                output_sink=sink)
+
+            self.assertEqual(result.stdout, 'a' * 999 + '\n')
+            self.assertTrue(utils.found_err(result))
+            self.assertEqual(counter.count,
+                             1000001 + len(utils.error_string) + 1)
+            # Log file was rotated once
+            self.assertEqual(
+                os.path.getsize(log_file) + os.path.getsize(log_file + '.1'),
+                counter.count)
+            self.assertLessEqual(os.path.getsize(log_file + '.1'), 600000)
@@ -0,0 +1,44 @@
+import unittest
+import tbf.utils as utils
+import tbf.vector_codecs as vector_codecs
+
+nondet_methods = [{
+    'name': '__VERIFIER_nondet_int',
+    'type': 'int',
+    'params': []
+}, {
+    'name': '__VERIFIER_nondet_uchar',
+    'type': 'unsigned char',
+    'params': []
+}]
+
+
+class TestVectorCodecs(unittest.TestCase):
+
+    def _get_vector(self):
+        vector = utils.TestVector('test', 'origin')
+        vector.add('-1', '__VERIFIER_nondet_int')
+        vector.add('255', '__VERIFIER_nondet_uchar')
+        vector.add('42', '__VERIFIER_nondet_int')
+        return vector
+
+    def test_round_trip(self):
+        vector = self._get_vector()
+        for test_format in vector_codecs.formats:
+            content = vector_codecs.encode(test_format, vector, nondet_methods)
+            test_case = utils.TestCase('test', 'origin', content)
+            decoded = vector_codecs.decode(test_format, test_case,
+                                           nondet_methods)
+            values = [v['value'] for v in decoded.vector]
+            if test_format == 'afl':
+                values = [v.decode() for v in values]
+            self.assertEqual(values, ['-1', '255', '42'], test_format)
+
+    def test_convert(self):
+        test_case = utils.TestCase('test', 'origin',
+                                   '__sym___VERIFIER_nondet_int: 0x10\n')
+        self.assertEqual(
+            vector_codecs.convert(test_case, 'random', 'crest'), '16\n')
+        self.assertEqual(
+            vector_codecs.convert(test_case, 'random', 'klee', nondet_methods),
+            [('__sym___VERIFIER_nondet_int', b'\x10\x00\x00\x00')])
@@ -0,0 +1,53 @@
+import os
+import shutil
+import tempfile
+import unittest
+import tbf.watcher as watcher
+
+
+class TestFileWatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.test_dir = os.path.join(self.work_dir, 'output', 'tests')
+        self.watcher = watcher.create_watcher([self.test_dir])
+        if self.watcher is None:
+            self.skipTest("inotify not available")
+
+    def tearDown(self):
+        if self.watcher:
+            self.watcher.close()
+        shutil.rmtree(self.work_dir)
+
+    def _wait_until_quiet(self):
+        while self.watcher.get_new_files(timeout=0.2) != []:
+            pass
+
+    def _get_all_new_files(self):
+        new_files = self.watcher.get_new_files(timeout=1)
+        while new_files is None:
+            new_files = self.watcher.get_new_files(timeout=1)
+        return new_files
+
+    def test_reports_files_in_created_directory(self):
+        # The test directory doesn't exist, yet, so the first call asks for a scan
+        self.assertIsNone(self.watcher.get_new_files(timeout=0))
+
+        os.makedirs(self.test_dir)
+        self._wait_until_quiet()
+        test_file = os.path.join(self.test_dir, 'test1')
+        with open(test_file, 'w+') as outp:
+            outp.write('1\n')
+
+        self.assertEqual(self._get_all_new_files(), [test_file])
+
+    def test_reports_moved_files(self):
+        os.makedirs(self.test_dir)
+        self._wait_until_quiet()
+        tmp_file = os.path.join(self.work_dir, 'tmp')
+        with open(tmp_file, 'w+') as outp:
+            outp.write('1\n')
+        os.rename(tmp_file, os.path.join(self.test_dir, 'test2'))
+
+        self.assertEqual(self._get_all_new_files(),
+                         [os.path.join(self.test_dir, 'test2')])
@@ -1,19 +1,67 @@
 from abc import abstractmethod, ABCMeta
 import tbf.witness_generation as wit_gen
 import tbf.harness_generation as harness_gen
+import tbf.cache as cache
+import tbf.watcher as watcher
 import logging
 import tbf.utils as utils
 import os
+import select
+import struct
+import subprocess
+import threading
+from concurrent import futures
 from time import sleep
 import re
 from tbf.utils import FALSE, UNKNOWN, ERROR
 
 valid_validators = ['cpachecker', 'uautomizer', 'cpa-w2t', 'fshell-w2t']
 
+_program_objects_lock = threading.Lock()
+
+
+def get_program_object(workspace,
+                       program_file,
+                       machine_model,
+                       c_version,
+                       flags=()):
+    """
+    Compiles the given program to an object file, once for each
+    combination of machine model, C standard and compiler flags
+    in the given workspace.
+    Calls to the nondet methods and the error method stay unresolved,
+    so that the object file can be linked against any harness.
+
+    :return: the object file, or None if the program doesn't compile
+    """
+    mm_arg = machine_model.compile_parameter if machine_model else None
+    key = (program_file, mm_arg, c_version, tuple(flags))
+    program_objects = workspace.program_objects
+    with _program_objects_lock:
+        if key not in program_objects:
+            object_name = '.'.join(
+                [os.path.basename(program_file), c_version,
+                 str(len(program_objects)), 'o'])
+            object_file = workspace.get_file_path(object_name, temp_dir=True)
+            compile_cmd = ['gcc', '-std={}'.format(c_version)]
+            if mm_arg:
+                compile_cmd.append(mm_arg)
+            compile_cmd += ['-D__alias__(x)=']
+            compile_cmd += flags
+            compile_cmd += ['-c', '-o', object_file, program_file]
+            compile_result = utils.execute(
+                compile_cmd, quiet=True, err_to_output=False,
+                cwd=workspace.tmp)
+            if compile_result.returncode != 0:
+                object_file = None
+            program_objects[key] = object_file
+        return program_objects[key]
+
 
 class ValidationConfig(object):
 
-    def __init__(self, args):
+    def __init__(self, args, workspace):
+        self.workspace = workspace
         self.machine_model = args.machine_model
 
         self.use_execution = args.execution_validation
@@ -22,9 +70,9 @@ class ValidationConfig(object):
 
         self.use_klee_replay = False
         if args.klee_replay_validation:
-            if args.input_generator != "klee":
+            if args.input_generator != ['klee']:
                 raise utils.ConfigError(
-                    "Klee-replay only works with klee as tester")
+                    "Klee-replay only works with klee as only tester")
             else:
                 logging.warning(
                     "Klee-replay only supports the machine architecture! Machine model specified not respected."
@@ -55,6 +103,40 @@ class ValidationConfig(object):
         self.naive_verification = args.naive_verification
 
         self.measure_coverage = args.report_coverage
+        self.use_fork_server = args.fork_server
+        self.validation_workers = args.validation_workers
+        self.harness_cache = cache.create_cache(args, 'harnesses')
+        self.vector_index = VectorIndex() if args.deduplicate else None
+
+
+class VectorIndex(object):
+    """
+    Keeps track of the test vectors that were already validated.
+
+    Test vectors are compared by the values that the harness returns for
+    them (see harness_generation.get_input_key), so duplicates are also
+    found across test cases and input generators. Test vectors that only
+    differ in values the program doesn't read are not detected.
+    """
+
+    def __init__(self):
+        self._keys = set()
+        self._lock = threading.Lock()
+
+    def add(self, test_vector, technique):
+        """
+        Adds the given test vector for the given validation technique.
+
+        :return: whether the test vector wasn't validated with
+            the given validation technique before
+        """
+        key = (technique,
+               harness_gen.get_input_key(utils.get_input_vector(test_vector)))
+        with self._lock:
+            if key in self._keys:
+                return False
+            self._keys.add(key)
+            return True
 
 
 class TestValidator(object):
@@ -63,6 +145,7 @@ class TestValidator(object):
 
     def __init__(self, validation_config, input_generator):
         self._nondet_var_map = None
+        self.workspace = validation_config.workspace
         self.machine_model = validation_config.machine_model
         self.config = validation_config
         self.witness_creator = wit_gen.WitnessCreator()
@@ -99,11 +182,32 @@ class TestValidator(object):
         self.counter_handled_test_cases = utils.Counter()
         self.statistics.add_value('Number of looked-at test cases',
                                   self.counter_handled_test_cases)
+        self.counter_output_size = utils.Counter()
+        self.statistics.add_value('Bytes of validator output',
+                                  self.counter_output_size)
 
         self.final_test_vector_size = utils.Constant()
         self.statistics.add_value("Size of successful test vector",
                                   self.final_test_vector_size)
 
+        if validation_config.harness_cache:
+            self.statistics.add_value('Harness cache hits',
+                                      validation_config.harness_cache.hits)
+            self.statistics.add_value('Harness cache misses',
+                                      validation_config.harness_cache.misses)
+        if validation_config.vector_index:
+            self.counter_skipped_duplicates = utils.Counter()
+            self.statistics.add_value(
+                'Number of skipped test vectors with identical values',
+                self.counter_skipped_duplicates)
+
+        self._validation_pool = None
+        # Set to stop the validation of the current batch of tests
+        self._stop_event = None
+
+    def _is_stopped(self):
+        return self._stop_event is not None and self._stop_event.is_set()
+
     def get_error_lines(self, program_file):
         with open(program_file, 'r') as inp:
             content = inp.readlines()
@@ -121,15 +225,29 @@ class TestValidator(object):
     def get_name(self):
         pass
 
+    def _is_duplicate(self, test_vector, technique):
+        if not self.config.vector_index or self.config.vector_index.add(
+                test_vector, technique):
+            return False
+        logging.debug('Skipping duplicate test vector %s', test_vector)
+        self.counter_skipped_duplicates.inc()
+        return True
+
+    def can_create_witness(self, test):
+        # This currently won't work with AFL due to its string-style input
+        return 'afl' not in self.get_name().lower()
+
     def create_all_witnesses(self, program_file, new_test_cases):
         created_content = []
-        nondet_methods = utils.get_nondet_methods()
+        nondet_methods = self.workspace.get_nondet_methods()
         if len(new_test_cases) > 0:
             logging.info("Looking at %s new test files.", len(new_test_cases))
         empty_case_handled = False
         for test_case in new_test_cases:
             logging.debug('Looking at test case %s .', test_case)
             test_vector = self.get_test_vector(test_case)
+            if test_vector and self._is_duplicate(test_vector, 'witness'):
+                continue
             if test_vector or not empty_case_handled:
                 if not test_vector:
                     test_vector = utils.TestVector(test_case.name,
@@ -167,7 +285,7 @@ class TestValidator(object):
             error_lines=self.get_error_lines(program_file))
 
         witness_file = test_name + ".witness.graphml"
-        witness_file = utils.get_file_path(witness_file)
+        witness_file = self.workspace.get_file_path(witness_file)
 
         return {'name': witness_file, 'content': witness}
 
@@ -186,6 +304,8 @@ class TestValidator(object):
             assert os.path.exists(test_case.origin)
             test_vector = self.get_test_vector(test_case)
             all_vectors.append(test_vector)
+        if all_vectors and self._input_generator.generation_running:
+            self._input_generator.import_test_vectors(all_vectors)
         return all_vectors
 
     def create_harness(self, test_name, test_vector, nondet_methods):
@@ -194,7 +314,7 @@ class TestValidator(object):
             error_method=utils.error_method,
             test_vector=test_vector)
         harness_file = test_name + '.harness.c'
-        harness_file = utils.get_file_path(harness_file)
+        harness_file = self.workspace.get_file_path(harness_file)
 
         return {'name': harness_file, 'content': harness}
 
@@ -210,31 +330,66 @@ class TestValidator(object):
             self.timer_vector_gen.stop()
 
     def _get_test_cases(self, visited_tests, tests_directory):
-        if tests_directory is None:
-            return self._input_generator.get_test_cases(visited_tests)
-        else:
-            return self._input_generator.get_test_cases(visited_tests,
-                                                        tests_directory)
+        return self._input_generator.get_test_cases(visited_tests,
+                                                    tests_directory)
+
+    def _create_test_watcher(self, tests_directory):
+        test_dirs = self._input_generator.get_test_dirs(tests_directory)
+        if test_dirs is None:
+            return None
+        return watcher.create_watcher(test_dirs)
+
+    def _get_watched_test_cases(self, test_watcher, visited_tests,
+                                tests_directory):
+        new_files = test_watcher.get_new_files(timeout=0.1)
+        if new_files is None:
+            return self._get_test_cases(visited_tests, tests_directory)
+        test_cases = list()
+        names = set()
+        for new_file in new_files:
+            try:
+                test_case = self._input_generator.create_test_case(new_file)
+            except FileNotFoundError:
+                continue
+            if (test_case and test_case.name not in visited_tests and
+                    test_case.name not in names):
+                test_cases.append(test_case)
+                names.add(test_case.name)
+        return test_cases
 
     def _perform_validation(self, program_file, validator, validator_method,
                             is_ready_func, stop_event, tests_directory):
         visited_tests = set()
         result = list()
-        while not is_ready_func() and not stop_event.is_set():
-            new_test_cases = self._get_test_cases(visited_tests,
-                                                  tests_directory)
-            try:
-                result = validator_method(program_file, validator,
-                                          new_test_cases)
-                if result.is_positive():
-                    return result
+        self._stop_event = stop_event
+        # Watching for new test files is much cheaper than scanning all
+        # existing test files again and again
+        test_watcher = self._create_test_watcher(tests_directory)
+        try:
+            while not is_ready_func() and not stop_event.is_set():
+                if test_watcher:
+                    new_test_cases = self._get_watched_test_cases(
+                        test_watcher, visited_tests, tests_directory)
                 else:
-                    new_test_case_names = [t.name for t in new_test_cases]
-                    visited_tests = visited_tests.union(new_test_case_names)
-                sleep(0.001)  # Sleep for 1 millisecond
-            except utils.InputGenerationError:
-                # Just capture here and retry as long as the thread is alive
-                pass
+                    new_test_cases = self._get_test_cases(
+                        visited_tests, tests_directory)
+                try:
+                    result = validator_method(program_file, validator,
+                                              new_test_cases)
+                    if result.is_positive():
+                        return result
+                    else:
+                        new_test_case_names = [t.name for t in new_test_cases]
+                        visited_tests = visited_tests.union(
+                            new_test_case_names)
+                    if not test_watcher:
+                        sleep(0.001)  # Sleep for 1 millisecond
+                except utils.InputGenerationError:
+                    # Just capture here and retry as long as the thread is alive
+                    pass
+        finally:
+            if test_watcher:
+                test_watcher.close()
 
         if not stop_event.is_set():
             new_test_cases = self._get_test_cases(visited_tests,
@@ -244,7 +399,8 @@ class TestValidator(object):
 
     def perform_klee_replay_validation(self, program_file, is_ready_func,
                                        stop_event, tests_directory):
-        validator = KleeReplayRunner(self.config.machine_model)
+        validator = KleeReplayRunner(self.workspace, self.config.machine_model,
+                                     self.counter_output_size)
         return self._perform_validation(program_file, validator, self._k,
                                         is_ready_func, stop_event,
                                         tests_directory)
@@ -254,16 +410,24 @@ class TestValidator(object):
 
         if self.config.measure_coverage:
             validator = CoverageMeasuringExecutionRunner(
-                self.config.machine_model, self.get_name())
+                self.workspace, self.config.machine_model, self.get_name(),
+                self.config.use_fork_server, self.config.harness_cache,
+                self.counter_output_size)
         else:
-            validator = ExecutionRunner(self.config.machine_model,
-                                        self.get_name())
+            validator = ExecutionRunner(
+                self.workspace, self.config.machine_model, self.get_name(),
+                self.config.use_fork_server, self.config.harness_cache,
+                self.counter_output_size)
 
         try:
             return self._perform_validation(program_file, validator, self._hs,
                                             is_ready_func, stop_event,
                                             tests_directory)
         finally:
+            if self._validation_pool:
+                self._validation_pool.shutdown(wait=True)
+                self._validation_pool = None
+            validator.close()
             if type(validator) is CoverageMeasuringExecutionRunner:
                 lines_ex, branch_ex, branch_taken = validator.get_coverage(
                     program_file)
@@ -274,15 +438,25 @@ class TestValidator(object):
 
     def perform_witness_validation(self, program_file, is_ready_func,
                                    stop_event, tests_directory):
-        validator = ValidationRunner(self.config.witness_validators)
+        validator = ValidationRunner(self.workspace,
+                                     self.config.witness_validators,
+                                     self.counter_output_size)
         return self._perform_validation(program_file, validator, self._m,
                                         is_ready_func, stop_event,
                                         tests_directory)
 
     def _hs(self, program_file, validator, new_test_cases):
-        test_vectors = self.create_all_test_vectors(new_test_cases)
+        test_vectors = [
+            v for v in self.create_all_test_vectors(new_test_cases)
+            if not self._is_duplicate(v, 'execution')
+        ]
+
+        if self.config.validation_workers > 1 and len(test_vectors) > 1:
+            return self._hs_parallel(program_file, validator, test_vectors)
 
         for vector in test_vectors:
+            if self._is_stopped():
+                break
             self.timer_execution_validation.start()
             self.timer_validation.start()
             try:
@@ -298,9 +472,57 @@ class TestValidator(object):
                 return utils.VerdictFalse(vector, vector)
         return utils.VerdictUnknown()
 
+    def _hs_parallel(self, program_file, validator, test_vectors):
+        if not self._validation_pool:
+            self._validation_pool = futures.ThreadPoolExecutor(
+                max_workers=self.config.validation_workers)
+        # Create the harness before the workers start, so that
+        # it is only compiled once
+        validator.get_executable_harness(program_file)
+
+        # Runs overlap, so we measure the wall time of the whole batch
+        # instead of the sum of the single runs
+        self.timer_execution_validation.start()
+        self.timer_validation.start()
+        try:
+            running = {
+                self._validation_pool.submit(validator.run, program_file, v): v
+                for v in test_vectors
+            }
+            counted = set()
+            try:
+                for future in futures.as_completed(running):
+                    if self._is_stopped():
+                        break
+                    vector = running[future]
+                    verdicts = future.result()
+                    self.counter_handled_test_cases.inc()
+                    counted.add(future)
+
+                    logging.debug('Results for %s: %s', vector, str(verdicts))
+                    if any([v == FALSE for v in verdicts]):
+                        self.final_test_vector_size.value = len(vector)
+                        return utils.VerdictFalse(vector, vector)
+            finally:
+                for future in running:
+                    future.cancel()
+                # Runs that already started can't be cancelled, so wait for them
+                futures.wait(running)
+                self.counter_handled_test_cases.inc(
+                    len([
+                        f for f in running
+                        if f not in counted and not f.cancelled()
+                    ]))
+        finally:
+            self.timer_execution_validation.stop()
+            self.timer_validation.stop()
+        return utils.VerdictUnknown()
+
     def _k(self, program_file, validator, new_test_cases):
 
         for test in new_test_cases:
+            if self._is_stopped():
+                break
             self.timer_execution_validation.start()
             self.timer_validation.start()
             try:
@@ -375,16 +597,15 @@ class TestValidator(object):
             stop_event.set()
             if result.test_vector is None:
                 result.test_vector = self.get_test_vector(result.test)
-            # This currently won't work with AFL due to its string-style input
-            if result.witness is None and 'afl' not in self.get_name().lower():
-                nondet_methods = utils.get_nondet_methods()
+            if result.witness is None and self.can_create_witness(result.test):
+                nondet_methods = self.workspace.get_nondet_methods()
                 witness = self.create_witness(program_file, result.test.origin,
                                               result.test_vector, nondet_methods)
                 with open(witness['name'], 'w+') as outp:
                     outp.write(witness['content'])
                 result.witness = witness['name']
             if result.harness is None:
-                nondet_methods = utils.get_nondet_methods()
+                nondet_methods = self.workspace.get_nondet_methods()
                 harness = self.create_harness(result.test_vector.origin,
                                               result.test_vector, nondet_methods)
                 with open(harness['name'], 'wb+') as outp:
@@ -395,14 +616,121 @@ class TestValidator(object):
         return result, self.statistics
 
 
+class ForkServer(object):
+    """
+    Runs test vectors in a harness executable that contains the fork-server
+    barrier of HarnessCreator.create_fork_server.
+
+    The executable is started once. For each test vector, the barrier forks
+    a new child that runs main with the test vector as input.
+    """
+
+    def __init__(self, executable, timelimit, env=None, cwd=None):
+        self.timelimit = timelimit
+        ctl_read, self._ctl_write = os.pipe()
+        self._status_read, status_write = os.pipe()
+        env = dict(env) if env else utils.get_env()
+        env['TBF_FORKSRV_CTL'] = str(ctl_read)
+        env['TBF_FORKSRV_ST'] = str(status_write)
+        env['TBF_FORKSRV_TIMEOUT'] = str(timelimit)
+        self._process = subprocess.Popen(
+            [executable],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            env=env,
+            cwd=cwd,
+            pass_fds=(ctl_read, status_write))
+        os.close(ctl_read)
+        os.close(status_write)
+
+    def _read(self, size):
+        data = b''
+        while len(data) < size:
+            # Children are killed by the barrier after the time limit,
+            # so we only have to wait a bit longer than that
+            ready, _, _ = select.select([self._status_read], [], [],
+                                        self.timelimit + 5)
+            if not ready:
+                return None
+            chunk = os.read(self._status_read, size - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def run(self, input_vector):
+        """
+        Runs the harness on the given input.
+
+        :return: the ExecutionResult of the run, or None if the fork server
+            doesn't respond anymore
+        """
+        if input_vector and type(input_vector) is not bytes:
+            input_vector = input_vector.encode()
+        elif not input_vector:
+            input_vector = b''
+        try:
+            os.write(self._ctl_write,
+                     struct.pack('=I', len(input_vector)) + input_vector)
+        except OSError:
+            return None
+
+        header = self._read(8)
+        if header is None:
+            return None
+        status, err_size = struct.unpack('=iI', header)
+        err_output = self._read(err_size) if err_size > 0 else b''
+        if err_output is None:
+            return None
+
+        # Same return code convention as subprocess: -N if killed by signal N
+        if os.WIFSIGNALED(status):
+            returncode = -os.WTERMSIG(status)
+        else:
+            returncode = os.WEXITSTATUS(status)
+        logging.debug(err_output)
+        return utils.ExecutionResult(returncode, '', err_output)
+
+    def close(self):
+        for fd in (self._ctl_write, self._status_read):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        try:
+            self._process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            utils.shut_down(self._process)
+
+
 class ExecutionRunner(object):
 
-    def __init__(self, machine_model, producer_name):
+    def __init__(self,
+                 workspace,
+                 machine_model,
+                 producer_name,
+                 use_fork_server=False,
+                 harness_cache=None,
+                 output_counter=None):
+        self.workspace = workspace
         self.machine_model = machine_model
         self.harness = None
         self.producer = producer_name
         self.harness_generator = harness_gen.HarnessCreator()
-        self.harness_file = 'harness.c'
+        self.harness_file = workspace.get_file_path('harness.c', temp_dir=True)
+        self.timelimit = 5
+        self.use_fork_server = use_fork_server
+        # Idle fork servers. Each concurrent run needs its own fork server.
+        self._fork_servers = list()
+        # Guards the idle fork servers and the fallback to one process
+        # per test, since runs of a batch may overlap
+        self._fork_servers_lock = threading.Lock()
+        self.harness_cache = harness_cache
+        # Environment to run the harness in. None for the default environment
+        self._run_env = None
+        # Counter of the bytes that test executions output
+        self.output_counter = output_counter
 
     def _get_compile_cmd(self,
                          program_file,
@@ -418,21 +746,89 @@ class ExecutionRunner(object):
 
         return cmd
 
-    def compile(self, program_file, harness_file, output_file):
-        compile_cmd = self._get_compile_cmd(program_file, harness_file,
-                                            output_file)
-        compile_result = utils.execute(compile_cmd, quiet=True)
+    def _get_link_cmd(self,
+                      program_object,
+                      harness_file,
+                      output_file,
+                      c_version='gnu11'):
+        mm_arg = self.machine_model.compile_parameter
+        # The harness has to be compiled without the program,
+        # so we have to provide the declarations of the used library functions
+        cmd = ['gcc']
+        cmd += [
+            '-std={}'.format(c_version), mm_arg, '-include', 'stdio.h',
+            '-include', 'stdlib.h', '-include', 'string.h', '-o', output_file,
+            harness_file, program_object, '-lm'
+        ]
+        return cmd
 
-        if compile_result.returncode != 0:
+    def _get_program_flags(self):
+        return []
+
+    def _compile_separately(self, program_file, harness_file, output_file,
+                            additional_objects):
+        for c_version in self.workspace.get_c_standards():
+            program_object = get_program_object(
+                self.workspace, program_file, self.machine_model, c_version,
+                self._get_program_flags())
+            if program_object is None:
+                continue
+            link_cmd = self._get_link_cmd(program_object, harness_file,
+                                          output_file, c_version)
+            link_cmd += additional_objects
+            link_result = utils.execute(
+                link_cmd, quiet=True, err_to_output=False,
+                cwd=self.workspace.tmp)
+            return link_result.returncode == 0
+        return False
+
+    def _compile_together(self, program_file, harness_file, output_file,
+                          additional_objects):
+        for c_version in self.workspace.get_c_standards():
             compile_cmd = self._get_compile_cmd(program_file, harness_file,
-                                                output_file, 'gnu90')
+                                                output_file, c_version)
+            compile_cmd += additional_objects
             compile_result = utils.execute(
-                compile_cmd, quiet=True, err_to_output=False)
-
-            if compile_result.returncode != 0:
-                raise utils.CompileError(
-                    "Compilation failed for harness {}".format(harness_file))
-
+                compile_cmd,
+                quiet=True,
+                err_to_output=False,
+                cwd=self.workspace.tmp)
+            if compile_result.returncode == 0:
+                return output_file
+
+        raise utils.CompileError(
+            "Compilation failed for harness {}".format(harness_file))
+
+    def compile(self, program_file, harness_file, output_file,
+                additional_objects=()):
+        # Linking the harness against the once-compiled program is much
+        # cheaper than compiling the program again for each harness.
+        # This doesn't work if the harness uses types that are only
+        # defined in the program, so we fall back to compiling both together.
+        if self._compile_separately(program_file, harness_file, output_file,
+                                    additional_objects):
+            return output_file
+        logging.debug(
+            "Harness %s can't be compiled on its own, compiling it together with the program",
+            harness_file)
+        return self._compile_together(program_file, harness_file, output_file,
+                                      additional_objects)
+
+    def _compile_fork_server(self):
+        fork_server_file = self.workspace.get_file_path(
+            'fork_server.c', temp_dir=True)
+        with open(fork_server_file, 'wb+') as outp:
+            outp.write(self.harness_generator.create_fork_server())
+        output_file = self.workspace.get_file_path(
+            'fork_server.o', temp_dir=True)
+        compile_cmd = [
+            'gcc', self.machine_model.compile_parameter, '-O2', '-c', '-o',
+            output_file, fork_server_file
+        ]
+        compile_result = utils.execute(
+            compile_cmd, quiet=True, cwd=self.workspace.tmp)
+        if compile_result.returncode != 0:
+            raise utils.CompileError("Compilation failed for fork server")
         return output_file
 
     def _get_run_cmd(self, executable):
@@ -443,27 +839,95 @@ class ExecutionRunner(object):
             self.harness = self._create_executable_harness(program_file)
         return self.harness
 
+    def _get_cache_key(self, program_file, nondet_methods, harness_content):
+        nondet_signatures = sorted([(m['name'], m['type'], m['params'])
+                                    for m in nondet_methods])
+        if self.use_fork_server:
+            fork_server_content = self.harness_generator.create_fork_server()
+        else:
+            fork_server_content = None
+        return self.harness_cache.get_key(
+            utils.get_hash(program_file), self.machine_model.name,
+            nondet_signatures, self.workspace.get_c_standards(),
+            type(self).__name__,
+            utils.get_compiler_version(), harness_content, fork_server_content)
+
+    def _store_in_cache(self, key, output_file):
+        self.harness_cache.put(key, [output_file])
+
+    def _restore_from_cache(self, key, output_file):
+        return self.harness_cache.get(key,
+                                      os.path.dirname(output_file)) is not None
+
     def _create_executable_harness(self, program_file):
-        nondet_methods = utils.get_nondet_methods()
+        nondet_methods = self.workspace.get_nondet_methods()
         harness_content = self.harness_generator.create_harness(
             nondet_methods, utils.error_method)
         with open(self.harness_file, 'wb+') as outp:
             outp.write(harness_content)
-        output_file = utils.get_file_path('a.out', temp_dir=True)
-        return self.compile(program_file, self.harness_file, output_file)
+        output_file = self.workspace.get_file_path('a.out', temp_dir=True)
+
+        cache_key = None
+        if self.harness_cache:
+            cache_key = self._get_cache_key(program_file, nondet_methods,
+                                            harness_content)
+            if self._restore_from_cache(cache_key, output_file):
+                logging.debug("Using cached harness executable for %s",
+                              program_file)
+                return output_file
+
+        if self.use_fork_server:
+            fork_server = [self._compile_fork_server()]
+        else:
+            fork_server = []
+        self.compile(program_file, self.harness_file, output_file, fork_server)
+        if cache_key:
+            self._store_in_cache(cache_key, output_file)
+        return output_file
+
+    def _run_in_fork_server(self, executable, input_vector):
+        with self._fork_servers_lock:
+            if not self.use_fork_server:
+                return None
+            fork_server = self._fork_servers.pop() \
+                if self._fork_servers else None
+        if fork_server is None:
+            fork_server = ForkServer(executable, self.timelimit, self._run_env,
+                                     self.workspace.tmp)
+        run_result = fork_server.run(input_vector)
+        unused_fork_servers = [fork_server]
+        with self._fork_servers_lock:
+            if run_result is None and self.use_fork_server:
+                logging.warning(
+                    "Fork server stopped responding. Using one process per test from now on."
+                )
+                self.use_fork_server = False
+                unused_fork_servers += self._fork_servers
+                self._fork_servers = list()
+            elif self.use_fork_server:
+                self._fork_servers.append(fork_server)
+                unused_fork_servers = list()
+        for unused in unused_fork_servers:
+            unused.close()
+        return run_result
 
     def run(self, program_file, test_vector):
         executable = self.get_executable_harness(program_file)
         input_vector = utils.get_input_vector(test_vector)
 
         if executable:
-            run_cmd = self._get_run_cmd(executable)
-            run_result = utils.execute(
-                run_cmd,
-                quiet=True,
-                err_to_output=False,
-                input_str=input_vector,
-                timelimit=5)
+            run_result = self._run_in_fork_server(executable, input_vector)
+            if run_result is None:
+                run_cmd = self._get_run_cmd(executable)
+                run_result = utils.execute(
+                    run_cmd,
+                    quiet=True,
+                    env=self._run_env,
+                    err_to_output=False,
+                    input_str=input_vector,
+                    timelimit=self.timelimit,
+                    cwd=self.workspace.tmp,
+                    output_sink=utils.OutputSink(counter=self.output_counter))
 
             if utils.found_err(run_result):
                 return [FALSE]
@@ -472,6 +936,12 @@ class ExecutionRunner(object):
         else:
             return [ERROR]
 
+    def close(self):
+        with self._fork_servers_lock:
+            fork_servers, self._fork_servers = self._fork_servers, list()
+        for fork_server in fork_servers:
+            fork_server.close()
+
 
 class CoverageMeasuringExecutionRunner(ExecutionRunner):
 
@@ -486,6 +956,37 @@ class CoverageMeasuringExecutionRunner(ExecutionRunner):
 
         return cmd
 
+    def compile(self, program_file, harness_file, output_file,
+                additional_objects=()):
+        # gcov reports the coverage of the program as part of the harness,
+        # so both have to be in the same translation unit
+        return self._compile_together(program_file, harness_file, output_file,
+                                      additional_objects)
+
+    def _store_in_cache(self, key, output_file):
+        # The notes files are needed by gcov to report coverage
+        build_dir = os.path.dirname(output_file)
+        notes_files = [
+            os.path.join(build_dir, f)
+            for f in os.listdir(build_dir)
+            if f.endswith('.gcno')
+        ]
+        self.harness_cache.put(key, [output_file] + notes_files,
+                               {'build_dir': build_dir})
+
+    def _restore_from_cache(self, key, output_file):
+        data = self.harness_cache.get(key, os.path.dirname(output_file))
+        if data is None:
+            return False
+        build_dir = data['build_dir']
+        # The harness writes its coverage data to the absolute path
+        # of the directory it was built in. Redirect it to our directory.
+        self._run_env = utils.get_env()
+        self._run_env['GCOV_PREFIX'] = os.path.dirname(output_file)
+        self._run_env['GCOV_PREFIX_STRIP'] = str(
+            len(build_dir.strip(os.sep).split(os.sep)))
+        return True
+
     @staticmethod
     def _get_gcov_val(gcov_line):
         stat = gcov_line.split(':')[1]
@@ -493,8 +994,10 @@ class CoverageMeasuringExecutionRunner(ExecutionRunner):
         return stat[:measure_end] + "(" + stat[measure_end:] + ")"
 
     def get_coverage(self, program_file):
-        cmd = ['gcov', '-bc', self.harness_file]
-        res = utils.execute(cmd, quiet=False, err_to_output=False)
+        # gcov looks for the coverage data in the working directory
+        cmd = ['gcov', '-bc', os.path.basename(self.harness_file)]
+        res = utils.execute(
+            cmd, quiet=False, err_to_output=False, cwd=self.workspace.tmp)
         full_cov = res.stdout.splitlines()
 
         program_name = os.path.basename(program_file)
@@ -513,9 +1016,11 @@ class CoverageMeasuringExecutionRunner(ExecutionRunner):
 
 class KleeReplayRunner(object):
 
-    def __init__(self, machine_model):
+    def __init__(self, workspace, machine_model, output_counter=None):
+        self.workspace = workspace
         self.machine_model = machine_model
-        self.executable_name = './a.out'
+        self.output_counter = output_counter
+        self.executable_name = workspace.get_file_path('a.out', temp_dir=True)
         self.executable = None
         if os.path.exists(self.executable_name):
             os.remove(self.executable_name)
@@ -523,24 +1028,20 @@ class KleeReplayRunner(object):
     def run(self, program_file, test_case):
         from tbf.tools import klee
 
-        klee_prepared_file = utils.get_prepared_name(program_file, klee.name)
-        c_version = 'gnu11'
+        klee_prepared_file = self.workspace.get_prepared_name(
+            program_file, klee.name)
         if not self.executable:
-            compile_cmd = ['gcc']
-            compile_cmd += [
-                '-std={}'.format(c_version), "-L", klee.lib_dir,
-                '-D__alias__(x)=', '-o', self.executable_name,
-                klee_prepared_file, '-lkleeRuntest', '-lm'
-            ]
-            result = utils.execute(compile_cmd)
-            if result.returncode != 0:
-                c_version = 'gnu90'
-                compile_cmd = ['gcc']
-                compile_cmd += [
-                    '-std={}'.format(c_version), "-L", klee.lib_dir,
-                    '-D__alias__(x)=', '-o', self.executable_name,
-                    klee_prepared_file, '-lkleeRuntest', '-lm'
+            for c_version in self.workspace.get_c_standards():
+                program_object = get_program_object(
+                    self.workspace, klee_prepared_file, None, c_version)
+                if program_object is None:
+                    continue
+                link_cmd = [
+                    'gcc', "-L", klee.lib_dir, '-o', self.executable_name,
+                    program_object, '-lkleeRuntest', '-lm'
                 ]
+                utils.execute(link_cmd, cwd=self.workspace.tmp)
+                break
             self.executable = self.executable_name
 
         if not os.path.exists(self.executable_name):
@@ -550,7 +1051,11 @@ class KleeReplayRunner(object):
         curr_env['KTEST_FILE'] = test_case.origin
 
         result = utils.execute(
-            [self.executable], env=curr_env, err_to_output=False)
+            [self.executable],
+            env=curr_env,
+            err_to_output=False,
+            cwd=self.workspace.tmp,
+            output_sink=utils.OutputSink(counter=self.output_counter))
 
         if utils.found_err(result):
             return [FALSE]
@@ -560,21 +1065,23 @@ class KleeReplayRunner(object):
 
 class ValidationRunner(object):
 
-    def __init__(self, validators):
+    def __init__(self, workspace, validators, output_counter=None):
         self.validators = list()
         validators_used = set()
         for val in [v.lower() for v in validators]:
             if val == 'cpachecker' and 'cpachecker' not in validators_used:
-                self.validators.append(CPAcheckerValidator())
+                self.validators.append(
+                    CPAcheckerValidator(workspace, output_counter))
                 validators_used.add('cpachecker')
             elif val == 'uautomizer' and 'uautomizer' not in validators_used:
-                self.validators.append(UAutomizerValidator())
+                self.validators.append(
+                    UAutomizerValidator(workspace, output_counter))
                 validators_used.add('uautomizer')
             elif val == 'cpa-w2t' and 'cpa-w2t' not in validators_used:
-                self.validators.append(CpaW2t())
+                self.validators.append(CpaW2t(workspace, output_counter))
                 validators_used.add('cpa-w2t')
             elif val == 'fshell-w2t' and 'fshell-w2t' not in validators_used:
-                self.validators.append(FShellW2t())
+                self.validators.append(FShellW2t(workspace, output_counter))
                 validators_used.add('fshell-w2t')
             else:
                 raise utils.ConfigError('Invalid validator list: ' + validators)
@@ -593,8 +1100,14 @@ class Validator(object):
 
     __metaclass__ = ABCMeta
 
-    def __init__(self, tool_name):
+    def __init__(self, workspace, tool_name, output_counter=None):
+        self.workspace = workspace
         self.tool = utils.import_tool(tool_name)
+        # Directory to run the validator in
+        self.working_dir = workspace.tmp
+        self.log_file = workspace.get_file_path(
+            tool_name + '.log', temp_dir=False)
+        self.output_counter = output_counter
 
     def validate(self, program_file, witness_file):
         # err_to_output=True is important so that messages to stderr are in correct relation to messages to stdout!
@@ -602,7 +1115,9 @@ class Validator(object):
         cmd_result = utils.execute(
             self._get_cmd(program_file, witness_file),
             quiet=True,
-            err_to_output=True)
+            err_to_output=True,
+            cwd=self.working_dir,
+            output_sink=utils.OutputSink(self.log_file, self.output_counter))
 
         returncode = cmd_result.returncode
         # Execute returns a negative returncode -N if the process was killed by signal N
@@ -630,8 +1145,8 @@ class Validator(object):
 
 class CPAcheckerValidator(Validator):
 
-    def __init__(self):
-        super().__init__('cpachecker')
+    def __init__(self, workspace, output_counter=None):
+        super().__init__(workspace, 'cpachecker', output_counter)
         self.executable = None  # executable will compile CPAchecker when called, so only do this if we really validate
         self.cpa_directory = None
 
@@ -641,7 +1156,8 @@ class CPAcheckerValidator(Validator):
             self.executable = self.tool.executable()
             self.cpa_directory = os.path.join(
                 os.path.dirname(self.executable), '..')
-            config_copy_dir = utils.get_file_path('config', temp_dir=True)
+            config_copy_dir = self.workspace.get_file_path(
+                'config', temp_dir=True)
             if not os.path.exists(config_copy_dir):
                 copy_dir = os.path.join(self.cpa_directory, 'config')
                 shutil.copytree(copy_dir, config_copy_dir)
@@ -652,8 +1168,8 @@ class CPAcheckerValidator(Validator):
 
 class UAutomizerValidator(Validator):
 
-    def __init__(self):
-        super().__init__('ultimateautomizer')
+    def __init__(self, workspace, output_counter=None):
+        super().__init__(workspace, 'ultimateautomizer', output_counter)
         self.executable = self.tool.executable()
 
     def _get_cmd(self, program_file, witness_file):
@@ -674,8 +1190,8 @@ class UAutomizerValidator(Validator):
 
 class CpaW2t(Validator):
 
-    def __init__(self):
-        super().__init__('cpa-witness2test')
+    def __init__(self, workspace, output_counter=None):
+        super().__init__(workspace, 'cpa-witness2test', output_counter)
         self.executable = None  # executable will compile CPAchecker when called, so only do this if we really validate
 
     def _get_cmd(self, program_file, witness_file):
@@ -688,10 +1204,12 @@ class CpaW2t(Validator):
 
 class FShellW2t(Validator):
 
-    def __init__(self):
-        super().__init__('witness2test')
+    def __init__(self, workspace, output_counter=None):
+        super().__init__(workspace, 'witness2test', output_counter)
         self.executable = self.tool.executable()
         self.repo = os.path.dirname(os.path.abspath(self.executable))
+        # FShell-w2t only works if it is run from its repository
+        self.working_dir = self.repo
 
     def _get_cmd(self, program_file, witness_file):
         machine_model = utils.get_machine_model(witness_file)
@@ -701,13 +1219,3 @@ class FShellW2t(Validator):
             self.executable, '--propertyfile', utils.spec_file,
             '--graphml-witness', witness_file, machine_model, program_file
         ]
-
-    def validate(self, program_file, witness_file):
-        """Overwrites Validator.validate(...)."""
-        # FShell-w2t only works if it is run from its repository. Because of this,
-        # we always have to change directories, first.
-        old_dir = os.path.abspath('.')
-        os.chdir(self.repo)
-        result = super().validate(program_file, witness_file)
-        os.chdir(old_dir)  # And we change directories back to the original one
-        return result
@@ -1,45 +1,201 @@
-from tbf.input_generation import BaseInputGenerator
+from tbf.input_generation import BaseInputGenerator, ParallelCommands
 from tbf.testcase_validation import TestValidator as BaseTestValidator
 import os
+import hashlib
+import logging
 import tbf.utils as utils
-import glob
+import tbf.harness_generation as harness_gen
+import tbf.vector_codecs as vector_codecs
 from tbf.harness_generation import HarnessCreator
 import pathlib
 
 module_dir = os.path.dirname(os.path.realpath(__file__))
 bin_dir = os.path.join(module_dir, 'afl/bin')
-findings_dir = utils.get_file_path('findings', temp_dir=True)
 name = 'afl-fuzz'
-tests_dir = utils.tmp
+
+# Name of the pseudo instance in the findings dir that inputs of other
+# input generators are imported from. AFL instances sync from its queue
+import_instance = 'tbf-import'
+# Seeds larger than this (in bytes) are not used
+max_seed_size = 64 * 1024
+# Maximum number of seeds that are kept in the corpus of a program
+max_corpus_size = 256
+
+
+def minimize_seeds(inputs, known_keys=None):
+    """
+    Returns the given inputs without empty, too large and duplicate inputs.
+    Inputs are duplicates if the harness reads the same values from them
+    (see harness_generation.get_input_key).
+    Smaller inputs are preferred.
+
+    :param known_keys: set of the input keys of already used seeds.
+        New keys are added to it
+    """
+    if known_keys is None:
+        known_keys = set()
+    seeds = list()
+    for inp in sorted(inputs, key=len):
+        if not inp or len(inp) > max_seed_size:
+            continue
+        key = harness_gen.get_input_key(inp)
+        if key not in known_keys:
+            known_keys.add(key)
+            seeds.append(inp)
+    return seeds
 
 
 class InputGenerator(BaseInputGenerator):
 
+    def __init__(self,
+                 workspace,
+                 timelimit,
+                 machine_model,
+                 log_verbose,
+                 fuzz_jobs=1,
+                 corpus_cache=None):
+        super().__init__(workspace, timelimit, machine_model, log_verbose)
+        self.findings_dir = workspace.get_file_path('findings', temp_dir=True)
+        self.fuzz_jobs = fuzz_jobs
+        # ArtifactCache that keeps the corpus of each program across runs.
+        # None to start without a corpus
+        self.corpus_cache = corpus_cache
+        self._corpus_key = None
+        # Tests already read, by queue directory and file name.
+        # AFL never changes or removes files in its queue once they are
+        # written completely
+        self._queue_tests = dict()
+        # Sizes of the queue files that weren't read yet at the last scan
+        self._queue_sizes = dict()
+        # Input keys of all seeds, so that no input is imported twice
+        self._seed_keys = set()
+        self._next_import_id = 0
+
+        self.number_corpus_seeds = utils.Constant(0)
+        self.number_imported_seeds = utils.Counter()
+        self.statistics.add_value('Number of seeds from corpus',
+                                  self.number_corpus_seeds)
+        self.statistics.add_value('Number of seeds from other generators',
+                                  self.number_imported_seeds)
+
+    def _get_instances(self):
+        # Instances always run in parallel mode, so that they sync inputs
+        # from the import dir
+        return ['fuzzer{:02d}'.format(i) for i in range(self.fuzz_jobs)]
+
+    def _get_instrumented_program(self):
+        return self.workspace.get_file_path('tested.out', temp_dir=True)
+
+    def get_build_artifacts(self, program_file):
+        return [self._get_instrumented_program()]
+
+    def get_build_inputs(self):
+        # afl-gcc instruments the program through afl-as
+        return [
+            os.path.join(bin_dir, 'afl-gcc'),
+            os.path.join(bin_dir, 'afl-as')
+        ]
+
     def create_input_generation_cmds(self, program_file):
-        instrumented_program = 'tested.out'
+        instrumented_program = self._get_instrumented_program()
         compile_cmd = [
             os.path.join(bin_dir,
                          'afl-gcc'), self.machine_model.compile_parameter, '-o',
             instrumented_program, program_file
         ]
 
-        testcase_dir = self._create_testcase_dir()
-        input_gen_cmd = [
-            os.path.join(bin_dir, 'afl-fuzz'), '-i', testcase_dir, '-o',
-            findings_dir, '--',
-            os.path.abspath(instrumented_program)
-        ]
-        return [compile_cmd, input_gen_cmd]
+        testcase_dir = self._create_testcase_dir(program_file)
+        input_gen_cmds = list()
+        for instance in self._get_instances():
+            # The first instance is the master, the others are secondaries
+            # that pick up its tests through the shared findings dir
+            role = '-M' if not input_gen_cmds else '-S'
+            input_gen_cmds.append([
+                os.path.join(bin_dir, 'afl-fuzz'), '-i', testcase_dir, '-o',
+                self.findings_dir, role, instance, '--', instrumented_program
+            ])
+        if len(input_gen_cmds) == 1:
+            return [compile_cmd, input_gen_cmds[0]]
+        return [compile_cmd, ParallelCommands(input_gen_cmds)]
 
-    def _create_testcase_dir(self):
-        testcase_dir = utils.get_file_path('initial_testcases', temp_dir=True)
+    def _create_testcase_dir(self, program_file):
+        testcase_dir = self.workspace.get_file_path(
+            'initial_testcases', temp_dir=True)
         os.mkdir(testcase_dir)
         initial_testcase = os.path.join(testcase_dir, '0.afl-test')
         with open(initial_testcase, 'w+') as outp:
             outp.write(
                 1000 * '0\n')  # FIXME: This is an unreliable first test case
+        self._seed_keys.add(harness_gen.get_input_key(1000 * '0\n'))
+        if self.corpus_cache:
+            self._add_corpus_seeds(program_file, testcase_dir)
         return testcase_dir
 
+    def _add_corpus_seeds(self, program_file, testcase_dir):
+        with open(program_file, 'rb') as inp:
+            program_hash = hashlib.sha1(inp.read()).hexdigest()
+        self._corpus_key = self.corpus_cache.get_key(
+            program_hash, self.machine_model.name)
+        corpus_dir = self.workspace.get_file_path('corpus', temp_dir=True)
+        os.mkdir(corpus_dir)
+        if self.corpus_cache.get(self._corpus_key, corpus_dir) is None:
+            return
+        seeds = list()
+        for f in os.listdir(corpus_dir):
+            with open(os.path.join(corpus_dir, f), 'rb') as inp:
+                seeds.append(inp.read())
+        seeds = minimize_seeds(seeds, self._seed_keys)
+        for idx, seed in enumerate(seeds):
+            seed_file = os.path.join(testcase_dir,
+                                     'corpus{}.afl-test'.format(idx))
+            with open(seed_file, 'wb') as outp:
+                outp.write(seed)
+        self.number_corpus_seeds.value = len(seeds)
+        logging.info("Seeding AFL with %s inputs of earlier runs", len(seeds))
+
+    def _store_corpus(self):
+        seeds = minimize_seeds(
+            [t.content for t in self.get_test_cases()])[:max_corpus_size]
+        if not seeds:
+            return
+        corpus_dir = self.workspace.get_file_path('new_corpus', temp_dir=True)
+        os.mkdir(corpus_dir)
+        seed_files = list()
+        for idx, seed in enumerate(seeds):
+            seed_files.append(
+                os.path.join(corpus_dir, 'seed{}.afl-test'.format(idx)))
+            with open(seed_files[-1], 'wb') as outp:
+                outp.write(seed)
+        self.corpus_cache.put(self._corpus_key, seed_files, replace=True)
+
+    def generate_input(self, filename, stop_flag):
+        try:
+            return super().generate_input(filename, stop_flag)
+        finally:
+            if self._corpus_key:
+                self._store_corpus()
+
+    def import_test_vectors(self, test_vectors):
+        import_dir = os.path.join(self.findings_dir, import_instance, 'queue')
+        inputs = [
+            vector_codecs.encode('afl', v) for v in test_vectors
+            if not v.origin.startswith(self.findings_dir)
+        ]
+        for seed in minimize_seeds(inputs, self._seed_keys):
+            os.makedirs(import_dir, exist_ok=True)
+            # AFL syncs test 'id:N' of another instance only if it hasn't
+            # seen a higher id yet, and may read any file that has an id.
+            # So ids increase and files get their name once complete
+            new_file = os.path.join(self.findings_dir, import_instance,
+                                    'new-seed')
+            with open(new_file, 'wb') as outp:
+                outp.write(seed)
+            os.rename(new_file,
+                      os.path.join(import_dir, 'id:{:06d}'.format(
+                          self._next_import_id)))
+            self._next_import_id += 1
+            self.number_imported_seeds.inc()
+
     def get_name(self):
         return name
 
@@ -59,30 +215,88 @@ class InputGenerator(BaseInputGenerator):
         return content
 
     def _get_test_name(self, test_file):
-        return os.path.basename(test_file)
+        name = os.path.basename(test_file)
+        if self.fuzz_jobs > 1:
+            # Tests of different instances have the same ids
+            instance = os.path.basename(
+                os.path.dirname(os.path.dirname(test_file)))
+            name = instance + '.' + name
+        return name
 
-    def get_test_cases(self, exclude=(), directory=tests_dir):
-        # 'crashes' and 'hangs' cannot lead to an error as long as we don't abort in __VERIFIER_error()
-        interesting_subdirs = ['queue']
+    def get_test_cases(self, exclude=(), directory=None):
+        # Once AFL stopped, all files in its queue are complete.
+        # Other findings dirs may still be written to
+        final = directory is None and not self.generation_running
         tcs = list()
-        for s in interesting_subdirs:
-            abs_dir = os.path.join(findings_dir, s)
-            for t in glob.glob(abs_dir + '/id:*'):
-                test_name = self._get_test_name(t)
-                if test_name not in exclude:
-                    with open(t, 'rb') as inp:
-                        content = inp.read()
-                    tcs.append(utils.TestCase(test_name, t, content))
+        for abs_dir in self.get_test_dirs(directory):
+            known_tests = self._queue_tests.setdefault(abs_dir, dict())
+            try:
+                test_files = os.listdir(abs_dir)
+            except FileNotFoundError:
+                continue
+            for f in test_files:
+                if f in known_tests:
+                    continue
+                test_file = os.path.join(abs_dir, f)
+                if not self._is_own_test(f):
+                    known_tests[f] = None
+                elif final or self._is_written(test_file):
+                    self.create_test_case(test_file)
+            tcs += [
+                t for t in known_tests.values()
+                if t and t.name not in exclude
+            ]
         return tcs
 
+    def _is_written(self, test_file):
+        """
+        Returns whether the given queue file seems to be written completely,
+        i.e., it isn't empty and had the same size at the last scan.
+        """
+        try:
+            size = os.path.getsize(test_file)
+        except FileNotFoundError:
+            return False
+        last_size = self._queue_sizes.get(test_file)
+        self._queue_sizes[test_file] = size
+        return size > 0 and size == last_size
+
+    def get_test_dirs(self, directory=None):
+        # 'crashes' and 'hangs' cannot lead to an error as long as we don't abort in __VERIFIER_error()
+        interesting_subdirs = ['queue']
+        findings_dir = directory if directory is not None else self.findings_dir
+        dirs = list()
+        for instance in self._get_instances():
+            dirs += [
+                os.path.join(findings_dir, instance, s)
+                for s in interesting_subdirs
+            ]
+        return dirs
+
+    @staticmethod
+    def _is_own_test(test_name):
+        # Tests that an instance synced from another instance are already
+        # in the queue of that instance, or were created by another generator
+        return test_name.startswith('id:') and ',sync:' not in test_name
+
+    def create_test_case(self, test_file):
+        # Called for all new files in the queue, and by the test watcher
+        # once a file is closed after writing
+        test_dir, test_name = os.path.split(test_file)
+        if not self._is_own_test(test_name):
+            return None
+        with open(test_file, 'rb') as inp:
+            content = inp.read()
+        test = utils.TestCase(self._get_test_name(test_file), test_file, content)
+        self._queue_tests.setdefault(test_dir, dict())[test_name] = test
+        self._queue_sizes.pop(test_file, None)
+        return test
+
 
 class AflTestValidator(BaseTestValidator):
 
     def get_name(self):
         return name
 
-    def get_test_vector(self, test_case):
-        vector = utils.TestVector(test_case.name, test_case.origin)
-        for line in test_case.content.split(b'\n'):
-            vector.add(line)
-        return vector
+    def _get_test_vector(self, test_case):
+        return vector_codecs.decode('afl', test_case)
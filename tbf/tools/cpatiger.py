@@ -1,26 +1,58 @@
 from tbf.input_generation import BaseInputGenerator
 from tbf.testcase_validation import TestValidator
 import tbf.utils as utils
+import tbf.vector_codecs as vector_codecs
 import os
+import threading
 
 module_dir = os.path.dirname(os.path.realpath(__file__))
 base_dir = os.path.join(module_dir, 'cpatiger')
 binary_dir = os.path.join(base_dir, 'scripts')
 binary = os.path.join(binary_dir, 'cpa.sh')
-tests_dir = os.path.join(utils.tmp, 'output')
 input_method = 'input'
 name = 'cpatiger'
 
 
+class TestSuiteReader(object):
+    """
+    Parses the test suite written by CPA/Tiger incrementally,
+    while CPA/Tiger is still writing it.
+    """
+
+    def __init__(self, tests_file):
+        self.tests_file = tests_file
+        self._tail = utils.FileTail(tests_file)
+        self._lock = threading.Lock()
+        self._test_cases = list()
+
+    def get_test_cases(self, final):
+        with self._lock:
+            lines, from_start = self._tail.read_lines(final)
+            if from_start:
+                self._test_cases = list()
+            for line in lines:
+                line = line.strip()
+                if line.startswith('[') and line.endswith(']'):
+                    self._test_cases.append(
+                        utils.TestCase(
+                            str(len(self._test_cases)), self.tests_file,
+                            line))
+            return list(self._test_cases)
+
+
 class InputGenerator(BaseInputGenerator):
 
     def __init__(self,
+                 workspace,
                  timelimit=0,
                  log_verbose=False,
                  machine_model=utils.MACHINE_MODEL_32):
-        super().__init__(timelimit, machine_model, log_verbose)
+        super().__init__(workspace, timelimit, machine_model, log_verbose)
+        self.tests_dir = workspace.get_file_path('output', temp_dir=True)
 
         self._run_env = utils.get_env_with_path_added(binary_dir)
+        # Test suite readers, by test suite file
+        self._readers = dict()
 
     def get_run_env(self):
         return self._run_env
@@ -57,7 +89,7 @@ class InputGenerator(BaseInputGenerator):
 
     def create_input_generation_cmds(self, filename):
         import shutil
-        config_copy_dir = utils.get_file_path('config', temp_dir=True)
+        config_copy_dir = self.workspace.get_file_path('config', temp_dir=True)
         if not os.path.exists(config_copy_dir):
             copy_dir = os.path.join(base_dir, 'config')
             shutil.copytree(copy_dir, config_copy_dir)
@@ -66,41 +98,27 @@ class InputGenerator(BaseInputGenerator):
         if self.timelimit > 0:
             input_generation_cmd += ['-timelimit', str(self.timelimit)]
         input_generation_cmd += [
-            '-tiger-variants', '-outputpath', tests_dir, '-spec',
+            '-tiger-variants', '-outputpath', self.tests_dir, '-spec',
             utils.spec_file, filename
         ]
 
         return [input_generation_cmd]
 
-    def get_test_cases(self, exclude=(), directory=tests_dir):
+    def get_test_cases(self, exclude=(), directory=None):
+        if directory is None:
+            directory = self.tests_dir
         tests_file = os.path.join(directory, 'testsuite.txt')
-        if os.path.exists(tests_file):
-            with open(tests_file, 'r') as inp:
-                tests = [
-                    l.strip()
-                    for l in inp.readlines()
-                    if l.strip().startswith('[') and l.strip().endswith(']')
-                ]
-            tests = [t for i, t in enumerate(tests) if str(i) not in exclude]
-            tcs = list()
-            for i, t in enumerate(tests):
-                tcs.append(utils.TestCase(str(i), tests_file, t))
-            return tcs
-        else:
-            return []
+        if tests_file not in self._readers:
+            self._readers[tests_file] = TestSuiteReader(tests_file)
+        test_cases = self._readers[tests_file].get_test_cases(
+            final=not self.generation_running)
+        return [t for t in test_cases if t.name not in exclude]
 
 
 class CpaTigerTestValidator(TestValidator):
 
     def _get_test_vector(self, test):
-        assert len(test.content.split('\n')) == 1
-        assert test.content.startswith('[') and test.content.endswith(']')
-        test_vector = utils.TestVector(test.name, test.origin)
-        processed_line = test.content[1:-1]
-        test_values = processed_line.split(', ')
-        for value in test_values:
-            test_vector.add(value)
-        return test_vector
+        return vector_codecs.decode('cpatiger', test)
 
     def get_name(self):
         return name
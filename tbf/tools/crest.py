@@ -1,6 +1,8 @@
-from tbf.input_generation import BaseInputGenerator
+from tbf.input_generation import BaseInputGenerator, ParallelCommands, \
+    StrategyStatistics, get_files_in
 from tbf.testcase_validation import TestValidator
 import tbf.utils as utils
+import tbf.vector_codecs as vector_codecs
 import os
 import logging
 import re
@@ -12,23 +14,56 @@ lib_dir = os.path.join(module_dir, 'crest/lib')
 include_dir = os.path.join(module_dir, 'crest/include')
 name = 'crest'
 test_name_pattern = re.compile('input[0-9]+$')
-tests_dir = utils.tmp
+# Files that crestc writes next to the instrumented program,
+# and that run_crest reads
+instrumentation_files = [
+    'idcount', 'stmtcount', 'funcount', 'cfg_func_map', 'cfg', 'branches',
+    'cfg_branches'
+]
 
 
 class InputGenerator(BaseInputGenerator):
 
     def __init__(self,
+                 workspace,
                  timelimit=None,
                  log_verbose=False,
                  search_heuristic='ppc',
-                 machine_model=utils.MACHINE_MODEL_32):
-        super().__init__(timelimit, machine_model, log_verbose)
+                 machine_model=utils.MACHINE_MODEL_32,
+                 num_iterations=100000,
+                 strategy_iterations=None,
+                 strategy_timelimits=None):
+        """
+        :param search_heuristic: the search strategy of CREST, or a list
+            of search strategies to run concurrently
+        :param num_iterations: the number of iterations of each strategy
+        :param strategy_iterations: the number of iterations of each of
+            the given search strategies. None to use num_iterations
+        :param strategy_timelimits: the time limit (in s) of each of the
+            given search strategies. None to use the overall time limit
+        """
+        super().__init__(workspace, timelimit, machine_model, log_verbose)
         self.log_verbose = log_verbose
 
         self._run_env = utils.get_env_with_path_added(bin_dir)
 
+        if type(search_heuristic) is list and len(search_heuristic) == 1:
+            search_heuristic = search_heuristic[0]
         self.search_heuristic = search_heuristic
-        self.num_iterations = 100000
+        self.num_iterations = num_iterations
+        self.strategy_iterations = strategy_iterations
+        self.strategy_timelimits = strategy_timelimits
+
+        # Per strategy of an ensemble: its working directory, the test name
+        # prefix and its statistics
+        self._strategies = list()
+        if type(search_heuristic) is list:
+            for idx, heuristic in enumerate(search_heuristic):
+                self._strategies.append(
+                    (workspace.get_file_path(
+                        'crest-' + str(idx), temp_dir=True),
+                     'strategy{}.'.format(idx),
+                     StrategyStatistics(self.statistics, heuristic)))
 
     def get_name(self):
         return name
@@ -98,30 +133,109 @@ class InputGenerator(BaseInputGenerator):
 
         return method_head + method_body
 
+    def get_build_artifacts(self, filename):
+        # crestc writes the instrumentation files to its working directory
+        return [filename[:-2]] + [
+            self.workspace.get_file_path(f, temp_dir=True)
+            for f in instrumentation_files
+        ]
+
+    def get_build_inputs(self):
+        return [os.path.join(bin_dir, 'crestc')] + get_files_in(include_dir)
+
     def create_input_generation_cmds(self, filename):
         compile_cmd = [os.path.join(bin_dir, 'crestc'), filename]
         # the output file name created by crestc is 'input file name - '.c'
-        instrumented_file = filename[:-2]
-        input_gen_cmd = [
-            os.path.join(bin_dir, 'run_crest'), instrumented_file,
-            str(self.num_iterations), '-' + self.search_heuristic
+        instrumented_file = os.path.abspath(filename[:-2])
+        if not self._strategies:
+            num_iterations = self.strategy_iterations[0] \
+                if self.strategy_iterations else self.num_iterations
+            input_gen_cmd = [
+                os.path.join(bin_dir, 'run_crest'), instrumented_file,
+                str(num_iterations), '-' + self.search_heuristic
+            ]
+            if self.strategy_timelimits:
+                # Only ParallelCommands have their own time limits
+                input_gen_cmd = ParallelCommands(
+                    [input_gen_cmd], timelimits=self.strategy_timelimits)
+            return [compile_cmd, input_gen_cmd]
+
+        iterations = self.strategy_iterations if self.strategy_iterations \
+            else [self.num_iterations] * len(self._strategies)
+        input_gen_cmds = list()
+        for heuristic, num_iterations, (work_dir, _, _) in zip(
+                self.search_heuristic, iterations, self._strategies):
+            self._create_work_dir(work_dir)
+            input_gen_cmds.append([
+                os.path.join(bin_dir, 'run_crest'), instrumented_file,
+                str(num_iterations), '-' + heuristic
+            ])
+        return [
+            compile_cmd,
+            ParallelCommands(
+                input_gen_cmds,
+                timers=[stats.timer for _, _, stats in self._strategies],
+                timelimits=self.strategy_timelimits,
+                cwds=[work_dir for work_dir, _, _ in self._strategies])
         ]
-        return [compile_cmd, input_gen_cmd]
 
-    def get_test_cases(self, exclude=(), directory=tests_dir):
-        all_tests = [
-            t for t in os.listdir(directory)
-            if test_name_pattern.match(utils.get_file_name(t))
-        ]
+    def _create_work_dir(self, work_dir):
+        # Each strategy writes its tests to its own working directory,
+        # and reads the instrumentation files from there.
+        # They are only created by the build, so we link to them
+        os.makedirs(work_dir, exist_ok=True)
+        for f in instrumentation_files:
+            link = os.path.join(work_dir, f)
+            if not os.path.lexists(link):
+                os.symlink(self.workspace.get_file_path(f, temp_dir=True), link)
+
+    def generate_input(self, filename, stop_flag):
+        try:
+            return super().generate_input(filename, stop_flag)
+        finally:
+            for work_dir, _, stats in self._strategies:
+                stats.update(len(self._get_test_files(work_dir)))
+
+    def _get_test_dirs_and_prefixes(self, directory):
+        if directory is not None:
+            return [(directory, '')]
+        if not self._strategies:
+            return [(self.workspace.tmp, '')]
+        return [(work_dir, prefix) for work_dir, prefix, _ in self._strategies]
+
+    @staticmethod
+    def _get_test_files(directory):
+        try:
+            return [
+                t for t in os.listdir(directory) if test_name_pattern.match(t)
+            ]
+        except FileNotFoundError:
+            return list()
+
+    def get_test_cases(self, exclude=(), directory=None):
         tcs = list()
-        for t in [
-                t for t in all_tests if utils.get_file_name(t) not in exclude
-        ]:
-            with open(t, 'r') as inp:
-                content = inp.read()
-            tcs.append(utils.TestCase(utils.get_file_name(t), t, content))
+        for test_dir, prefix in self._get_test_dirs_and_prefixes(directory):
+            for t in self._get_test_files(test_dir):
+                if prefix + t not in exclude:
+                    tcs.append(self.create_test_case(os.path.join(test_dir, t)))
         return tcs
 
+    def get_test_dirs(self, directory=None):
+        return [d for d, _ in self._get_test_dirs_and_prefixes(directory)]
+
+    def create_test_case(self, test_file):
+        if not test_name_pattern.match(utils.get_file_name(test_file)):
+            return None
+        with open(test_file, 'r') as inp:
+            content = inp.read()
+        test_dir = os.path.dirname(os.path.abspath(test_file))
+        prefix = ''
+        for work_dir, strategy_prefix, _ in self._strategies:
+            if os.path.abspath(work_dir) == test_dir:
+                prefix = strategy_prefix
+        return utils.TestCase(prefix + utils.get_file_name(test_file),
+                              test_file, content)
+
 
 class CrestTestValidator(TestValidator):
 
@@ -129,9 +243,4 @@ class CrestTestValidator(TestValidator):
         return name
 
     def _get_test_vector(self, test):
-        test_vector = utils.TestVector(test.name, test.origin)
-        for line in test.content.split('\n'):
-            value = line.strip()
-            if value:
-                test_vector.add(value)
-        return test_vector
+        return vector_codecs.decode('crest', test)
@@ -1,5 +1,7 @@
 import os
+import threading
 import tbf.utils as utils
+import tbf.vector_codecs as vector_codecs
 from tbf.input_generation import BaseInputGenerator
 from tbf.testcase_validation import TestValidator
 import pathlib
@@ -10,12 +12,72 @@ fshell_dir = os.path.join(module_dir, "fshell")
 bin_dir = os.path.join(fshell_dir, "bin")
 fshell_binary = os.path.join(bin_dir, "fshell")
 query_file = os.path.join(fshell_dir, "query-block-coverage")
-tests_dir = utils.tmp
-tests_file = os.path.join(tests_dir, 'testsuite.txt')
+tests_file_name = 'testsuite.txt'
+
+
+class TestSuiteReader(object):
+    """
+    Parses the test suite written by FShell incrementally,
+    while FShell is still writing it.
+    """
+
+    def __init__(self, tests_file):
+        self.tests_file = tests_file
+        self._tail = utils.FileTail(tests_file)
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._test_cases = list()
+        self._curr_test = list()
+        self._count = 1
+        self._test_suites = 0
+
+    def get_test_cases(self, final):
+        """
+        Returns all tests of the test suite.
+
+        :param final: whether FShell is done writing the test suite.
+            Otherwise, the values after the last 'IN:' line may be incomplete,
+            so the last test is not returned.
+        """
+        with self._lock:
+            lines, from_start = self._tail.read_lines(final)
+            if from_start:
+                self._reset()
+            for line in lines:
+                line = line.strip()
+                if "Test Suite" in line:
+                    self._test_suites += 1
+                    if self._test_suites > 1:
+                        raise AssertionError(
+                            "More than one test suite exists in " +
+                            self.tests_file)
+                if line.startswith("IN:"):
+                    self._test_cases.append(
+                        utils.TestCase(
+                            str(self._count), self.tests_file, self._curr_test))
+                    self._curr_test = list()
+                    self._count += 1
+                if line.startswith("strto"):
+                    test_value = line.split("=")[1]
+                    self._curr_test.append(test_value)
+
+            test_cases = list(self._test_cases)
+            if final and self._curr_test:
+                test_cases.append(
+                    utils.TestCase(
+                        str(self._count), self.tests_file, self._curr_test))
+            return test_cases
 
 
 class InputGenerator(BaseInputGenerator):
 
+    def __init__(self, workspace, timelimit, machine_model, log_verbose):
+        super().__init__(workspace, timelimit, machine_model, log_verbose)
+        # Test suite readers, by test suite file
+        self._readers = dict()
+
     def get_run_env(self):
         return utils.get_env_with_path_added(bin_dir)
 
@@ -77,42 +139,22 @@ class InputGenerator(BaseInputGenerator):
                                  self.machine_model)
 
         input_generation_cmd = [
-            fshell_binary, mm_arg, "--outfile", tests_file, "--query-file",
-            query_file, filename
+            fshell_binary, mm_arg, "--outfile",
+            self.workspace.get_file_path(tests_file_name, temp_dir=True),
+            "--query-file", query_file, filename
         ]
 
         return [input_generation_cmd]
 
-    def get_test_cases(self, exclude=(), directory=tests_dir):
-        tests_file = os.path.join(directory, 'testsuite.txt')
-        if os.path.exists(tests_file):
-            with open(tests_file, 'r') as inp:
-                content = [l.strip() for l in inp.readlines()]
-            if len([l for l in content if "Test Suite" in l]) > 1:
-                raise AssertionError("More than one test suite exists in " +
-                                     tests_file)
-
-            curr_test = list()
-            test_cases = list()
-            count = 1
-            for line in content:
-                if line.startswith("IN:"):
-                    test_name = str(count)
-                    if test_name not in exclude:
-                        test_cases.append(
-                            utils.TestCase(test_name, tests_file, curr_test))
-                    curr_test = list()
-                    count += 1
-                if line.startswith("strto"):
-                    test_value = line.split("=")[1]
-                    curr_test.append(test_value)
-            test_name = str(count)
-            if curr_test and test_name not in exclude:
-                test_cases.append(
-                    utils.TestCase(test_name, tests_file, curr_test))
-            return test_cases
-        else:
-            return []
+    def get_test_cases(self, exclude=(), directory=None):
+        if directory is None:
+            directory = self.workspace.tmp
+        tests_file = os.path.join(directory, tests_file_name)
+        if tests_file not in self._readers:
+            self._readers[tests_file] = TestSuiteReader(tests_file)
+        test_cases = self._readers[tests_file].get_test_cases(
+            final=not self.generation_running)
+        return [t for t in test_cases if t.name not in exclude]
 
 
 class FshellTestValidator(TestValidator):
@@ -121,8 +163,4 @@ class FshellTestValidator(TestValidator):
         return name
 
     def _get_test_vector(self, test):
-        vector = utils.TestVector(test.name, test.origin)
-        for tv in test.content:
-            vector.add(tv)
-
-        return vector
+        return vector_codecs.decode('fshell', test)
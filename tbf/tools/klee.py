@@ -1,36 +1,148 @@
-from tbf.input_generation import BaseInputGenerator
+from tbf.input_generation import BaseInputGenerator, ParallelCommands, \
+    StrategyStatistics, get_files_in
 from tbf.testcase_validation import TestValidator
 import tbf.utils as utils
-import glob
+import tbf.vector_codecs as vector_codecs
 import os
 import logging
+import mmap
+import struct
 
 module_dir = os.path.dirname(os.path.realpath(__file__))
 include_dir = os.path.join(module_dir, 'klee/include')
 lib_dir = os.path.join(module_dir, 'klee/lib')
 bin_dir = os.path.join(module_dir, 'klee/bin')
-tests_output = utils.tmp
-tests_dir = os.path.join(tests_output, 'klee-tests')
 klee_make_symbolic = 'klee_make_symbolic'
 name = 'klee'
 
+ktest_magics = (b'KTEST', b'BOUT\n')
+ktest_version = 3
+_ktest_int = struct.Struct('>i')
+
+
+def parse_ktest(data):
+    """
+    Parses the given content of a .ktest file.
+
+    :param data: the content, as bytes or any other buffer
+    :return: the list of symbolic objects in the file,
+        each as a tuple of object name and object value (bytes)
+    """
+    pos = 0
+
+    def read_int():
+        nonlocal pos
+        try:
+            value, = _ktest_int.unpack_from(data, pos)
+        except struct.error as e:
+            raise utils.ParseError("Incomplete ktest file", e)
+        pos += _ktest_int.size
+        return value
+
+    def read_bytes():
+        nonlocal pos
+        size = read_int()
+        if size < 0 or pos + size > len(data):
+            raise utils.ParseError("Incomplete ktest file")
+        value = bytes(data[pos:pos + size])
+        pos += size
+        return value
+
+    magic = bytes(data[:5])
+    if magic not in ktest_magics:
+        raise utils.ParseError("Not a ktest file")
+    pos = len(magic)
+    version = read_int()
+    if version > ktest_version:
+        raise utils.ParseError("Unknown ktest version: " + str(version))
+    number_args = read_int()
+    for _ in range(number_args):
+        read_bytes()
+    if version >= 2:
+        read_int()  # Number of symbolic arguments
+        read_int()  # Length of symbolic arguments
+
+    number_objects = read_int()
+    objects = list()
+    for _ in range(number_objects):
+        object_name = read_bytes().decode()
+        objects.append((object_name, read_bytes()))
+    return objects
+
+
+def read_ktest_file(ktest_file):
+    with open(ktest_file, 'rb') as inp:
+        try:
+            content = mmap.mmap(inp.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise utils.ParseError("Empty ktest file")
+        with content:
+            return parse_ktest(content)
+
+
+def read_ktest_dir(directory, exclude=()):
+    """
+    Reads all complete .ktest files in the given directory.
+    Files that are still written by KLEE are skipped.
+
+    :param exclude: names of files to skip
+    :return: a dict of the objects of each file, by file path
+    """
+    tests = dict()
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return tests
+    for entry in entries:
+        if not entry.name.endswith('.ktest') or entry.name in exclude:
+            continue
+        try:
+            tests[entry.path] = read_ktest_file(entry.path)
+        except (utils.ParseError, OSError) as e:
+            logging.debug("Skipping ktest file %s: %s", entry.path, e)
+    return tests
+
 
 class InputGenerator(BaseInputGenerator):
 
     def __init__(self,
+                 workspace,
                  timelimit=0,
                  log_verbose=False,
                  search_heuristic=['random-path', 'nurs:covnew'],
-                 machine_model=utils.MACHINE_MODEL_32):
-        super().__init__(timelimit, machine_model, log_verbose)
+                 machine_model=utils.MACHINE_MODEL_32,
+                 parallel_search_heuristics=None,
+                 strategy_shares=None):
+        """
+        :param parallel_search_heuristics: list of search heuristics, one
+            for each KLEE process to run concurrently. Each is a list of
+            KLEE search heuristics, like search_heuristic.
+            None to run a single KLEE process with search_heuristic
+        :param strategy_shares: share of the CPU cores for each of the
+            parallel_search_heuristics. None for equal shares
+        """
+        super().__init__(workspace, timelimit, machine_model, log_verbose)
+        self.tests_dir = workspace.get_file_path('klee-tests', temp_dir=True)
         self.log_verbose = log_verbose
         if type(search_heuristic) is not list:
             self.search_heuristic = list(search_heuristic)
         else:
             self.search_heuristic = search_heuristic
+        self.parallel_search_heuristics = parallel_search_heuristics
+        self.strategy_shares = strategy_shares
 
         self._run_env = utils.get_env_with_path_added(bin_dir)
 
+        # Per strategy: its test directory, the test name prefix and
+        # its statistics
+        self._strategies = list()
+        if parallel_search_heuristics:
+            for idx, heuristic in enumerate(parallel_search_heuristics):
+                self._strategies.append(
+                    (self.tests_dir + '-' + str(idx),
+                     'strategy{}.'.format(idx),
+                     StrategyStatistics(self.statistics, ','.join(heuristic))))
+
     def get_run_env(self):
         return self._run_env
 
@@ -68,6 +180,17 @@ class InputGenerator(BaseInputGenerator):
 
         return method_head + method_body
 
+    def _get_compiled_file(self, filename):
+        compiled_file = '.'.join(
+            os.path.basename(filename).split('.')[:-1] + ['bc'])
+        return self.workspace.get_file_path(compiled_file, temp_dir=True)
+
+    def get_build_artifacts(self, filename):
+        return [self._get_compiled_file(filename)]
+
+    def get_build_inputs(self):
+        return get_files_in(include_dir)
+
     def create_input_generation_cmds(self, filename):
         if self.machine_model.is_32:
             mm_args = ['-arch', 'i386']
@@ -77,88 +200,104 @@ class InputGenerator(BaseInputGenerator):
             raise AssertionError("Unhandled machine model: " +
                                  self.machine_model.name)
 
-        compiled_file = '.'.join(
-            os.path.basename(filename).split('.')[:-1] + ['bc'])
-        compiled_file = utils.get_file_path(compiled_file, temp_dir=True)
+        compiled_file = self._get_compiled_file(filename)
         compile_cmd = ['clang'] + mm_args + [
             '-I', include_dir, '-emit-llvm', '-c', '-g', '-o', compiled_file,
             filename
         ]
+        if not self._strategies:
+            return [
+                compile_cmd,
+                self._get_klee_cmd(compiled_file, self.search_heuristic,
+                                   self.tests_dir)
+            ]
+
+        # All KLEE processes explore the same bitcode file. Solver caches
+        # are internal to each process, so they can't be shared
+        klee_cmds = [
+            self._get_klee_cmd(compiled_file, heuristic, tests_dir)
+            for heuristic, (tests_dir, _, _) in zip(
+                self.parallel_search_heuristics, self._strategies)
+        ]
+        shares = self.strategy_shares if self.strategy_shares else [1] * len(
+            klee_cmds)
+        return [
+            compile_cmd,
+            ParallelCommands(
+                klee_cmds,
+                cpu_cores=utils.split_cpu_cores(self.cpu_cores, shares),
+                timers=[stats.timer for _, _, stats in self._strategies])
+        ]
+
+    def _get_klee_cmd(self, compiled_file, search_heuristic, tests_dir):
         input_generation_cmd = ['klee']
         if self.timelimit > 0:
             input_generation_cmd += ['-max-time', str(self.timelimit)]
         input_generation_cmd.append('-only-output-states-covering-new')
-        input_generation_cmd += ['-search=' + h for h in self.search_heuristic]
+        input_generation_cmd += ['-search=' + h for h in search_heuristic]
         input_generation_cmd += ['-output-dir=' + tests_dir]
         input_generation_cmd += [compiled_file]
+        return input_generation_cmd
+
+    def generate_input(self, filename, stop_flag):
+        try:
+            return super().generate_input(filename, stop_flag)
+        finally:
+            self._update_strategy_statistics()
+
+    def _update_strategy_statistics(self):
+        for tests_dir, _, stats in self._strategies:
+            stats.update(len(read_ktest_dir(tests_dir)))
 
-        return [compile_cmd, input_generation_cmd]
+    def _get_test_dirs_and_prefixes(self, directory):
+        if directory is not None:
+            return [(directory, '')]
+        if not self._strategies:
+            return [(self.tests_dir, '')]
+        return [(tests_dir, prefix)
+                for tests_dir, prefix, _ in self._strategies]
 
-    def get_test_cases(self, exclude=(), directory=tests_dir):
-        all_tests = [t for t in glob.glob(directory + '/*.ktest')]
-        logging.debug("Klee module found %s tests", len(all_tests))
+    def get_test_cases(self, exclude=(), directory=None):
         tcs = list()
-        for t in [
-                t for t in all_tests if utils.get_file_name(t) not in exclude
-        ]:
-            file_name = utils.get_file_name(t)
-            with open(t, mode='rb') as inp:
-                content = inp.read()
-            tcs.append(utils.TestCase(file_name, t, content))
+        for test_dir, prefix in self._get_test_dirs_and_prefixes(directory):
+            # Test names are the file names with the strategy prefix
+            test_exclude = {
+                e[len(prefix):]
+                for e in exclude if e.startswith(prefix)
+            }
+            all_tests = read_ktest_dir(test_dir, test_exclude)
+            logging.debug("Klee module found %s new tests", len(all_tests))
+            for t, objects in all_tests.items():
+                tcs.append(
+                    utils.TestCase(prefix + utils.get_file_name(t), t, objects))
         return tcs
 
+    def get_test_dirs(self, directory=None):
+        return [d for d, _ in self._get_test_dirs_and_prefixes(directory)]
+
+    def create_test_case(self, test_file):
+        if not test_file.endswith('.ktest'):
+            return None
+        try:
+            objects = read_ktest_file(test_file)
+        except utils.ParseError as e:
+            logging.debug("Skipping ktest file %s: %s", test_file, e)
+            return None
+        test_dir = os.path.dirname(os.path.abspath(test_file))
+        prefix = ''
+        for tests_dir, strategy_prefix, _ in self._strategies:
+            if os.path.abspath(tests_dir) == test_dir:
+                prefix = strategy_prefix
+        return utils.TestCase(prefix + utils.get_file_name(test_file),
+                              test_file, objects)
+
 
 class KleeTestValidator(TestValidator):
 
     def get_name(self):
         return name
 
-    def _get_var_number(self, test_info_line):
-        assert 'object' in test_info_line
-        return test_info_line.split(':')[0].split(' ')[
-            -1]  # Object number should be at end, e.g. 'object  1: ...'
-
     def _get_test_vector(self, test):
-
-        def _get_value(single_line):
-            var_name = single_line.split(':')[2].strip()
-            prefix_end = var_name.find("'")
-            var_name = var_name[prefix_end + 1:-1]
-            return var_name
-
-        ktest_tool = [os.path.join(bin_dir, 'ktest-tool')]
-        exec_output = utils.execute(
-            ktest_tool + [test.origin], err_to_output=False, quiet=True)
-        test_info = exec_output.stdout.split('\n')
-        vector = utils.TestVector(test.name, test.origin)
-        last_number = -1
-        last_nondet_method = None
-        last_value = None
-        for line in [l for l in test_info if l.startswith('object')]:
-            logging.debug("Looking at line: %s", line)
-            if 'name:' in line:
-                #assert len(line.split(':')) == 3
-                var_number = int(self._get_var_number(line))
-                assert var_number > last_number
-                last_number = var_number
-                var_name = _get_value(line)
-                assert last_nondet_method is None, \
-                        "Last nondet method already or still assigned: %s" % last_nondet_method
-                assert "'" not in var_name, \
-                        "Variable name contains \"'\": %s" % var_name
-                last_nondet_method = utils.get_corresponding_method_name(
-                    var_name)
-            elif 'data:' in line:
-                #assert len(line.split(':')) == 3
-                var_number = self._get_var_number(line)
-                assert last_nondet_method is not None
-                value = _get_value(line)
-                value, = utils.convert_to_int(value, last_nondet_method)
-                assert last_value is None
-                last_value = str(value)
-            if last_nondet_method is not None and last_value is not None:
-                vector.add(last_value, last_nondet_method)
-                last_nondet_method = None
-                last_value = None
-
-        return vector
+        # The content of KLEE test cases is the list of parsed ktest objects
+        return vector_codecs.decode('klee', test,
+                                    self.workspace.get_nondet_methods())
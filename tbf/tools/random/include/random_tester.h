@@ -1,2 +1,6 @@
-#include<stdlib.h>
-void input(void * var, size_t var_size, const char * var_name);
+#ifndef RANDOM_TESTER_H
+#define RANDOM_TESTER_H
+
+void input(void *var, unsigned long var_size, const char *var_name);
+
+#endif
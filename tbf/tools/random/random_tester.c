@@ -1,27 +1,288 @@
-#include<stdio.h>
-#include<stdlib.h>
-#include<string.h>
-#include<time.h>
+/*
+ * Driver of the random tester.
+ *
+ * The program under test is compiled together with this driver,
+ * with its main function renamed to __tbf_program_main.
+ * The driver forks one child per test from its already loaded image.
+ * Each child runs the program under test with its own seed and sends
+ * the values that input() creates to the driver, which appends them
+ * to its vectors file. Test vectors are separated by an empty line.
+ *
+ * Usage: <driver> SEED SHARDS VECTORS_PREFIX
+ *
+ * The driver runs SHARDS processes. Process k writes the vectors of tests
+ * k, k + SHARDS, k + 2 * SHARDS, ... to file VECTORS_PREFIX.k.txt.
+ * The seed of each test is derived from SEED and the number of the test,
+ * so runs with the same seed create the same test vectors.
+ */
+#undef main
+#define _GNU_SOURCE
+#include <errno.h>
+#include <fcntl.h>
+#include <poll.h>
+#include <signal.h>
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <sys/prctl.h>
+#include <sys/types.h>
+#include <sys/wait.h>
+#include <time.h>
+#include <unistd.h>
 
-unsigned int get_rand_seed() {
+/* Limits of a single test. A test that exceeds them is stopped,
+ * and the values it created up to that point are its test vector. */
+#define MAX_TEST_TIME_MS 1000
+#define MAX_VECTOR_SIZE (1 << 20)
+
+/* Written vectors are flushed if the buffer is full or the interval passed */
+#define OUTPUT_BUFFER_SIZE (1 << 16)
+#define FLUSH_INTERVAL_MS 100
+
+#define GOLDEN_GAMMA 0x9e3779b97f4a7c15ULL
+
+int __tbf_program_main();
+
+struct buffer {
+  char *data;
+  size_t length;
+  size_t capacity;
+};
+
+static int value_fd = -1;
+static int null_fd = -1;
+static uint64_t rng_state;
+
+static uint64_t splitmix64(uint64_t *state) {
+  uint64_t z = (*state += GOLDEN_GAMMA);
+  z = (z ^ (z >> 30)) * 0xbf58476d1ce4e5b9ULL;
+  z = (z ^ (z >> 27)) * 0x94d049bb133111ebULL;
+  return z ^ (z >> 31);
+}
+
+static void fail(const char *msg) {
+  perror(msg);
+  exit(2);
+}
+
+static long long now_ms() {
   struct timespec curr_time;
-  clock_gettime(CLOCK_REALTIME, &curr_time);
-  return curr_time.tv_nsec;
+  clock_gettime(CLOCK_MONOTONIC, &curr_time);
+  return curr_time.tv_sec * 1000LL + curr_time.tv_nsec / 1000000;
+}
+
+static int write_all(int fd, const char *data, size_t length) {
+  while (length > 0) {
+    ssize_t written = write(fd, data, length);
+    if (written < 0) {
+      if (errno == EINTR) {
+        continue;
+      }
+      return -1;
+    }
+    data += written;
+    length -= written;
+  }
+  return 0;
+}
+
+static void reserve(struct buffer *buf, size_t additional) {
+  if (buf->length + additional <= buf->capacity) {
+    return;
+  }
+  while (buf->length + additional > buf->capacity) {
+    buf->capacity = buf->capacity ? 2 * buf->capacity : OUTPUT_BUFFER_SIZE;
+  }
+  buf->data = realloc(buf->data, buf->capacity);
+  if (!buf->data) {
+    fail("realloc");
+  }
+}
+
+static void flush(struct buffer *buf, int fd) {
+  if (write_all(fd, buf->data, buf->length)) {
+    fail("write");
+  }
+  buf->length = 0;
+}
+
+void input(void *var, unsigned long var_size, const char *var_name) {
+  char line[512];
+  uint64_t value = splitmix64(&rng_state);
+  uint64_t written_value = value;
+  unsigned long i;
+  int length;
+
+  /* Values are stored little endian, so the first bytes of the value
+   * are its lowest bytes. The harness can only read up to 8 bytes. */
+  if (var_size < 8) {
+    written_value &= (((uint64_t)1) << (8 * var_size)) - 1;
+  }
+  memcpy(var, &value, var_size < 8 ? var_size : 8);
+  for (i = 8; i < var_size; i += 8) {
+    uint64_t more = splitmix64(&rng_state);
+    memcpy((char *)var + i, &more, var_size - i < 8 ? var_size - i : 8);
+  }
+
+  length = snprintf(line, sizeof(line), "%s: 0x%llx\n", var_name,
+                    (unsigned long long)written_value);
+  if (length < 0 || length >= (int)sizeof(line)) {
+    _exit(2);
+  }
+  /* Lines are shorter than PIPE_BUF, so each write is atomic */
+  if (write_all(value_fd, line, length)) {
+    _exit(2);
+  }
+}
+
+/* Runs a single test with the given seed and appends its values to buf */
+static void run_test(uint64_t seed, struct buffer *buf) {
+  int fds[2];
+  pid_t shard_pid = getpid();
+  pid_t pid;
+  size_t start = buf->length;
+  long long deadline = now_ms() + MAX_TEST_TIME_MS;
+  int stopped = 0;
+
+  if (pipe(fds)) {
+    fail("pipe");
+  }
+  pid = fork();
+  if (pid < 0) {
+    fail("fork");
+  }
+  if (pid == 0) {
+    char *argv[] = {"program", NULL};
+    prctl(PR_SET_PDEATHSIG, SIGKILL);
+    if (getppid() != shard_pid) {
+      _exit(2);
+    }
+    close(fds[0]);
+    dup2(null_fd, STDIN_FILENO);
+    dup2(null_fd, STDOUT_FILENO);
+    dup2(null_fd, STDERR_FILENO);
+    value_fd = fds[1];
+    rng_state = seed;
+    exit(__tbf_program_main(1, argv));
+  }
+  close(fds[1]);
+
+  for (;;) {
+    struct pollfd pfd;
+    long long remaining = deadline - now_ms();
+    ssize_t n;
+    int ready;
+
+    if (!stopped &&
+        (remaining <= 0 || buf->length - start >= MAX_VECTOR_SIZE)) {
+      kill(pid, SIGKILL);
+      stopped = 1;
+    }
+    pfd.fd = fds[0];
+    pfd.events = POLLIN;
+    ready = poll(&pfd, 1, stopped ? -1 : (int)remaining);
+    if (ready < 0 && errno != EINTR) {
+      fail("poll");
+    }
+    if (ready <= 0) {
+      continue;
+    }
+    reserve(buf, 4096);
+    n = read(fds[0], buf->data + buf->length, 4096);
+    if (n < 0) {
+      if (errno == EINTR) {
+        continue;
+      }
+      fail("read");
+    }
+    if (n == 0) {
+      break;
+    }
+    buf->length += n;
+  }
+  close(fds[0]);
+  while (waitpid(pid, NULL, 0) < 0 && errno == EINTR) {
+  }
 }
 
-void input(void * var, size_t var_size, const char * var_name) {
-  srand(get_rand_seed());
-  FILE *vector = fopen("vector.test", "a+");
-  size_t int_size = sizeof(int);
-  unsigned char * new_val = malloc(var_size);
+static void run_shard(uint64_t seed, unsigned long shard, unsigned long shards,
+                      const char *vectors_prefix) {
+  struct buffer buf = {NULL, 0, 0};
+  char vectors_file[4096];
+  long long last_flush = now_ms();
+  uint64_t test;
+  int fd;
 
-  fprintf(vector, "%s: 0x", var_name);
-  for (int i = 0; i < var_size; i++) {
-    new_val[var_size - i] = (char) (rand() & 255);
-    fprintf(vector, "%.2x", new_val[var_size - i]);
+  snprintf(vectors_file, sizeof(vectors_file), "%s.%lu.txt", vectors_prefix,
+           shard);
+  fd = open(vectors_file, O_WRONLY | O_CREAT | O_TRUNC, 0644);
+  if (fd < 0) {
+    fail(vectors_file);
   }
-  memcpy(new_val, var, var_size);
 
-  fprintf(vector, "\n");
-  fclose(vector);
+  for (test = 0;; test++) {
+    uint64_t state = seed + (test * shards + shard) * GOLDEN_GAMMA;
+    size_t start = buf.length;
+    int has_values;
+
+    run_test(splitmix64(&state), &buf);
+    has_values = buf.length > start;
+    reserve(&buf, 1);
+    buf.data[buf.length++] = '\n';
+
+    if (buf.length >= OUTPUT_BUFFER_SIZE ||
+        now_ms() - last_flush >= FLUSH_INTERVAL_MS || !has_values) {
+      flush(&buf, fd);
+      last_flush = now_ms();
+    }
+    if (!has_values) {
+      /* Without any input, all following tests would behave the same */
+      break;
+    }
+  }
+  close(fd);
+}
+
+int main(int argc, char **argv) {
+  uint64_t seed;
+  unsigned long shards;
+  unsigned long shard;
+  pid_t driver_pid = getpid();
+
+  if (argc != 4) {
+    fprintf(stderr, "Usage: %s SEED SHARDS VECTORS_PREFIX\n", argv[0]);
+    return 2;
+  }
+  seed = strtoull(argv[1], NULL, 0);
+  shards = strtoul(argv[2], NULL, 0);
+  if (shards < 1) {
+    fprintf(stderr, "Number of shards must be at least 1\n");
+    return 2;
+  }
+  /* Don't outlive TBF */
+  prctl(PR_SET_PDEATHSIG, SIGKILL);
+
+  null_fd = open("/dev/null", O_RDWR);
+  if (null_fd < 0) {
+    fail("/dev/null");
+  }
+
+  for (shard = 0; shard < shards; shard++) {
+    pid_t pid = fork();
+    if (pid < 0) {
+      fail("fork");
+    }
+    if (pid == 0) {
+      prctl(PR_SET_PDEATHSIG, SIGKILL);
+      if (getppid() != driver_pid) {
+        _exit(2);
+      }
+      run_shard(seed, shard, shards, argv[3]);
+      _exit(0);
+    }
+  }
+  while (wait(NULL) > 0 || errno == EINTR) {
+  }
+  return 0;
 }
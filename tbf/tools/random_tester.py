@@ -1,19 +1,82 @@
 import os
 import glob
+import logging
+import random
+import re
+import threading
 import tbf.utils as utils
-from tbf.input_generation import BaseInputGenerator
+import tbf.vector_codecs as vector_codecs
+from tbf.input_generation import BaseInputGenerator, get_files_in
 from tbf.testcase_validation import TestValidator
-import pathlib
 
 name = "prtest"
-module_dir = pathlib.Path(__file__).resolve().parent
-include_dir = module_dir / "random" / "include"
-generator_harness = module_dir / "random" / "random_tester.c"
-random_runner = module_dir / "random" / "run.sh"
+module_dir = os.path.dirname(os.path.realpath(__file__))
+include_dir = os.path.join(module_dir, "random", "include")
+generator_harness = os.path.join(module_dir, "random", "random_tester.c")
+vectors_prefix = 'random-vectors'
+vectors_file_pattern = re.compile(
+    re.escape(vectors_prefix) + r'\.([0-9]+)\.txt$')
+
+
+class VectorFileReader(object):
+    """
+    Reads the test vectors that a shard of the random tester writes,
+    while the shard is still writing them.
+    """
+
+    def __init__(self, vectors_file, shard):
+        self.vectors_file = vectors_file
+        self.shard = shard
+        self._tail = utils.FileTail(vectors_file)
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._test_cases = list()
+        self._curr_values = list()
+
+    def get_test_cases(self):
+        with self._lock:
+            lines, from_start = self._tail.read_lines()
+            if from_start:
+                self._reset()
+            for line in lines:
+                if line:
+                    self._curr_values.append(line)
+                else:
+                    # An empty line ends a test vector
+                    test_name = 'vector{}.{}'.format(self.shard,
+                                                     len(self._test_cases))
+                    self._test_cases.append(
+                        utils.TestCase(test_name, self.vectors_file,
+                                       '\n'.join(self._curr_values)))
+                    self._curr_values = list()
+            return list(self._test_cases)
 
 
 class InputGenerator(BaseInputGenerator):
 
+    def __init__(self,
+                 workspace,
+                 timelimit,
+                 machine_model,
+                 log_verbose,
+                 seed=None,
+                 shards=1):
+        """
+        :param seed: seed of the random values. If None, a random seed is used
+        :param shards: number of processes that create tests concurrently
+        """
+        super().__init__(workspace, timelimit, machine_model, log_verbose)
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(64)
+        self.seed = seed
+        self.shards = shards
+        # Vector file readers, by vectors file
+        self._readers = dict()
+
+        self.statistics.add_value('Random seed', utils.Constant(seed))
+
     def get_run_env(self):
         return utils.get_env()
 
@@ -23,6 +86,8 @@ class InputGenerator(BaseInputGenerator):
     def prepare(self, filecontent, nondet_methods_used):
         content = filecontent
         content += '\n'
+        content += 'void input(void *var, unsigned long var_size, ' \
+                   'const char *var_name);\n'
         for method in nondet_methods_used:
             # append method definition at end of file content
             nondet_method_definition = self._get_nondet_method(method)
@@ -51,27 +116,51 @@ class InputGenerator(BaseInputGenerator):
 
         return method_head + method_body
 
-    def create_input_generation_cmds(self, filename):
+    def _get_compiled_file(self, filename):
         compiled_file = '.'.join(os.path.basename(filename).split('.')[:-1])
-        compiled_file = utils.get_file_path(compiled_file, temp_dir=True)
+        return self.workspace.get_file_path(compiled_file, temp_dir=True)
+
+    def get_build_artifacts(self, filename):
+        return [self._get_compiled_file(filename)]
+
+    def get_build_inputs(self):
+        return [generator_harness] + get_files_in(include_dir)
+
+    def create_input_generation_cmds(self, filename):
+        compiled_file = self._get_compiled_file(filename)
         machinem_arg = self.machine_model.compile_parameter
+        # The driver in the generator harness has its own main function
         compile_cmd = [
-            'gcc', '-std=gnu11', machinem_arg, '-I', include_dir, '-o',
+            'gcc', '-std={}'.format(self.workspace.get_c_standards()[0]),
+            machinem_arg, '-Dmain=__tbf_program_main', '-I', include_dir, '-o',
             compiled_file, generator_harness, filename, '-lm'
         ]
-        input_generation_cmd = [random_runner, compiled_file]
+        logging.info("Random seed: %s", self.seed)
+        input_generation_cmd = [
+            compiled_file,
+            str(self.seed),
+            str(self.shards),
+            self.workspace.get_file_path(vectors_prefix, temp_dir=True)
+        ]
 
         return [compile_cmd, input_generation_cmd]
 
-    def get_test_cases(self, exclude=(), directory=utils.tmp):
-        all_tests = [t for t in glob.glob(directory + '/vector[0-9]*.test')]
+    def get_test_cases(self, exclude=(), directory=None):
+        if directory is None:
+            directory = self.workspace.tmp
         tcs = list()
-        for t in [
-                t for t in all_tests if utils.get_file_name(t) not in exclude
-        ]:
-            with open(t, 'r') as inp:
-                content = inp.read()
-            tcs.append(utils.TestCase(utils.get_file_name(t), t, content))
+        for vectors_file in sorted(
+                glob.glob(os.path.join(directory, vectors_prefix + '.*.txt'))):
+            match = vectors_file_pattern.search(vectors_file)
+            if not match:
+                continue
+            if vectors_file not in self._readers:
+                self._readers[vectors_file] = VectorFileReader(
+                    vectors_file, match.group(1))
+            tcs += [
+                t for t in self._readers[vectors_file].get_test_cases()
+                if t.name not in exclude
+            ]
         return tcs
 
 
@@ -86,13 +175,4 @@ class RandomTestValidator(TestValidator):
             -1]  # Object number should be at end, e.g. 'object  1: ...'
 
     def _get_test_vector(self, test):
-        test_info = [t for t in test.content.split('\n') if t]
-        vector = utils.TestVector(test.name, test.origin)
-        for idx, line in enumerate(test_info):
-            var_name = line.split(':')[0].strip()  # Line format is var: value
-            nondet_method_name = utils.get_corresponding_method_name(var_name)
-            value = line.split(':')[1].strip(
-            )  # is in C hex notation, e.g. '\x00\x00' (WITH the ''!)
-            vector.add(value, nondet_method_name)
-
-        return vector
+        return vector_codecs.decode('random', test)
@@ -4,16 +4,20 @@ import os
 import time
 import hashlib
 import tempfile
-import pycparser
 import re
+import selectors
 from struct import unpack
 import codecs
 
-from threading import Thread
+from threading import Event, Thread, Lock
+from concurrent import futures
 from math import floor
 import signal
 
-parser = pycparser.CParser()
+_parser = None
+# The parser keeps state while parsing, so runs in the same process
+# have to take turns
+_parser_lock = Lock()
 sym_var_prefix = '__sym_'
 
 GCC_BUILTINS = [
@@ -826,13 +830,232 @@ def shut_down(process):
     return returncode
 
 
+class SelectableEvent(Event):
+    """
+    Event that can be waited on together with file descriptors, e.g.,
+    with selectors. Its file descriptor is readable while the event is set.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._read_fd, self._write_fd = os.pipe()
+        os.set_blocking(self._read_fd, False)
+        os.set_blocking(self._write_fd, False)
+
+    def fileno(self):
+        return self._read_fd
+
+    def set(self):
+        super().set()
+        try:
+            os.write(self._write_fd, b'\0')
+        except BlockingIOError:
+            # Pipe is full, so the event is readable anyway
+            pass
+
+    def clear(self):
+        super().clear()
+        try:
+            while os.read(self._read_fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def __del__(self):
+        os.close(self._read_fd)
+        os.close(self._write_fd)
+
+
+class OutputSink(object):
+    """
+    Destination of the output of an executed command that may be too large
+    to keep in memory.
+
+    The output is appended to the given log file. If the log file grows
+    larger than max_size bytes, it is moved to `<log_file>.1` and a new log
+    file is started, so at most two log files of a command exist.
+    Only the last tail_size bytes of stdout and of stderr are kept in memory.
+    Without a log file, all other output is dropped.
+    """
+
+    def __init__(self,
+                 log_file=None,
+                 counter=None,
+                 max_size=64 * 2**20,
+                 tail_size=2**20):
+        self.log_file = log_file
+        # Counter to add the number of output bytes to when the sink is closed
+        self.counter = counter
+        self.max_size = max_size
+        self.tail_size = tail_size
+        self.size = 0
+        self._log = None
+        self._tails = (bytearray(), bytearray())
+
+    def write(self, data, is_err=False):
+        self.size += len(data)
+        tail = self._tails[1 if is_err else 0]
+        tail += data
+        # Trim only once in a while, so that we don't copy the tail for
+        # each chunk of output
+        if len(tail) > 2 * self.tail_size:
+            del tail[:-self.tail_size]
+        if self.log_file:
+            self._write_log(data)
+
+    def _write_log(self, data):
+        if self._log is None:
+            self._log = open(self.log_file, 'ab')
+        if self._log.tell() > 0 and \
+                self._log.tell() + len(data) > self.max_size:
+            self._log.close()
+            os.replace(self.log_file, self.log_file + '.1')
+            self._log = open(self.log_file, 'ab')
+        self._log.write(data)
+
+    def get_tail(self, is_err=False):
+        return bytes(self._tails[1 if is_err else 0][-self.tail_size:])
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        if self.counter is not None:
+            self.counter.inc(self.size)
+            self.size = 0
+
+
+# Interval (in s) to check stop flags that aren't selectable,
+# and processes if there are no pidfds
+_poll_interval = 0.05
+
+
+def _open_pidfd(process):
+    try:
+        return os.pidfd_open(process.pid)
+    except (AttributeError, OSError):
+        # Python or Linux too old
+        return None
+
+
+def _wait(process, stop_flag, timelimit, input_str, output_sink=None):
+    """
+    Waits for the given process to end, while reading its output.
+    Kills the process if the stop flag is set or the time limit is reached.
+    If an output sink is given, the output is written to it instead of
+    being collected.
+
+    Process exit, the stop flag and the pipes of the process are waited on
+    in a single select, so waiting doesn't take CPU time. The output is
+    read while the process runs, so the process never blocks on a full pipe.
+
+    :return: a tuple of the returncode, the output and the error output
+    """
+    selector = selectors.DefaultSelector()
+    output = {process.stdout.fileno(): list()}
+    if process.stderr:
+        output[process.stderr.fileno()] = list()
+    for fd in output:
+        selector.register(fd, selectors.EVENT_READ)
+    open_pipes = set(output)
+    if input_str:
+        os.set_blocking(process.stdin.fileno(), False)
+        selector.register(process.stdin.fileno(), selectors.EVENT_WRITE)
+    pidfd = _open_pidfd(process)
+    if pidfd is not None:
+        selector.register(pidfd, selectors.EVENT_READ)
+    stop_fd = stop_flag.fileno() if hasattr(stop_flag, 'fileno') else None
+    # A stop flag that isn't selectable has to be polled
+    poll_stop_flag = stop_flag is not None and stop_fd is None
+    if stop_fd is not None:
+        selector.register(stop_fd, selectors.EVENT_READ)
+
+    deadline = time.monotonic() + timelimit if timelimit else None
+    returncode = None
+    try:
+        while returncode is None or open_pipes:
+            if returncode is None:
+                returncode = process.poll()
+                stopped = stop_flag is not None and stop_flag.is_set()
+                if returncode is None and (stopped or (
+                        deadline and time.monotonic() >= deadline)):
+                    returncode = shut_down(process)
+                if returncode is not None:
+                    for fd in (pidfd, stop_fd):
+                        if fd is not None:
+                            selector.unregister(fd)
+                    stop_fd = None
+
+            if returncode is not None:
+                # Read what is left in the pipes, but don't wait for
+                # processes that the process started and that still use them
+                timeout = 0
+            else:
+                timeout = deadline - time.monotonic() if deadline else None
+                if poll_stop_flag or pidfd is None:
+                    timeout = min(timeout, _poll_interval) \
+                        if timeout is not None else _poll_interval
+            events = selector.select(
+                None if timeout is None else max(0, timeout))
+            if returncode is not None and not events:
+                break
+            for key, _ in events:
+                fd = key.fd
+                if fd in open_pipes:
+                    data = os.read(fd, 65536)
+                    if data and output_sink:
+                        output_sink.write(
+                            data, is_err=fd != process.stdout.fileno())
+                    elif data:
+                        output[fd].append(data)
+                    else:
+                        selector.unregister(fd)
+                        open_pipes.remove(fd)
+                elif fd == pidfd:
+                    # Process ended, poll() gets its returncode
+                    selector.unregister(pidfd)
+                    os.close(pidfd)
+                    pidfd = None
+                elif input_str and fd == process.stdin.fileno():
+                    try:
+                        input_str = input_str[os.write(fd, input_str[:65536]):]
+                    except BrokenPipeError:
+                        input_str = None
+                    if not input_str:
+                        selector.unregister(fd)
+                        process.stdin.close()
+    finally:
+        if pidfd is not None:
+            os.close(pidfd)
+        selector.close()
+
+    if output_sink:
+        err_output = output_sink.get_tail(is_err=True) \
+            if process.stderr else None
+        return returncode, output_sink.get_tail(), err_output
+    err_output = None
+    if process.stderr:
+        err_output = b''.join(output[process.stderr.fileno()])
+    return returncode, b''.join(output[process.stdout.fileno()]), err_output
+
+
 def execute(command,
             quiet=False,
             env=None,
             err_to_output=True,
             stop_flag=None,
             input_str=None,
-            timelimit=None):
+            timelimit=None,
+            cpu_cores=None,
+            cwd=None,
+            output_sink=None):
+    """
+    Executes the given command.
+
+    :param output_sink: OutputSink to stream the output of the command to.
+        If given, the returned ExecutionResult only contains the tail
+        of the output that the sink keeps in memory.
+    """
     log_cmd = logging.debug if quiet else logging.info
 
     log_cmd(" ".join(command))
@@ -843,32 +1066,44 @@ def execute(command,
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT if err_to_output else subprocess.PIPE,
         universal_newlines=False,
-        env=env)
+        env=env,
+        cwd=cwd)
+    if cpu_cores:
+        try:
+            os.sched_setaffinity(p.pid, cpu_cores)
+        except OSError as e:
+            logging.warning("Can't restrict %s to cores %s: %s", command[0],
+                            cpu_cores, e)
 
     output = None
     err_output = None
-    if stop_flag:
-        stopwatch = Stopwatch()
-        stopwatch.start()
-        returncode = p.poll()
-        while returncode is None:
-            if stop_flag.is_set() or (timelimit and
-                                      stopwatch.curr_s() > timelimit):
-                returncode = shut_down(p)
-            else:
-                time.sleep(0.001)
-                returncode = p.poll()
-        output, err_output = p.communicate()
+    if input_str and type(input_str) is not bytes:
+        input_str = input_str.encode()
+    if stop_flag or output_sink:
+        try:
+            returncode, output, err_output = _wait(p, stop_flag, timelimit,
+                                                   input_str, output_sink)
+        finally:
+            if output_sink:
+                output_sink.close()
+        for stream in (p.stdin, p.stdout, p.stderr):
+            if stream:
+                stream.close()
     else:
         try:
-            if input_str and type(input_str) is not bytes:
-                input_str = input_str.encode()
             output, err_output = p.communicate(
                 input=input_str, timeout=timelimit if timelimit else None)
             returncode = p.poll()
         except subprocess.TimeoutExpired:
             logging.info("Timeout of %s s expired. Killing process.", timelimit)
             returncode = shut_down(p)
+    if output_sink:
+        # The tail may start in the middle of a character
+        output = output.decode(errors='replace') if output else ''
+        if output_sink.log_file:
+            logging.debug("Output of %s written to %s", command[0],
+                          output_sink.log_file)
+        return ExecutionResult(returncode, output, err_output)
     # Decode output, but we can't decode error output, since it may contain undecodable bytes.
     output = output.decode() if output else ''
     logging.debug(output)
@@ -877,6 +1112,28 @@ def execute(command,
     return ExecutionResult(returncode, output, err_output)
 
 
+def split_cpu_cores(cpu_cores, shares):
+    """
+    Splits the given CPU cores into one set of cores for each share,
+    proportional to the shares. Each set has at least one core,
+    so sets overlap if there are fewer cores than shares.
+
+    :param cpu_cores: the CPU cores to split, or None for all cores
+        that this process may run on
+    """
+    cores = sorted(cpu_cores if cpu_cores else os.sched_getaffinity(0))
+    total_share = sum(shares)
+    core_sets = list()
+    start = 0.0
+    for share in shares:
+        end = start + len(cores) * share / total_share
+        first = min(int(round(start)), len(cores) - 1)
+        last = max(first + 1, int(round(end)))
+        core_sets.append(set(cores[first:last]))
+        start = end
+    return core_sets
+
+
 def flatten(list_of_lists):
     return [i for l in list_of_lists for i in l]
 
@@ -894,6 +1151,53 @@ def get_hash(filename):
     return sha1.hexdigest()
 
 
+class FileTail(object):
+    """
+    Reads the lines that were appended to a file since the last read.
+
+    If the file is replaced or truncated, it is read from the start again.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._file_id = None
+        self._offset = 0
+        self._partial_line = b''
+
+    def read_lines(self, final=False):
+        """
+        Returns the new, complete lines of the file.
+        A last line without line break is only returned if final is True,
+        since it may still be written to. Only use final if the file
+        isn't written to anymore.
+
+        :return: a tuple of the lines (without line breaks) and whether
+            the lines start at the beginning of the file
+        """
+        try:
+            with open(self.filename, 'rb') as inp:
+                stat = os.fstat(inp.fileno())
+                file_id = (stat.st_dev, stat.st_ino)
+                from_start = (file_id != self._file_id or
+                              stat.st_size < self._offset)
+                if from_start:
+                    self._file_id = file_id
+                    self._offset = 0
+                    self._partial_line = b''
+                inp.seek(self._offset)
+                data = inp.read()
+        except FileNotFoundError:
+            return [], False
+        self._offset += len(data)
+
+        lines = (self._partial_line + data).split(b'\n')
+        self._partial_line = lines.pop()
+        if final and self._partial_line:
+            lines.append(self._partial_line)
+            self._partial_line = b''
+        return [l.decode() for l in lines], from_start
+
+
 def get_machine_model(witness_file):
     with open(witness_file, 'r') as inp:
         for line in inp.readlines():
@@ -945,12 +1249,68 @@ def get_cpachecker_options(witness_file):
     # yapf: enable
 
 
-def get_file_path(filename, temp_dir=True):
-    if temp_dir:
-        prefix = tmp
-    else:
-        prefix = output_dir
-    return os.path.join(prefix, filename)
+class Workspace(object):
+    """
+    The state of a single run of TBF: its directories and what is known
+    about the program under test.
+
+    All files of a run are created in the directories of its workspace,
+    and no part of TBF relies on the current working directory,
+    so that multiple runs can share a process.
+    """
+
+    def __init__(self, output_dir=None):
+        if output_dir is None:
+            output_dir = default_output_dir
+        self.output_dir = os.path.abspath(output_dir)
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
+        self.tmp = tempfile.mkdtemp()
+
+        # C standard that the program under test compiles with.
+        # None if it wasn't determined, yet.
+        self.c_standard = None
+        # Undefined methods of the program under test.
+        # None if they weren't determined, yet.
+        self.nondet_methods = None
+        # Object files of the program under test, by program, machine model,
+        # C standard and compiler flags
+        self.program_objects = dict()
+        # Program contents with C problems rewritten, by original content
+        self.rewritten_contents = dict()
+
+    def get_file_path(self, filename, temp_dir=True):
+        if temp_dir:
+            prefix = self.tmp
+        else:
+            prefix = self.output_dir
+        return os.path.join(prefix, filename)
+
+    def get_prepared_name(self, filename, tool_name):
+        prepared_name = '.'.join(
+            os.path.basename(filename).split('.')[:-1] + [tool_name, 'c'])
+        return self.get_file_path(prepared_name, temp_dir=True)
+
+    def get_c_standards(self):
+        """
+        Returns the C standards to try, in order, when compiling the program
+        under test.
+        """
+        if self.c_standard:
+            return [self.c_standard]
+        return c_standards
+
+    def get_nondet_methods(self):
+        return self.nondet_methods
+
+    def get_rewritten_content(self, content):
+        """
+        Returns the given program content with C problems rewritten.
+        The result is computed only once per workspace.
+        """
+        if content not in self.rewritten_contents:
+            self.rewritten_contents[content] = rewrite_cproblems(content)
+        return self.rewritten_contents[content]
 
 
 def get_file_name(filename):
@@ -1077,78 +1437,208 @@ class Stopwatch(object):
         return str_rep
 
 
+_block_comment_end_pattern = re.compile(r'.*\*/')
+_block_comment_pattern = re.compile(r'/\*.*?\*/')
+_block_comment_start_pattern = re.compile(r'/\*.*')
+_simple_attribute_pattern = re.compile(
+    r'__attribute__\s*\(\(\s*[a-z_, ]+\s*\)\)\s*')
+_attribute_pattern = re.compile(r'__attribute__\s*\(\(.*\)\)\s*')
+_attribute_start_pattern = re.compile(r'__attribute__\s*\(\(')
+_attribute_start_rest_pattern = re.compile(r'__attribute__\s*\(\(.*')
+_attribute_end_pattern = re.compile(r'.*\)\)')
+# Replacements of GCC extensions, in the order they are applied
+_gcc_extensions = [('__extension__', ''), ('__restrict', ''),
+                   ('__restrict__', ''), ('__inline__', ''), ('__inline', ''),
+                   ('__const', 'const'), ('__signed__', 'signed'),
+                   ('__builtin_va_list', 'int')]
+_struct_body_end_pattern = re.compile(r'^\s*}\s*;\s*$')
+_empty_line_pattern = re.compile(r'^\s*$')
+_struct_start_pattern = re.compile(r'^\s*struct\s+[a-zA-Z0-9_]+\s*{\s*$')
+_asm_start_pattern = re.compile(
+    r'^\s*__asm__(\s+volatile)?\s*\("([^"]|\\")*"[^;]*$')
+_asm_end_pattern = re.compile(r'\)\s*;\s*$')
+_asm_pattern = re.compile(
+    r'^\s*__asm__(\s+volatile)?\s*\("([^"]|\\")*"[^;]*\)\s*;\s*$')
+_asm_renaming_pattern = re.compile(r'__asm__\s*\(""\s+"[a-zA-Z0-9_]+"\)')
+
+
 def rewrite_cproblems(content):
+    """
+    Rewrites the constructs of the given C code that pycparser can't parse.
+
+    The code is processed in a single pass, line by line.
+    Each rewrite is only tried on lines that contain its keyword.
+    """
     need_struct_body = False
     skip_asm = False
     in_attribute = False
     in_cxx_comment = False
-    prepared_content = ''
-    for line in [c + "\n" for c in content.split('\n')]:
+    prepared_content = list()
+    for line in content.split('\n'):
+        line += '\n'
         # remove C++-style comments
         if in_cxx_comment:
-            if re.search(r'\*/', line):
-                line = re.sub(r'.*\*/', '', line)
+            if '*/' in line:
+                line = _block_comment_end_pattern.sub('', line)
                 in_cxx_comment = False
             else:
                 line = ''
-        else:
-            line = re.sub(r'/\*.*?\*/', '', line)
-        if re.search(r'/\*', line):
-            line = re.sub(r'/\*.*', '', line)
+        elif '/*' in line:
+            line = _block_comment_pattern.sub('', line)
+        if '/*' in line:
+            line = _block_comment_start_pattern.sub('', line)
             in_cxx_comment = True
         # remove __attribute__
-        line = re.sub(r'__attribute__\s*\(\(\s*[a-z_, ]+\s*\)\)\s*', '', line)
-        # line = re.sub(r'__attribute__\s*\(\(\s*[a-z_, ]+\s*\(\s*[a-zA-Z0-9_, "\.]+\s*\)\s*\)\)\s*', '', line)
-        # line = re.sub(r'__attribute__\s*\(\(\s*[a-z_, ]+\s*\(\s*sizeof\s*\([a-z ]+\)\s*\)\s*\)\)\s*', '', line)
-        # line = re.sub(r'__attribute__\s*\(\(\s*[a-z_, ]+\s*\(\s*\([0-9]+\)\s*<<\s*\([0-9]+\)\s*\)\s*\)\)\s*', '', line)
-        line = re.sub(r'__attribute__\s*\(\(.*\)\)\s*', '', line)
-        if re.search(r'__attribute__\s*\(\(', line):
-            line = re.sub(r'__attribute__\s*\(\(.*', '', line)
+        if '__attribute__' in line:
+            line = _simple_attribute_pattern.sub('', line)
+            line = _attribute_pattern.sub('', line)
+        if '__attribute__' in line and _attribute_start_pattern.search(line):
+            line = _attribute_start_rest_pattern.sub('', line)
             in_attribute = True
         elif in_attribute:
-            line = re.sub(r'.*\)\)', '', line)
+            line = _attribute_end_pattern.sub('', line)
             in_attribute = False
         # rewrite some GCC extensions
-        line = re.sub(r'__extension__', '', line)
-        line = re.sub(r'__restrict', '', line)
-        line = re.sub(r'__restrict__', '', line)
-        line = re.sub(r'__inline__', '', line)
-        line = re.sub(r'__inline', '', line)
-        line = re.sub(r'__const', 'const', line)
-        line = re.sub(r'__signed__', 'signed', line)
-        line = re.sub(r'__builtin_va_list', 'int', line)
+        if '__' in line:
+            for extension, replacement in _gcc_extensions:
+                line = line.replace(extension, replacement)
         # a hack for some C-standards violating code in LDV benchmarks
-        if need_struct_body and re.match(r'^\s*}\s*;\s*$', line):
+        if need_struct_body and _struct_body_end_pattern.match(line):
             line = 'int __dummy; ' + line
             need_struct_body = False
         elif need_struct_body:
-            need_struct_body = re.match(r'^\s*$', line) is not None
-        elif re.match(r'^\s*struct\s+[a-zA-Z0-9_]+\s*{\s*$', line):
+            need_struct_body = _empty_line_pattern.match(line) is not None
+        elif 'struct' in line and _struct_start_pattern.match(line):
             need_struct_body = True
         # remove inline asm
-        if re.match(r'^\s*__asm__(\s+volatile)?\s*\("([^"]|\\")*"[^;]*$', line):
+        has_asm = '__asm__' in line
+        if has_asm and _asm_start_pattern.match(line):
             skip_asm = True
-        elif skip_asm and re.search(r'\)\s*;\s*$', line):
+        elif skip_asm and _asm_end_pattern.search(line):
             skip_asm = False
             line = '\n'
-        if (skip_asm or re.match(
-                r'^\s*__asm__(\s+volatile)?\s*\("([^"]|\\")*"[^;]*\)\s*;\s*$',
-                line)):
+        if skip_asm or (has_asm and _asm_pattern.match(line)):
             line = '\n'
         # remove asm renaming
-        line = re.sub(r'__asm__\s*\(""\s+"[a-zA-Z0-9_]+"\)', '', line)
-        prepared_content += line
-    return prepared_content
-
-
-def parse_file_with_preprocessing(file_content, machine_model, includes=[]):
-    preprocessed_content = preprocess(file_content, machine_model, includes)
+        if '__asm__' in line:
+            line = _asm_renaming_pattern.sub('', line)
+        prepared_content.append(line)
+    return ''.join(prepared_content)
+
+
+c_standards = ['gnu11', 'gnu90']
+
+
+def get_parser():
+    """
+    Returns the C parser.
+    The parser is created on first use, because loading its tables is slow.
+    """
+    global _parser
+    with _parser_lock:
+        if _parser is None:
+            import pycparser
+            _parser = pycparser.CParser()
+    return _parser
+
+
+def parse_file_with_preprocessing(file_content,
+                                  machine_model,
+                                  includes=[],
+                                  standards=c_standards):
+    preprocessed_content = preprocess(file_content, machine_model, includes,
+                                      standards)
     preprocessed_content = rewrite_cproblems(preprocessed_content)
-    ast = parser.parse(preprocessed_content)
+    parser = get_parser()
+    with _parser_lock:
+        ast = parser.parse(preprocessed_content)
     return ast
 
 
-def preprocess(file_content, machine_model, includes=[]):
+_compiler_version = None
+
+
+def get_compiler_version():
+    global _compiler_version
+    if _compiler_version is None:
+        result = execute(['gcc', '--version'], quiet=True)
+        _compiler_version = result.stdout.splitlines()[0] if result.stdout else ''
+    return _compiler_version
+
+
+_source_hash = None
+
+
+def _get_source_hash():
+    # Cached undefined methods and rewritten programs are created by this
+    # module, so they become invalid if it changes
+    global _source_hash
+    if _source_hash is None:
+        _source_hash = get_hash(__file__)
+    return _source_hash
+
+
+def _compiles_with(filename, machine_model, standard):
+    cmd = [
+        'gcc', '-fsyntax-only', '-std={}'.format(standard),
+        machine_model.compile_parameter, '-D__alias__(x)=', filename
+    ]
+    return execute(cmd, quiet=True, err_to_output=False).returncode == 0
+
+
+def _probe_c_standard(filename, machine_model, parallel):
+    if parallel:
+        with futures.ThreadPoolExecutor(len(c_standards)) as pool:
+            probes = [
+                pool.submit(_compiles_with, filename, machine_model, s)
+                for s in c_standards
+            ]
+            # Prefer the earlier standards, no matter which probe finishes first
+            for standard, probe in zip(c_standards, probes):
+                if probe.result():
+                    return standard
+    else:
+        for standard in c_standards:
+            if _compiles_with(filename, machine_model, standard):
+                return standard
+    return None
+
+
+def determine_c_standard(workspace,
+                         filename,
+                         machine_model,
+                         parallel=False,
+                         cache=None):
+    """
+    Determines the C standard that the given program compiles with
+    and uses it for all following compilations of the program
+    in the given workspace.
+
+    :param parallel: whether to try all C standards concurrently
+    :param cache: ArtifactCache to remember the result in across runs
+    """
+    if cache:
+        key = cache.get_key(
+            get_hash(filename), machine_model.name, c_standards,
+            get_compiler_version())
+        data = cache.get(key, workspace.tmp)
+        if data is not None:
+            workspace.c_standard = data['c_standard']
+            logging.debug("Using known C standard %s", workspace.c_standard)
+            return workspace.c_standard
+
+    c_standard = _probe_c_standard(filename, machine_model, parallel)
+    if c_standard is None:
+        logging.info("Program doesn't compile with any of %s", c_standards)
+    else:
+        logging.debug("Program compiles with C standard %s", c_standard)
+    if cache:
+        cache.put(key, [], {'c_standard': c_standard})
+    workspace.c_standard = c_standard
+    return c_standard
+
+
+def preprocess(file_content, machine_model, includes=[], standards=c_standards):
     mm_arg = machine_model.compile_parameter
 
     # -E : only preprocess
@@ -1158,32 +1648,51 @@ def preprocess(file_content, machine_model, includes=[]):
     preprocess_cmd = ['gcc', '-E', '-xc', mm_arg]
     for inc in includes:
         preprocess_cmd += ['-I', inc]
-    final_cmd = preprocess_cmd + ['-std=gnu11', '-lm', '-']
-    p = execute(
-        final_cmd, err_to_output=False, input_str=file_content, quiet=False)
-    if p.returncode != 0:
-        final_cmd = preprocess_cmd + ['-std=gnu90', '-lm', '-']
+    for standard in standards:
+        final_cmd = preprocess_cmd + ['-std={}'.format(standard), '-lm', '-']
         p = execute(
             final_cmd, err_to_output=False, input_str=file_content, quiet=False)
+        if p.returncode == 0:
+            break
     return p.stdout
 
 
-undefined_methods = None
-
+_rewritten_file = 'rewritten.c'
 
-def get_nondet_methods():
-    return undefined_methods
 
+def find_nondet_methods(workspace, filename, svcomp_only, cache=None):
+    """
+    Determines the undefined methods of the given program
+    and stores them in the given workspace.
 
-def find_nondet_methods(filename, svcomp_only):
-    global undefined_methods
-    if undefined_methods is None:
-        logging.debug("Finding undefined methods")
+    :param cache: ArtifactCache to remember the undefined methods
+        and the rewritten program in across runs
+    """
+    if workspace.nondet_methods is None:
         with open(filename, 'r') as inp:
             file_content = inp.read()
+        if cache:
+            key = cache.get_key(
+                hashlib.sha1(file_content.encode()).hexdigest(), svcomp_only,
+                MACHINE_MODEL_32.name, [], workspace.get_c_standards(),
+                get_compiler_version(), _get_source_hash())
+            data = cache.get(key, workspace.tmp)
+            if data is not None:
+                rewritten_file = workspace.get_file_path(_rewritten_file)
+                with open(rewritten_file, 'r') as inp:
+                    workspace.rewritten_contents[file_content] = inp.read()
+                os.remove(rewritten_file)
+                workspace.nondet_methods = data['nondet_methods']
+                logging.debug("Using known undefined methods: %s",
+                              workspace.nondet_methods)
+                return workspace.nondet_methods
+
+        logging.debug("Finding undefined methods")
         if not svcomp_only:
+            import pycparser
             try:
-                undefined_methods = _find_undefined_methods(file_content)
+                undefined_methods = _find_undefined_methods(
+                    file_content, workspace.get_c_standards())
             except pycparser.plyparser.ParseError as e:
                 logging.warning(
                     "Parse failure with pycparser while parsing: %s", e)
@@ -1191,13 +1700,22 @@ def find_nondet_methods(filename, svcomp_only):
         else:
             undefined_methods = _find_nondet_methods(file_content)
         logging.debug("Undefined methods: %s", undefined_methods)
-    return undefined_methods
-
-
-def _find_undefined_methods(file_content):
+        workspace.nondet_methods = undefined_methods
+        if cache:
+            rewritten_file = workspace.get_file_path(_rewritten_file)
+            with open(rewritten_file, 'w+') as outp:
+                outp.write(workspace.get_rewritten_content(file_content))
+            cache.put(key, [rewritten_file],
+                      {'nondet_methods': undefined_methods})
+            os.remove(rewritten_file)
+    return workspace.nondet_methods
+
+
+def _find_undefined_methods(file_content, standards):
     import tbf.ast_visitor as ast_visitor
 
-    ast = parse_file_with_preprocessing(file_content, MACHINE_MODEL_32)
+    ast = parse_file_with_preprocessing(
+        file_content, MACHINE_MODEL_32, standards=standards)
 
     func_decl_collector = ast_visitor.FuncDeclCollector()
     func_def_collector = ast_visitor.FuncDefCollector()
@@ -1295,11 +1813,49 @@ def get_corresponding_method_name(sym_var_name):
     return name
 
 
-def convert_to_int(value, method_name):
+def convert_to_int(value, method_name, undefined_methods):
+    """
+    Converts the given value of a symbolic variable to the return type
+    of the given nondet method.
+
+    :param value: the raw bytes of the value, or their string representation
+        with escape sequences, e.g., '\\x00\\x01'
+    :param undefined_methods: the undefined methods of the program under test
+    """
+    assert undefined_methods is not None
+    if type(value) is str:
+        if value.startswith('\'') and value.endswith('\''):
+            value = value[1:-1]
+        value = codecs.decode(value, 'unicode_escape').encode('latin1')
+    value_type = _get_method_type(method_name, undefined_methods)
+    data_format = get_data_format(value_type)
+    logging.debug("Converting value %s according to data format %s", value,
+                  data_format)
+    return unpack(data_format, value)
+
+
+def parse_int(value):
+    """
+    Parses the given integer in C notation, like strtoll(value, NULL, 0).
+
+    :raises ValueError: if the value is no integer
+    """
+    digits = value.strip()
+    sign = 1
+    if digits[:1] in ('+', '-'):
+        sign = -1 if digits[0] == '-' else 1
+        digits = digits[1:]
+    if digits[:2] in ('0x', '0X'):
+        number = int(digits[2:], 16)
+    elif digits.startswith('0'):
+        number = int(digits, 8)
+    else:
+        number = int(digits, 10)
+    return sign * number
+
+
+def _get_method_type(method_name, undefined_methods):
     assert undefined_methods is not None
-    if type(value) is str and value.startswith('\'') and value.endswith('\''):
-        value = value[1:-1]
-    value = codecs.decode(value, 'unicode_escape').encode('latin1')
     corresponding_method_singleton_list = [
         m for m in undefined_methods if m['name'] == method_name
     ]
@@ -1312,7 +1868,13 @@ def convert_to_int(value, method_name):
     # but must be ultimately cast to the method return type,
     # so this is fine - unless we have undefined behavior prior to this point due to a downcast of the variable type.
     # In that case, hope is already lost.
-    value_type = corresponding_method['type']
+    return corresponding_method['type']
+
+
+def get_data_format(value_type):
+    """
+    Returns the struct format of symbolic variables of the given type.
+    """
     data_format = '<'  # Klee output uses little endian format
     if value_type == 'char' or value_type == 'signed char':
 
@@ -1346,9 +1908,7 @@ def convert_to_int(value, method_name):
         logging.debug('Converting type %s using type unsigned long ',
                       value_type)
         data_format += 'Q'
-    logging.debug("Converting value %s according to data format %s", value,
-                  data_format)
-    return unpack(data_format, value)
+    return data_format
 
 
 def get_format_specifier(method_type):
@@ -1389,13 +1949,16 @@ class Counter(object):
 
     def __init__(self):
         self._count = 0
+        # Counters may be increased by concurrent runs
+        self._lock = Lock()
 
     @property
     def count(self):
         return self._count
 
     def inc(self, amount=1):
-        self._count += amount
+        with self._lock:
+            self._count += amount
 
     def __str__(self):
         return str(self.count)
@@ -1448,6 +2011,9 @@ class StatisticsPool(object):
         self._stat_objects.append(stat)
         return stat
 
+    def add(self, statistics):
+        self._stat_objects.append(statistics)
+
     def __str__(self):
         return '\n\n'.join([str(s) for s in self._stat_objects])
 
@@ -1456,8 +2022,7 @@ error_string = "Error found."
 error_return = 107
 error_method = '__VERIFIER_error'
 spec_file = os.path.join(os.path.dirname(__file__), "ReachSafety.prp")
-output_dir = os.path.abspath('./output')
-tmp = tempfile.mkdtemp()
+default_output_dir = 'output'
 nondet_pattern = re.compile('__VERIFIER_nondet_.+?\(\)')
 
 FALSE = 'false'
@@ -1470,16 +2035,6 @@ MACHINE_MODEL_32 = MachineModel(32, "32 bit linux", 2, 4, 4, 8, 4, 8, 12,
 MACHINE_MODEL_64 = MachineModel(64, "64 bit linux", 2, 4, 8, 8, 4, 8, 16,
                                 '-m64')
 
-if not os.path.exists(output_dir):
-    os.mkdir(output_dir)
-
 
 def found_err(run_result):
     return run_result.stderr and error_string.encode() in run_result.stderr
-
-
-def get_prepared_name(filename, tool_name):
-    prepared_name = '.'.join(
-        os.path.basename(filename).split('.')[:-1] + [tool_name, 'c'])
-    prepared_name = get_file_path(prepared_name, temp_dir=True)
-    return prepared_name
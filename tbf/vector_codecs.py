@@ -0,0 +1,196 @@
+"""
+Conversion of test cases between the test formats of the input generators.
+
+Test vectors (utils.TestVector) are the common model of all formats:
+a sequence of input values, each with the nondet method that returns it,
+if that is known. Values are in the format that the test harness reads.
+
+For each format, `decode` creates a test vector from the content of a
+test case of the input generator, and `encode` creates the content of
+a test case from a test vector, so that the test vectors of one input
+generator can seed another one.
+The content of a test case is what the TestCase objects of the input
+generator hold: bytes with one value per line (afl), a str with one value
+per line (crest), a str '[v1, v2, ...]' (cpatiger), a list of values
+(fshell), a list of ktest objects, each a tuple of name and bytes (klee),
+or a str with one line 'symbolic variable: value' per value (random).
+"""
+
+import struct
+
+import tbf.utils as utils
+
+
+def _str(value):
+    return value.decode('latin1') if type(value) is bytes else value
+
+
+def _get_int(value):
+    try:
+        return utils.parse_int(value)
+    except ValueError:
+        return None
+
+
+def _get_sym_var_name(method_name):
+    return utils.sym_var_prefix + (method_name if method_name else 'input')
+
+
+def _get_method_name(sym_var_name):
+    return sym_var_name[len(utils.sym_var_prefix):]
+
+
+def _get_data_formats(nondet_methods):
+    # Looked up once per test instead of once per value
+    return {
+        m['name']: struct.Struct(utils.get_data_format(m['type']))
+        for m in nondet_methods
+    } if nondet_methods else dict()
+
+
+def _decode_afl(test_vector, content, nondet_methods):
+    for line in content.split(b'\n'):
+        test_vector.add(line)
+
+
+def _encode_afl(test_vector, nondet_methods):
+    return b'\n'.join([
+        v['value'] if type(v['value']) is bytes else v['value'].encode()
+        for v in test_vector.vector
+    ])
+
+
+def _decode_crest(test_vector, content, nondet_methods):
+    for line in content.split('\n'):
+        value = line.strip()
+        if value:
+            test_vector.add(value)
+
+
+def _encode_crest(test_vector, nondet_methods):
+    # CREST reads decimal integers only
+    values = list()
+    for v in test_vector.vector:
+        value = _str(v['value'])
+        number = _get_int(value)
+        values.append(str(number) if number is not None else value)
+    return ''.join([v + '\n' for v in values])
+
+
+def _decode_cpatiger(test_vector, content, nondet_methods):
+    if not (content.startswith('[') and content.endswith(']')) \
+            or '\n' in content:
+        raise utils.ParseError("Not a CPATiger test: " + content)
+    for value in content[1:-1].split(', '):
+        test_vector.add(value)
+
+
+def _encode_cpatiger(test_vector, nondet_methods):
+    return '[' + ', '.join([_str(v['value']) for v in test_vector.vector]) + ']'
+
+
+def _decode_fshell(test_vector, content, nondet_methods):
+    for value in content:
+        test_vector.add(value)
+
+
+def _encode_fshell(test_vector, nondet_methods):
+    return [_str(v['value']) for v in test_vector.vector]
+
+
+def _decode_klee(test_vector, content, nondet_methods):
+    assert nondet_methods is not None
+    data_formats = _get_data_formats(nondet_methods)
+    for var_name, data in content:
+        nondet_method = _get_method_name(var_name)
+        if nondet_method not in data_formats:
+            raise AssertionError(
+                "Didn't find {} in list of undefined methods: {}".format(
+                    nondet_method, nondet_methods))
+        value, = data_formats[nondet_method].unpack(data)
+        test_vector.add(str(value), nondet_method)
+
+
+def _encode_klee(test_vector, nondet_methods):
+    data_formats = _get_data_formats(nondet_methods)
+    objects = list()
+    for v in test_vector.vector:
+        value = _str(v['value'])
+        data_format = data_formats.get(v['name'])
+        if data_format and data_format.format[-1] in 'fd':
+            data = data_format.pack(float(value))
+        else:
+            # Without a type, we use the largest integer type
+            size = data_format.size if data_format else 8
+            data = ((_get_int(value) or 0) % 2**(8 * size)).to_bytes(
+                size, 'little')
+        objects.append((_get_sym_var_name(v['name']), data))
+    return objects
+
+
+def _decode_random(test_vector, content, nondet_methods):
+    for line in content.split('\n'):
+        if not line:
+            continue
+        var_name, value = line.split(':', 1)
+        test_vector.add(value.strip(), _get_method_name(var_name.strip()))
+
+
+def _encode_random(test_vector, nondet_methods):
+    return ''.join([
+        _get_sym_var_name(v['name']) + ': ' + _str(v['value']) + '\n'
+        for v in test_vector.vector
+    ])
+
+
+_codecs = {
+    'afl': (_decode_afl, _encode_afl),
+    'crest': (_decode_crest, _encode_crest),
+    'cpatiger': (_decode_cpatiger, _encode_cpatiger),
+    'fshell': (_decode_fshell, _encode_fshell),
+    'klee': (_decode_klee, _encode_klee),
+    'random': (_decode_random, _encode_random),
+}
+
+formats = sorted(_codecs.keys())
+
+
+def _get_codec(test_format):
+    try:
+        return _codecs[test_format]
+    except KeyError:
+        raise utils.ConfigError("Unknown test format: " + test_format)
+
+
+def decode(test_format, test_case, nondet_methods=None):
+    """
+    Returns the test vector of the given test case of the given format.
+
+    :param nondet_methods: the undefined methods of the program under test.
+        Required to decode the raw values of KLEE tests
+    """
+    decoder, _ = _get_codec(test_format)
+    test_vector = utils.TestVector(test_case.name, test_case.origin)
+    decoder(test_vector, test_case.content, nondet_methods)
+    return test_vector
+
+
+def encode(test_format, test_vector, nondet_methods=None):
+    """
+    Returns the content of a test case of the given format
+    with the values of the given test vector.
+
+    :param nondet_methods: the undefined methods of the program under test.
+        Used to encode values with the size of their type for KLEE
+    """
+    _, encoder = _get_codec(test_format)
+    return encoder(test_vector, nondet_methods)
+
+
+def convert(test_case, from_format, to_format, nondet_methods=None):
+    """
+    Returns the content of the given test case, converted to another format.
+    """
+    return encode(to_format,
+                  decode(from_format, test_case, nondet_methods),
+                  nondet_methods)
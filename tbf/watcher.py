@@ -0,0 +1,199 @@
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import queue
+import select
+import struct
+import threading
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+_event_header = struct.Struct('iIII')
+
+_libc = None
+
+
+def _get_libc():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        # Raises AttributeError if inotify is not supported by the libc
+        _libc.inotify_init1.argtypes = [ctypes.c_int]
+        _libc.inotify_add_watch.argtypes = [
+            ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32
+        ]
+        _libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    return _libc
+
+
+def create_watcher(directories):
+    """
+    Returns a TestFileWatcher for the given directories,
+    or None if inotify is not available.
+    """
+    try:
+        return TestFileWatcher(directories)
+    except (OSError, AttributeError) as e:
+        logging.info("Can't watch test directories, polling instead: %s", e)
+        return None
+
+
+class TestFileWatcher(object):
+    """
+    Reports files that are written to or moved into a set of directories.
+
+    Directories may not exist yet when the watcher is created. In this case,
+    the closest existing parent directory is watched until the directory
+    is created.
+
+    The files are collected by a background thread, so that
+    the inotify queue of the kernel doesn't overflow while the test validator
+    is busy.
+    """
+
+    _dir_mask = IN_CREATE | IN_MOVED_TO | IN_ONLYDIR
+    _file_mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF
+
+    def __init__(self, directories):
+        self._libc = _get_libc()
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._stop_read, self._stop_write = os.pipe()
+
+        self._new_files = queue.Queue()
+        # Watched test directories and parent directories, by watch descriptor
+        self._test_dirs = dict()
+        self._parent_dirs = dict()
+        self._pending_dirs = [os.path.abspath(d) for d in directories]
+        # Files created before the watches existed are missed
+        self._rescan = True
+
+        try:
+            self._add_pending_watches()
+        except OSError:
+            self.close()
+            raise
+        self._thread = threading.Thread(target=self._collect_events, daemon=True)
+        self._thread.start()
+
+    def _add_watch(self, path, mask):
+        wd = self._libc.inotify_add_watch(self._fd, path.encode(), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def _add_pending_watches(self):
+        needed_parents = set()
+        for directory in list(self._pending_dirs):
+            if os.path.isdir(directory):
+                try:
+                    wd = self._add_watch(directory, self._file_mask)
+                except OSError as e:
+                    if e.errno != errno.ENOENT:
+                        raise
+                    continue
+                self._test_dirs[wd] = directory
+                self._pending_dirs.remove(directory)
+            else:
+                parent = os.path.dirname(directory)
+                while not os.path.isdir(parent):
+                    parent = os.path.dirname(parent)
+                needed_parents.add(parent)
+
+        for wd, parent in list(self._parent_dirs.items()):
+            if parent in needed_parents:
+                needed_parents.remove(parent)
+            else:
+                self._libc.inotify_rm_watch(self._fd, wd)
+                del self._parent_dirs[wd]
+        for parent in needed_parents:
+            wd = self._add_watch(parent, self._dir_mask)
+            self._parent_dirs[wd] = parent
+
+    def _collect_events(self):
+        while True:
+            ready, _, _ = select.select([self._fd, self._stop_read], [], [])
+            if self._stop_read in ready:
+                return
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                continue
+            except OSError:
+                return
+            self._handle_events(data)
+
+    def _handle_events(self, data):
+        directories_changed = False
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_len = _event_header.unpack_from(data, offset)
+            offset += _event_header.size
+            name = data[offset:offset + name_len].rstrip(b'\0').decode()
+            offset += name_len
+
+            if mask & IN_Q_OVERFLOW:
+                self._new_files.put(None)
+            elif wd in self._test_dirs:
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                    self._pending_dirs.append(self._test_dirs.pop(wd))
+                    directories_changed = True
+                elif not mask & IN_ISDIR:
+                    self._new_files.put(
+                        os.path.join(self._test_dirs[wd], name))
+            elif wd in self._parent_dirs:
+                if mask & IN_IGNORED:
+                    del self._parent_dirs[wd]
+                    directories_changed = True
+                elif mask & IN_ISDIR:
+                    directories_changed = True
+
+        if directories_changed:
+            try:
+                self._add_pending_watches()
+            except OSError as e:
+                logging.warning("Can't watch test directory anymore: %s", e)
+            # Files may have been created before the new watches existed
+            self._new_files.put(None)
+
+    def get_new_files(self, timeout):
+        """
+        Waits until new files exist or the given timeout (in seconds) expires.
+
+        :return: the list of new files, or None if some new files may have
+            been missed and the test directories have to be scanned
+        """
+        new_files = list()
+        try:
+            if not self._rescan:
+                new_files.append(self._new_files.get(timeout=timeout))
+            while True:
+                new_files.append(self._new_files.get_nowait())
+        except queue.Empty:
+            pass
+        if self._rescan or None in new_files:
+            self._rescan = False
+            return None
+        return new_files
+
+    def close(self):
+        os.write(self._stop_write, b'\0')
+        if hasattr(self, '_thread'):
+            self._thread.join()
+        for fd in (self._fd, self._stop_read, self._stop_write):
+            os.close(fd)